@@ -39,13 +39,15 @@ INSTALLED_APPS = [
     "rest_framework_simplejwt",
     "flights",
     "drf_spectacular",
-    "debug_toolbar",
     "users",
+    "jobs",
     "pytest",
     "pytest_django"
 ]
 
 MIDDLEWARE = [
+    "flights.middleware.ServerTimingMiddleware",
+    "flights.metrics.PrometheusMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -53,9 +55,12 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
 ]
 
+if DEBUG:
+    INSTALLED_APPS.append("debug_toolbar")
+    MIDDLEWARE.append("debug_toolbar.middleware.DebugToolbarMiddleware")
+
 ROOT_URLCONF = "airport_api_service.urls"
 
 TEMPLATES = [
@@ -90,6 +95,28 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# Cached reference lists are dropped by bumping a version in this cache,
+# so it must be shared by every process serving the API (Redis,
+# Memcached or the database cache). With the per-process LocMemCache the
+# other workers keep serving stale lists for REFERENCE_CACHE_TIMEOUT
+# seconds; the flights.W001 check warns when WEB_CONCURRENCY is above 1.
+REFERENCE_CACHE_ALIAS = os.getenv("REFERENCE_CACHE_ALIAS", "default")
+REFERENCE_CACHE_TIMEOUT = int(os.getenv("REFERENCE_CACHE_TIMEOUT", "3600"))
+# Worker processes serving the API, as read by gunicorn and uvicorn.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -134,30 +161,125 @@ MEDIA_ROOT = "/files/media"
 
 STATIC_ROOT = "/files/static"
 
+# Stream uploads to a temporary file instead of holding them in memory.
+FILE_UPLOAD_HANDLERS = [
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+AUTH_CACHE_TIMEOUT = int(os.getenv("AUTH_CACHE_TIMEOUT", "60"))
+
+# Trust the claims of a valid access token instead of loading the user.
+JWT_STATELESS_AUTH = os.getenv("JWT_STATELESS_AUTH", "False") == "True"
+
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "flights.throttling.AnonSlidingWindowThrottle",
+        "flights.throttling.UserSlidingWindowThrottle",
+        "flights.throttling.ScopedSlidingWindowThrottle",
     ],
-    "DEFAULT_THROTTLE_RATES": {"anon": "1000/day", "user": "3000/day"},
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": os.getenv("THROTTLE_ANON_RATE", "1000/day"),
+        "user": os.getenv("THROTTLE_USER_RATE", "3000/day"),
+        "search": os.getenv("THROTTLE_SEARCH_RATE", "300/hour"),
+        "booking": os.getenv("THROTTLE_BOOKING_RATE", "30/hour"),
+    },
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-        "rest_framework.authentication.TokenAuthentication",
+        (
+            "rest_framework_simplejwt.authentication."
+            "JWTStatelessUserAuthentication"
+            if JWT_STATELESS_AUTH
+            else "users.authentication.CachedJWTAuthentication"
+        ),
+        "users.authentication.CachedTokenAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "flights.permissions.IsAdminOrIfAuthenticatedReadOnly",
     ],
+    "DEFAULT_PAGINATION_CLASS": "flights.pagination.IdCursorPagination",
+    "PAGE_SIZE": int(os.getenv("API_PAGE_SIZE", "50")),
+}
+
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "500"))
+API_MAX_BATCH_IDS = int(os.getenv("API_MAX_BATCH_IDS", "100"))
+
+# POST /api/batch/: sub-requests per batch, and GETs run at once. Every
+# thread of a parallel batch opens its own database connection, so one
+# batch can hold up to BATCH_CONCURRENCY connections besides its own.
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+# Serve the lists of views with ValuesListMixin from values() rows.
+VALUES_LIST_RENDERING = os.getenv("VALUES_LIST_RENDERING", "True") == "True"
+
+SEAT_MAP_CACHE_TIMEOUT = int(os.getenv("SEAT_MAP_CACHE_TIMEOUT", "300"))
+
+ORDER_MAX_TICKETS = int(os.getenv("ORDER_MAX_TICKETS", "50"))
+
+MANIFEST_CHUNK_SIZE = int(os.getenv("MANIFEST_CHUNK_SIZE", "2000"))
+
+CONNECTION_MIN_MINUTES = int(os.getenv("CONNECTION_MIN_MINUTES", "45"))
+CONNECTION_MAX_MINUTES = int(os.getenv("CONNECTION_MAX_MINUTES", "720"))
+CONNECTION_SEARCH_TIME_BUDGET_MS = int(
+    os.getenv("CONNECTION_SEARCH_TIME_BUDGET_MS", "200")
+)
+CONNECTION_SEARCH_RESULTS = int(os.getenv("CONNECTION_SEARCH_RESULTS", "20"))
+# Seconds between checks of the routes table for changes made by other
+# processes, which a per-process cache cannot announce.
+ROUTE_GRAPH_CHECK_INTERVAL = float(
+    os.getenv("ROUTE_GRAPH_CHECK_INTERVAL", "5")
+)
+
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "True") == "True"
+
+# Bearer token Prometheus sends to /metrics. Without one only staff signed
+# in through the admin can read the metrics.
+# With PROMETHEUS_MULTIPROC_DIR set, the server must call
+# prometheus_client.multiprocess.mark_process_dead(worker.pid) when a worker
+# exits, for instance from gunicorn's child_exit(server, worker) hook.
+# Otherwise the files of dead workers are never cleaned up.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BACKOFF = int(os.getenv("JOB_RETRY_BACKOFF", "10"))
+JOB_RETRY_BACKOFF_MAX = int(os.getenv("JOB_RETRY_BACKOFF_MAX", "3600"))
+# Running jobs whose lock was not refreshed for this long are run again.
+JOB_LOCK_TIMEOUT = int(os.getenv("JOB_LOCK_TIMEOUT", "600"))
+# Workers refresh the locks of their running jobs this often; keep it well
+# below JOB_LOCK_TIMEOUT.
+JOB_HEARTBEAT_INTERVAL = int(os.getenv("JOB_HEARTBEAT_INTERVAL", "60"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "flights.requests": {
+            "handlers": ["console"],
+            "level": os.getenv("REQUEST_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
 }
 
 SPECTACULAR_SETTINGS = {
     "TITLE": "Airport API Service",
-    "DESCRIPTION": "Order flights tickets",
+    "DESCRIPTION": (
+        "Order flights tickets\n\n"
+        "The async read endpoints under /api/flights/async/ (flights, "
+        "routes and airports) are not listed here. They return the same "
+        "representations as the endpoints below, without ETag validators, "
+        "?fields=, ?exclude=, ?ids= or response caching."
+    ),
     "VERSION": "3.1.0",
     "SERVE_INCLUDE_SCHEMA": False,
     "SWAGGER_UI_SETTINGS": {
@@ -172,4 +294,5 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": False,
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.ClaimsTokenObtainPairSerializer",
 }
@@ -9,10 +9,16 @@ from drf_spectacular.views import (
 
 from django.conf import settings
 
+from flights.batch import BatchView
+from flights.metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
     path("api/flights/", include("flights.urls", namespace="flights")),
     path("api/users/", include("users.urls", namespace="users")),
+    path("api/jobs/", include("jobs.urls", namespace="jobs")),
+    path("api/batch/", BatchView.as_view(), name="batch"),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path(
         "api/doc/swagger/",
@@ -24,5 +30,7 @@ urlpatterns = [
         SpectacularRedocView.as_view(url_name="schema"),
         name="redoc",
     ),
-    path("__debug__/", include("debug_toolbar.urls")),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+if "debug_toolbar" in settings.INSTALLED_APPS:
+    urlpatterns.append(path("__debug__/", include("debug_toolbar.urls")))
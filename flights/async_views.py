@@ -0,0 +1,300 @@
+"""Async read-only endpoints under ``/api/flights/async/``.
+
+They render the serializers of the flights, routes and airports ViewSets
+and check the same permission class and default throttles, but they are
+plain async Django views, so the ViewSets remain the complete API. Left
+out here:
+
+- ``ETag``/``Last-Modified`` validators and 304 answers;
+- ``?fields=``/``?exclude=`` sparse fieldsets and ``?ids=`` batch reads;
+- ``values()`` list rendering and the reference data cache;
+- writes, search, connections and manifests.
+
+Their ``cursor`` values are not interchangeable with the ViewSets', and
+the endpoints are not in the OpenAPI schema; its description points here.
+"""
+
+import base64
+import binascii
+import functools
+import json
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from flights.models import Airport, Flight, Route
+from flights.pagination import keyset_condition
+from flights.permissions import IsAdminOrIfAuthenticatedReadOnly
+from flights.seats import aget_seat_map
+from flights.serializers import (
+    AirportSerializer,
+    FlightSerializer,
+    RouteSerializer,
+    SeatMapSerializer,
+)
+from users.authentication import aget_token_user, aget_user
+
+
+class AsyncAPIError(Exception):
+    def __init__(self, detail, status_code, headers=None):
+        self.detail = detail
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        status=status_code,
+        content_type="application/json",
+        headers=headers,
+    )
+
+
+async def authenticate(request):
+    """Resolve the JWT or Token ``Authorization`` header without threads.
+
+    Token validation is pure CPU work and the user is loaded through the
+    auth cache and the async ORM, so authenticating never leaves the
+    event loop.
+    """
+    parts = request.headers.get("Authorization", "").split()
+    if len(parts) != 2:
+        return AnonymousUser()
+    keyword, credential = parts
+    user = None
+    if keyword in jwt_settings.AUTH_HEADER_TYPES:
+        try:
+            token = JWTAuthentication().get_validated_token(credential.encode())
+            user_id = token[jwt_settings.USER_ID_CLAIM]
+        except (InvalidToken, TokenError, KeyError):
+            raise AsyncAPIError(
+                "Given token not valid for any token type",
+                status.HTTP_401_UNAUTHORIZED,
+            )
+        if settings.JWT_STATELESS_AUTH:
+            return jwt_settings.TOKEN_USER_CLASS(token)
+        user = await aget_user(user_id)
+    elif keyword == "Token":
+        user = await aget_token_user(credential)
+    if user is None or not user.is_active:
+        raise AsyncAPIError(
+            "Invalid token or inactive user.", status.HTTP_401_UNAUTHORIZED
+        )
+    return user
+
+
+async def check_throttles(request):
+    """Apply the default throttle classes.
+
+    Their state lives in the database, so the checks run through
+    ``sync_to_async`` like any other ORM call.
+    """
+    for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle = throttle_class()
+        if not await sync_to_async(throttle.allow_request)(request, None):
+            wait = throttle.wait()
+            headers = {}
+            detail = "Request was throttled."
+            if wait is not None:
+                headers["Retry-After"] = str(int(wait))
+                detail += f" Expected available in {int(wait)} seconds."
+            raise AsyncAPIError(
+                detail, status.HTTP_429_TOO_MANY_REQUESTS, headers
+            )
+
+
+def async_read_view(view):
+    """Turn an async handler into an authenticated, read-only endpoint.
+
+    Access is decided by ``IsAdminOrIfAuthenticatedReadOnly``, like on
+    the ViewSets. Handlers return the data to render or raise
+    ``AsyncAPIError`` or ``Http404``.
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return json_response(
+                {"detail": f'Method "{request.method}" not allowed.'},
+                status.HTTP_405_METHOD_NOT_ALLOWED,
+                {"Allow": "GET, HEAD"},
+            )
+        try:
+            request.user = await authenticate(request)
+            if not IsAdminOrIfAuthenticatedReadOnly().has_permission(
+                request, None
+            ):
+                if not request.user.is_authenticated:
+                    raise AsyncAPIError(
+                        "Authentication credentials were not provided.",
+                        status.HTTP_401_UNAUTHORIZED,
+                    )
+                raise AsyncAPIError(
+                    "You do not have permission to perform this action.",
+                    status.HTTP_403_FORBIDDEN,
+                )
+            await check_throttles(request)
+            data = await view(request, *args, **kwargs)
+        except AsyncAPIError as error:
+            headers = dict(error.headers)
+            if error.status_code == status.HTTP_401_UNAUTHORIZED:
+                headers["WWW-Authenticate"] = 'Bearer realm="api"'
+            return json_response(
+                {"detail": error.detail}, error.status_code, headers
+            )
+        except Http404:
+            return json_response(
+                {"detail": "Not found."}, status.HTTP_404_NOT_FOUND
+            )
+        return json_response(data)
+
+    return wrapper
+
+
+def encode_cursor(values):
+    values = [
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in values
+    ]
+    payload = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor, ordering):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError
+        position = [
+            parse_datetime(value) if field.endswith("_time") else int(value)
+            for field, value in zip(ordering, values)
+        ]
+        if None in position:
+            raise ValueError
+        return position
+    except (binascii.Error, TypeError, ValueError):
+        raise AsyncAPIError("Invalid cursor", status.HTTP_400_BAD_REQUEST)
+
+
+def page_size(request):
+    size = request.GET.get("page_size")
+    if size is None:
+        return api_settings.PAGE_SIZE
+    try:
+        return min(max(int(size), 1), settings.API_MAX_PAGE_SIZE)
+    except ValueError:
+        return api_settings.PAGE_SIZE
+
+
+def int_list(request, name):
+    try:
+        return [int(value) for value in request.GET.getlist(name)]
+    except ValueError:
+        raise AsyncAPIError(f"Invalid {name} ID", status.HTTP_400_BAD_REQUEST)
+
+
+async def paginate(request, queryset, serializer_class, ordering=("id",)):
+    """Forward-only keyset pagination with an opaque ``cursor`` parameter.
+
+    The cursor holds the ordering values of the last item on the page,
+    so the next page is an indexed range scan at any depth.
+    """
+    cursor = request.GET.get("cursor")
+    if cursor:
+        position = decode_cursor(cursor, ordering)
+        queryset = queryset.filter(keyset_condition(ordering, position))
+
+    size = page_size(request)
+    items = [item async for item in queryset.order_by(*ordering)[: size + 1]]
+    next_url = None
+    if len(items) > size:
+        items = items[:size]
+        query = request.GET.copy()
+        query["cursor"] = encode_cursor(
+            [getattr(items[-1], field) for field in ordering]
+        )
+        next_url = request.build_absolute_uri(
+            f"{request.path}?{query.urlencode()}"
+        )
+    return {
+        "next": next_url,
+        "previous": None,
+        "results": serializer_class(items, many=True).data,
+    }
+
+
+async def get_object(queryset, pk):
+    instance = await queryset.filter(pk=pk).afirst()
+    if instance is None:
+        raise Http404
+    return instance
+
+
+flights = Flight.objects.select_related("route", "airplane").prefetch_related(
+    "crew"
+)
+routes = Route.objects.select_related("source", "destination")
+airports = Airport.objects.all()
+
+
+@async_read_view
+async def flight_list(request):
+    queryset = flights
+    if route_ids := int_list(request, "route"):
+        queryset = queryset.filter(route_id__in=route_ids)
+    if airplane_ids := int_list(request, "airplane"):
+        queryset = queryset.filter(airplane_id__in=airplane_ids)
+    return await paginate(
+        request, queryset, FlightSerializer, ("departure_time", "id")
+    )
+
+
+@async_read_view
+async def flight_detail(request, pk):
+    return FlightSerializer(await get_object(flights, pk)).data
+
+
+@async_read_view
+async def flight_seats(request, pk):
+    flight = await get_object(Flight.objects.select_related("airplane"), pk)
+    return SeatMapSerializer(await aget_seat_map(flight)).data
+
+
+@async_read_view
+async def route_list(request):
+    queryset = routes
+    if source_ids := int_list(request, "source"):
+        queryset = queryset.filter(source_id__in=source_ids)
+    if destination_ids := int_list(request, "destination"):
+        queryset = queryset.filter(destination_id__in=destination_ids)
+    return await paginate(request, queryset, RouteSerializer)
+
+
+@async_read_view
+async def route_detail(request, pk):
+    return RouteSerializer(await get_object(routes, pk)).data
+
+
+@async_read_view
+async def airport_list(request):
+    queryset = airports
+    if city_ids := int_list(request, "city"):
+        queryset = queryset.filter(closest_big_city_id__in=city_ids)
+    return await paginate(request, queryset, AirportSerializer)
+
+
+@async_read_view
+async def airport_detail(request, pk):
+    return AirportSerializer(await get_object(airports, pk)).data
@@ -0,0 +1,183 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.http import Http404
+from django.urls import Resolver404, resolve
+from drf_spectacular.utils import extend_schema
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from flights.serializers import (
+    BatchRequestSerializer,
+    BatchResponseSerializer,
+)
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ("GET", "HEAD")
+
+# Request headers that describe the batch itself, not a sub-request.
+BATCH_ONLY_META = (
+    "CONTENT_TYPE",
+    "CONTENT_LENGTH",
+    "HTTP_ACCEPT",
+    "QUERY_STRING",
+    "wsgi.input",
+)
+
+
+def error(status_code, detail):
+    return {"status": status_code, "headers": {}, "body": {"detail": detail}}
+
+
+def response_body(response):
+    if not response.content:
+        return None
+    if response.get("Content-Type", "").startswith("application/json"):
+        return json.loads(response.content)
+    return response.content.decode(response.charset, errors="replace")
+
+
+class BatchView(APIView):
+    """Run several API requests in one HTTP round trip.
+
+    Sub-requests go straight to the views the URL resolver picks, without
+    the middleware, in order. The batch is authenticated once and DRF
+    views reuse its user; every view still checks its own permissions
+    and throttles. With ``parallel`` consecutive GET and HEAD requests
+    run concurrently on up to ``BATCH_CONCURRENCY`` threads, while every
+    other request waits for the ones before it. Each of those threads
+    opens its own database connection and closes it when its request is
+    done, so a parallel batch holds up to ``BATCH_CONCURRENCY`` extra
+    connections.
+    """
+
+    # Each sub-request is authorized by the view it reaches.
+    permission_classes = (AllowAny,)
+
+    @extend_schema(
+        summary="Run several API requests at once",
+        request=BatchRequestSerializer,
+        responses={200: BatchResponseSerializer(many=True)},
+    )
+    def post(self, request):
+        serializer = BatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sub_requests = serializer.validated_data["requests"]
+        parallel = serializer.validated_data["parallel"]
+
+        results, reads = [], []
+        for sub_request in sub_requests:
+            if parallel and sub_request["method"] in SAFE_METHODS:
+                reads.append(sub_request)
+                continue
+            results.extend(self.dispatch_reads(reads))
+            reads = []
+            results.append(self.dispatch_sub_request(sub_request))
+        results.extend(self.dispatch_reads(reads))
+        return Response(results)
+
+    def dispatch_reads(self, sub_requests):
+        """Run consecutive reads, on a thread pool when there are several."""
+        if len(sub_requests) < 2:
+            return [
+                self.dispatch_sub_request(sub_request)
+                for sub_request in sub_requests
+            ]
+        with ThreadPoolExecutor(
+            max_workers=min(settings.BATCH_CONCURRENCY, len(sub_requests)),
+            thread_name_prefix="batch",
+        ) as executor:
+            return list(executor.map(self.dispatch_in_thread, sub_requests))
+
+    def dispatch_in_thread(self, sub_request):
+        try:
+            return self.dispatch_sub_request(sub_request)
+        finally:
+            connections.close_all()
+
+    def dispatch_sub_request(self, sub_request):
+        url = urlsplit(sub_request["path"])
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            return error(status.HTTP_404_NOT_FOUND, "Not found.")
+        if getattr(match.func, "view_class", None) is BatchView:
+            return error(
+                status.HTTP_400_BAD_REQUEST, "Batches cannot be nested."
+            )
+
+        http_request = self.build_request(sub_request, url)
+        try:
+            if iscoroutinefunction(match.func):
+                response = async_to_sync(match.func)(
+                    http_request, *match.args, **match.kwargs
+                )
+            else:
+                response = match.func(
+                    http_request, *match.args, **match.kwargs
+                )
+            if hasattr(response, "render"):
+                response.render()
+        except Http404:
+            # Raised by plain Django views; DRF views answer 404 themselves.
+            return error(status.HTTP_404_NOT_FOUND, "Not found.")
+        except Exception:
+            logger.exception("Sub-request to %s failed", url.path)
+            return error(
+                status.HTTP_500_INTERNAL_SERVER_ERROR, "Internal server error."
+            )
+        if response.streaming:
+            return error(
+                status.HTTP_400_BAD_REQUEST,
+                "Streaming responses cannot be batched.",
+            )
+        body = None
+        # Views answer HEAD like GET and leave dropping the body to the
+        # server.
+        if sub_request["method"] != "HEAD":
+            body = response_body(response)
+        return {
+            "status": response.status_code,
+            "headers": dict(response.items()),
+            "body": body,
+        }
+
+    def build_request(self, sub_request, url):
+        content = b""
+        if sub_request.get("body") is not None:
+            content = json.dumps(sub_request["body"]).encode()
+        environ = {
+            key: value
+            for key, value in self.request.META.items()
+            if key not in BATCH_ONLY_META
+        }
+        environ.update(
+            {
+                "REQUEST_METHOD": sub_request["method"],
+                "SCRIPT_NAME": "",
+                "PATH_INFO": url.path,
+                "QUERY_STRING": url.query,
+                "CONTENT_TYPE": "application/json",
+                "CONTENT_LENGTH": str(len(content)),
+                # JSON unless the path asks for another format.
+                "HTTP_ACCEPT": "application/json, */*",
+                "wsgi.input": BytesIO(content),
+                "wsgi.url_scheme": self.request.scheme,
+            }
+        )
+        http_request = WSGIRequest(environ)
+        if self.request.user.is_authenticated:
+            # Read by DRF in place of its authentication classes.
+            http_request._force_auth_user = self.request.user
+            http_request._force_auth_token = self.request.auth
+        return http_request
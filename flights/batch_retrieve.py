@@ -0,0 +1,75 @@
+from django.conf import settings
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework.exceptions import ValidationError
+
+from flights.sparse import SparseFieldsetSchema
+
+
+def parse_ids(request):
+    """Read ``?ids=1,2,3`` (or repeated ``ids``); ``None`` when absent."""
+    values = [
+        value.strip()
+        for param in request.query_params.getlist("ids")
+        for value in param.split(",")
+        if value.strip()
+    ]
+    if not values:
+        return None
+    try:
+        ids = {int(value) for value in values}
+    except ValueError:
+        raise ValidationError({"ids": "Expected comma-separated integers."})
+    if len(ids) > settings.API_MAX_BATCH_IDS:
+        raise ValidationError(
+            {
+                "ids": f"At most {settings.API_MAX_BATCH_IDS} ids can be "
+                "requested at once."
+            }
+        )
+    return ids
+
+
+class BatchRetrieveSchema(SparseFieldsetSchema):
+    def get_override_parameters(self):
+        parameters = super().get_override_parameters()
+        if getattr(self.view, "action", None) == "list":
+            parameters = parameters + [
+                OpenApiParameter(
+                    "ids",
+                    type={"type": "array", "items": {"type": "number"}},
+                    description="Only return these objects, all on one page "
+                    f"(ex. ?ids=1,2,3; at most {settings.API_MAX_BATCH_IDS})",
+                )
+            ]
+        return parameters
+
+
+class BatchRetrieveMixin:
+    """Fetch several objects by id from the list endpoint with ``?ids=``.
+
+    The ids become a ``pk__in`` filter on the list queryset, so the
+    objects arrive with the list's joins in one query, and the page is
+    made large enough to hold all of them.
+    """
+
+    schema = BatchRetrieveSchema()
+
+    def batch_ids(self):
+        if self.action != "list":
+            return None
+        return parse_ids(self.request)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        ids = self.batch_ids()
+        if ids is not None:
+            queryset = queryset.filter(pk__in=ids)
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        ids = self.batch_ids()
+        if ids is not None and self.paginator is not None:
+            # All of them go on one page, whatever ?page_size= says.
+            self.paginator.page_size = len(ids)
+            self.paginator.page_size_query_param = None
+        return super().paginate_queryset(queryset)
@@ -0,0 +1,602 @@
+import asyncio
+import math
+import random
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache.backends.dummy import DummyCache
+from django.db import DatabaseError, connection, migrations
+from django.db.migrations.loader import MigrationLoader
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+
+from flights.models import (
+    Airport,
+    Airplane,
+    City,
+    Country,
+    Crew,
+    Flight,
+    Order,
+    Route,
+    Ticket,
+)
+
+API_PREFIX = "/api/flights"
+
+
+@dataclass
+class Scenario:
+    """One benchmarked endpoint.
+
+    ``build`` receives the ``BenchmarkData`` and returns the path and the
+    request body (or ``None``) of the next request.
+    """
+
+    name: str
+    method: str
+    build: callable
+
+
+class BenchmarkData:
+    """Random but reproducible request parameters drawn from the database."""
+
+    def __init__(self, seed=0, sample_size=1000):
+        self.random = random.Random(seed)
+        self.flights = list(
+            Flight.objects.order_by("?").values(
+                "id",
+                "departure_time",
+                "airplane__rows",
+                "airplane__seats_in_row",
+                "route_id",
+                "route__source_id",
+                "route__destination_id",
+                "route__source__code",
+                "route__destination__code",
+            )[:sample_size]
+        )
+        if not self.flights:
+            raise ValueError("The database has no flights to benchmark.")
+
+    def flight(self):
+        return self.random.choice(self.flights)
+
+    def seat(self, flight):
+        return {
+            "flight": flight["id"],
+            "row": self.random.randint(1, flight["airplane__rows"]),
+            "seat": self.random.randint(1, flight["airplane__seats_in_row"]),
+        }
+
+
+def route_query(flight):
+    departure = timezone.localtime(flight["departure_time"]).date()
+    return (
+        f"from={flight['route__source__code']}"
+        f"&to={flight['route__destination__code']}"
+        f"&date_from={departure}&date_to={departure}"
+    )
+
+
+def connections_query(flight):
+    departure = timezone.localtime(flight["departure_time"]).date()
+    return (
+        f"from={flight['route__source__code']}"
+        f"&to={flight['route__destination__code']}&date={departure}"
+    )
+
+
+SCENARIOS = (
+    Scenario("flights_list", "get", lambda data: (f"{API_PREFIX}/flights/", None)),
+    Scenario(
+        "flights_detail",
+        "get",
+        lambda data: (f"{API_PREFIX}/flights/{data.flight()['id']}/", None),
+    ),
+    Scenario(
+        "flights_search",
+        "get",
+        lambda data: (
+            f"{API_PREFIX}/flights/search/?{route_query(data.flight())}",
+            None,
+        ),
+    ),
+    Scenario(
+        "flights_connections",
+        "get",
+        lambda data: (
+            f"{API_PREFIX}/flights/connections/?{connections_query(data.flight())}",
+            None,
+        ),
+    ),
+    Scenario(
+        "flights_seats",
+        "get",
+        lambda data: (f"{API_PREFIX}/flights/{data.flight()['id']}/seats/", None),
+    ),
+    Scenario("routes_list", "get", lambda data: (f"{API_PREFIX}/routes/", None)),
+    Scenario("airports_list", "get", lambda data: (f"{API_PREFIX}/airports/", None)),
+    Scenario("tickets_list", "get", lambda data: (f"{API_PREFIX}/tickets/", None)),
+    Scenario("orders_list", "get", lambda data: (f"{API_PREFIX}/orders/", None)),
+    Scenario(
+        "orders_book",
+        "post",
+        lambda data: (
+            f"{API_PREFIX}/orders/book/",
+            {"tickets": [data.seat(data.flight())]},
+        ),
+    ),
+)
+
+
+# Pairs of equivalent sync (DRF ViewSet) and async endpoints.
+ASGI_SCENARIOS = (
+    ("flights_list", "/flights/", "/async/flights/"),
+    ("flights_detail", "/flights/{id}/", "/async/flights/{id}/"),
+    ("flights_seats", "/flights/{id}/seats/", "/async/flights/{id}/seats/"),
+    ("routes_list", "/routes/", "/async/routes/"),
+)
+
+
+# List endpoints served by ValuesListMixin, with pages large enough for
+# the rendering to dominate.
+VALUES_SCENARIOS = (
+    ("flights_list", "/flights/?page_size=500"),
+    ("routes_list", "/routes/?page_size=500"),
+    ("cities_list", "/cities/?page_size=500"),
+)
+
+
+# Queries served by the indexes and the unique ticket constraint of
+# migration 0009, with the model and name of the index each one needs.
+INDEX_SCENARIOS = (
+    (
+        "route_by_airports",
+        Route,
+        "route_source_destination_idx",
+        lambda data, flight, user_id: Route.objects.filter(
+            source_id=flight["route__source_id"],
+            destination_id=flight["route__destination_id"],
+        ),
+    ),
+    (
+        "flights_of_route_by_day",
+        Flight,
+        "flight_route_departure_idx",
+        lambda data, flight, user_id: Flight.objects.filter(
+            route_id=flight["route_id"],
+            departure_time__gte=flight["departure_time"] - timedelta(hours=12),
+            departure_time__lt=flight["departure_time"] + timedelta(hours=12),
+        ),
+    ),
+    (
+        "flights_page_by_departure",
+        Flight,
+        "flight_departure_idx",
+        lambda data, flight, user_id: Flight.objects.filter(
+            departure_time__gt=flight["departure_time"]
+        ).order_by("departure_time", "id")[:50],
+    ),
+    (
+        "orders_of_user",
+        Order,
+        "order_user_created_idx",
+        lambda data, flight, user_id: Order.objects.filter(
+            user_id=user_id
+        ).order_by("-created_at")[:50],
+    ),
+    (
+        "ticket_by_seat",
+        Ticket,
+        "unique_ticket_flight_row_seat",
+        lambda data, flight, user_id: Ticket.objects.filter(
+            **data.seat(flight)
+        ),
+    ),
+)
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def explain(sql):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {sql}")
+            return [" ".join(map(str, row)) for row in cursor.fetchall()]
+    except DatabaseError as error:
+        return [f"EXPLAIN failed: {error}"]
+
+
+def slowest_select(queries):
+    selects = [
+        query
+        for query in queries
+        if query["sql"].lstrip().upper().startswith("SELECT")
+    ]
+    return max(selects, key=lambda query: float(query["time"]), default=None)
+
+
+def dataset_summary():
+    return {
+        str(model._meta.verbose_name_plural): model.objects.count()
+        for model in (
+            Country,
+            City,
+            Airport,
+            Route,
+            Airplane,
+            Crew,
+            Flight,
+            Order,
+            Ticket,
+        )
+    }
+
+
+class BenchmarkRunner:
+    """Drive API endpoints through the test client and collect statistics.
+
+    Latency and query counts are measured over ``iterations`` requests per
+    scenario after ``warmup`` unmeasured ones. Peak memory is measured in
+    a separate pass of ``memory_iterations`` requests because tracing
+    allocations slows every request down considerably. Throttling is
+    switched off so the numbers describe the endpoints, not the limits.
+    """
+
+    def __init__(
+        self,
+        user,
+        scenarios=SCENARIOS,
+        iterations=50,
+        warmup=5,
+        memory_iterations=5,
+        seed=0,
+    ):
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.scenarios = scenarios
+        self.iterations = iterations
+        self.warmup = warmup
+        self.memory_iterations = memory_iterations
+        self.data = BenchmarkData(seed=seed)
+
+    def request(self, scenario, path, body):
+        method = getattr(self.client, scenario.method)
+        if body is None:
+            return method(path)
+        return method(path, body, format="json")
+
+    def run_scenario(self, scenario):
+        for _ in range(self.warmup):
+            self.request(scenario, *scenario.build(self.data))
+
+        latencies, query_counts, statuses = [], [], Counter()
+        slowest = None
+        for _ in range(self.iterations):
+            path, body = scenario.build(self.data)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = self.request(scenario, path, body)
+                latencies.append((time.perf_counter() - started) * 1000)
+            statuses[str(response.status_code)] += 1
+            query_counts.append(len(queries))
+            query = slowest_select(queries.captured_queries)
+            if query and (
+                slowest is None or float(query["time"]) > float(slowest["time"])
+            ):
+                slowest = query
+
+        peak = 0
+        tracemalloc.start()
+        try:
+            for _ in range(self.memory_iterations):
+                path, body = scenario.build(self.data)
+                tracemalloc.reset_peak()
+                self.request(scenario, path, body)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "requests": self.iterations,
+            "status_codes": dict(statuses),
+            "latency_ms": {
+                "p50": round(percentile(latencies, 50), 3),
+                "p95": round(percentile(latencies, 95), 3),
+                "mean": round(sum(latencies) / len(latencies), 3),
+                "max": round(max(latencies), 3),
+            },
+            "queries": {
+                "mean": round(sum(query_counts) / len(query_counts), 2),
+                "max": max(query_counts),
+            },
+            "peak_memory_kb": round(peak / 1024, 1),
+            "slowest_query": slowest and {
+                "sql": slowest["sql"],
+                "time_ms": round(float(slowest["time"]) * 1000, 3),
+                "plan": explain(slowest["sql"]),
+            },
+        }
+
+    def run(self, progress=None):
+        results = {}
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+        ), mock.patch.object(APIView, "get_throttles", return_value=[]):
+            for scenario in self.scenarios:
+                results[scenario.name] = self.run_scenario(scenario)
+                if progress:
+                    progress(scenario.name, results[scenario.name])
+        return {
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "debug": settings.DEBUG,
+            "iterations": self.iterations,
+            "dataset": dataset_summary(),
+            "scenarios": results,
+        }
+
+
+def latency_summary(latencies):
+    return {
+        "p50": round(percentile(latencies, 50), 3),
+        "p95": round(percentile(latencies, 95), 3),
+        "p99": round(percentile(latencies, 99), 3),
+        "max": round(max(latencies), 3),
+    }
+
+
+class AsgiBenchmarkRunner:
+    """Compare the sync ViewSets with the async views under ASGI.
+
+    Both stacks are driven through ``AsyncClient``, which goes through the
+    ASGI handler, with ``concurrency`` requests in flight at a time.
+    Sync views pay for the hop into the thread that runs sync code, async
+    views stay on the event loop. Requests are authenticated with a JWT
+    and throttling is switched off.
+    """
+
+    def __init__(self, user, requests=200, concurrency=50, seed=0):
+        self.client = AsyncClient()
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+        self.requests = requests
+        self.concurrency = concurrency
+        self.data = BenchmarkData(seed=seed)
+
+    async def drive(self, paths):
+        pending = iter(paths)
+        latencies, statuses = [], Counter()
+
+        async def worker():
+            for path in pending:
+                started = time.perf_counter()
+                response = await self.client.get(path, headers=self.headers)
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[str(response.status_code)] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        elapsed = time.perf_counter() - started
+        return {
+            "requests_per_second": round(len(latencies) / elapsed, 1),
+            "latency_ms": latency_summary(latencies),
+            "status_codes": dict(statuses),
+        }
+
+    async def run_scenarios(self, progress=None):
+        results = {}
+        for name, sync_path, async_path in ASGI_SCENARIOS:
+            flights = [self.data.flight() for _ in range(self.requests)]
+            results[name] = {}
+            for stack, path in (("sync", sync_path), ("async", async_path)):
+                results[name][stack] = await self.drive(
+                    API_PREFIX + path.format(id=flight["id"])
+                    for flight in flights
+                )
+            if progress:
+                progress(name, results[name])
+        return results
+
+    def run(self, progress=None):
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+        ), mock.patch.object(
+            APIView, "get_throttles", return_value=[]
+        ), mock.patch(
+            "flights.async_views.check_throttles"
+        ):
+            # async_to_sync keeps the ORM calls in this thread, on the same
+            # database connection as the rest of the benchmark.
+            scenarios = async_to_sync(self.run_scenarios)(progress)
+        return {
+            "requests": self.requests,
+            "concurrency": self.concurrency,
+            "scenarios": scenarios,
+        }
+
+
+class ValuesRenderingBenchmarkRunner:
+    """Compare serializer and ``values()`` rendering of the big lists.
+
+    Every scenario runs once with ``VALUES_LIST_RENDERING`` off and once
+    with it on. The reference data cache and throttling are switched off,
+    so every request renders its page.
+    """
+
+    def __init__(self, user, iterations=50, warmup=5):
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.iterations = iterations
+        self.warmup = warmup
+
+    def measure(self, path):
+        for _ in range(self.warmup):
+            self.client.get(path)
+        latencies, statuses = [], Counter()
+        started = time.perf_counter()
+        for _ in range(self.iterations):
+            request_started = time.perf_counter()
+            response = self.client.get(path)
+            latencies.append((time.perf_counter() - request_started) * 1000)
+            statuses[str(response.status_code)] += 1
+        elapsed = time.perf_counter() - started
+        return {
+            "requests_per_second": round(len(latencies) / elapsed, 1),
+            "latency_ms": latency_summary(latencies),
+            "status_codes": dict(statuses),
+        }
+
+    def run(self, progress=None):
+        results = {}
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+        ), mock.patch.object(
+            APIView, "get_throttles", return_value=[]
+        ), mock.patch(
+            "flights.response_cache.get_cache", return_value=DummyCache("", {})
+        ):
+            for name, path in VALUES_SCENARIOS:
+                results[name] = {}
+                for mode, enabled in (("serializer", False), ("values", True)):
+                    with override_settings(VALUES_LIST_RENDERING=enabled):
+                        results[name][mode] = self.measure(API_PREFIX + path)
+                results[name]["speedup"] = round(
+                    results[name]["values"]["requests_per_second"]
+                    / results[name]["serializer"]["requests_per_second"],
+                    2,
+                )
+                if progress:
+                    progress(name, results[name])
+        return {"iterations": self.iterations, "scenarios": results}
+
+
+class IndexBenchmarkRunner:
+    """Compare query plans and timings without and with the 0009 indexes.
+
+    The indexes and the unique ticket constraint of migration 0009 are
+    dropped, every query of ``INDEX_SCENARIOS`` is explained and timed,
+    and they are created again before the same queries are measured a
+    second time. This rewrites the schema of the database, so only run it
+    against a benchmark database. Plans come from ``EXPLAIN ANALYZE`` on
+    PostgreSQL and from ``EXPLAIN QUERY PLAN`` on SQLite.
+    """
+
+    def __init__(self, iterations=50, warmup=5, seed=0):
+        self.iterations = iterations
+        self.warmup = warmup
+        data = BenchmarkData(seed=seed)
+        user_ids = list(
+            Order.objects.values_list("user_id", flat=True).distinct()[:1000]
+        ) or [None]
+        # Both passes run the same queries with the same parameters.
+        self.querysets = {
+            name: [
+                build(data, data.flight(), data.random.choice(user_ids))
+                for _ in range(warmup + iterations)
+            ]
+            for name, _, _, build in INDEX_SCENARIOS
+        }
+
+    @staticmethod
+    def operations():
+        """Yield the operations that drop and recreate each index."""
+        for _, model, index_name, _ in INDEX_SCENARIOS:
+            model_name = model._meta.model_name
+            for index in model._meta.indexes:
+                if index.name == index_name:
+                    yield (
+                        migrations.RemoveIndex(model_name, index_name),
+                        migrations.AddIndex(model_name, index),
+                    )
+            for constraint in model._meta.constraints:
+                if constraint.name == index_name:
+                    yield (
+                        migrations.RemoveConstraint(model_name, index_name),
+                        migrations.AddConstraint(model_name, constraint),
+                    )
+
+    def apply(self, operations):
+        # Through the migration state, as SQLite rebuilds the table from
+        # it to drop a unique constraint.
+        with connection.schema_editor() as editor:
+            for operation in operations:
+                state = self.state.clone()
+                operation.state_forwards("flights", state)
+                operation.database_forwards(
+                    "flights", editor, self.state, state
+                )
+                self.state = state
+
+    def drop_indexes(self):
+        self.state = MigrationLoader(connection).project_state()
+        self.apply(remove for remove, _ in self.operations())
+
+    def create_indexes(self):
+        self.apply(add for _, add in self.operations())
+
+    def measure(self, querysets):
+        options = {}
+        if connection.vendor == "postgresql":
+            options["analyze"] = True
+        plan = querysets[0].explain(**options).splitlines()
+        for queryset in querysets[: self.warmup]:
+            list(queryset.all())
+        latencies = []
+        for queryset in querysets[self.warmup:]:
+            started = time.perf_counter()
+            list(queryset.all())
+            latencies.append((time.perf_counter() - started) * 1000)
+        return {"latency_ms": latency_summary(latencies), "plan": plan}
+
+    def measure_all(self):
+        return {
+            name: self.measure(querysets)
+            for name, querysets in self.querysets.items()
+        }
+
+    def run(self, progress=None):
+        self.drop_indexes()
+        try:
+            before = self.measure_all()
+        finally:
+            started = time.perf_counter()
+            self.create_indexes()
+            rebuild_seconds = time.perf_counter() - started
+        after = self.measure_all()
+
+        results = {}
+        for name, _, index_name, _ in INDEX_SCENARIOS:
+            results[name] = {
+                "index": index_name,
+                "before": before[name],
+                "after": after[name],
+                "speedup": round(
+                    before[name]["latency_ms"]["p50"]
+                    / max(after[name]["latency_ms"]["p50"], 0.001),
+                    1,
+                ),
+            }
+            if progress:
+                progress(name, results[name])
+        return {
+            "iterations": self.iterations,
+            "dataset": dataset_summary(),
+            "index_rebuild_seconds": round(rebuild_seconds, 1),
+            "scenarios": results,
+        }
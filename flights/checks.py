@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Warning, register
+
+
+@register()
+def reference_cache_check(app_configs, **kwargs):
+    alias = settings.REFERENCE_CACHE_ALIAS
+    if settings.WEB_CONCURRENCY < 2 or not isinstance(
+        caches[alias], LocMemCache
+    ):
+        return []
+    return [
+        Warning(
+            f"REFERENCE_CACHE_ALIAS {alias!r} is a LocMemCache, which is not "
+            f"shared by the {settings.WEB_CONCURRENCY} worker processes.",
+            hint=(
+                "Workers keep serving cached reference lists changed by "
+                "another worker for up to REFERENCE_CACHE_TIMEOUT seconds. "
+                "Point the alias at a shared cache such as Redis."
+            ),
+            id="flights.W001",
+        )
+    ]
@@ -0,0 +1,45 @@
+from flights.models import Flight, Order
+from flights.serializers import (
+    CompoundFlightSerializer,
+    CrewSerializer,
+    OrderReadOnlySerializer,
+)
+
+
+def by_id(data):
+    return {item["id"]: item for item in data}
+
+
+def ticket_includes(tickets, fields):
+    """Serialize the flights, crew and orders of ``tickets`` once each.
+
+    Only relations among the rendered ``fields`` of the tickets are
+    included. The serializers get no request, so the sparse fieldset of
+    the tickets does not apply to them.
+    """
+    included = {}
+    if "flight" in fields:
+        flights = list(
+            Flight.objects.filter(
+                pk__in={ticket.flight_id for ticket in tickets}
+            )
+            .select_related("airplane")
+            .prefetch_related("crew")
+        )
+        crew = {
+            member.id: member
+            for flight in flights
+            for member in flight.crew.all()
+        }
+        included["flights"] = by_id(
+            CompoundFlightSerializer(flights, many=True).data
+        )
+        included["crew"] = by_id(CrewSerializer(crew.values(), many=True).data)
+    if "order" in fields:
+        orders = Order.objects.filter(
+            pk__in={ticket.order_id for ticket in tickets}
+        ).select_related("user")
+        included["orders"] = by_id(
+            OrderReadOnlySerializer(orders, many=True).data
+        )
+    return included
@@ -0,0 +1,137 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+# Request headers that make get_conditional_response() compare validators.
+CONDITIONAL_HEADERS = (
+    "HTTP_IF_MATCH",
+    "HTTP_IF_NONE_MATCH",
+    "HTTP_IF_MODIFIED_SINCE",
+    "HTTP_IF_UNMODIFIED_SINCE",
+)
+
+
+def conditional_headers(etag, last_modified):
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified.timestamp())
+    return headers
+
+
+def is_conditional(request):
+    return any(header in request.META for header in CONDITIONAL_HEADERS)
+
+
+def not_modified_response(request, etag, last_modified):
+    """Return a 304 response if the request validators still match."""
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified and int(last_modified.timestamp()),
+    )
+
+
+class ConditionalGetMixin:
+    """Answer list and detail requests with ETag and Last-Modified.
+
+    The validators cover the rows the response shows: one aggregate over
+    ``conditional_fields`` (the ``updated_at`` columns of every model the
+    response renders) of the object, or of the ids on the current page of
+    a list together with whether pages precede or follow it. Requests with
+    ``If-None-Match`` or ``If-Modified-Since`` load the ids of the page
+    first and are answered with 304 before any serialization; the others
+    compute the validators from the page they have rendered, so no request
+    aggregates more than a page of rows.
+    """
+
+    conditional_fields = ("updated_at",)
+
+    def get_validators(self, queryset, page=None):
+        version = self.request.get_full_path()
+        if page is not None:
+            pk = queryset.model._meta.pk.attname
+            ids = [
+                row[pk] if isinstance(row, dict) else row.pk for row in page
+            ]
+            queryset = queryset.filter(pk__in=ids)
+            version += f"|{ids}|{self.paginator.has_previous}"
+            version += f"|{self.paginator.has_next}"
+        aggregates = {
+            f"max_{index}": Max(field)
+            for index, field in enumerate(self.conditional_fields)
+        }
+        state = queryset.order_by().aggregate(
+            count=Count("pk", distinct=True), **aggregates
+        )
+        timestamps = [
+            state[f"max_{index}"]
+            for index in range(len(self.conditional_fields))
+            if state[f"max_{index}"] is not None
+        ]
+        last_modified = max(timestamps, default=None)
+        version += f"|{state['count']}|"
+        if last_modified is not None:
+            version += last_modified.isoformat()
+        digest = hashlib.sha1(version.encode(), usedforsecurity=False)
+        return quote_etag(digest.hexdigest()), last_modified
+
+    def paginates(self):
+        return not self.detail and self.paginator is not None
+
+    def paginate_ids(self, queryset):
+        """Load the ids (and cursor columns) of the requested page only."""
+        ordering = self.paginator.ordering
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return self.paginate_queryset(
+            queryset.select_related(None)
+            .prefetch_related(None)
+            .values(
+                queryset.model._meta.pk.attname,
+                *(field.lstrip("-") for field in ordering),
+            )
+        )
+
+    def conditional_response(self, request, queryset, handler, *args, **kwargs):
+        validators = None
+        if is_conditional(request):
+            page = self.paginate_ids(queryset) if self.paginates() else None
+            validators = self.get_validators(queryset, page)
+            not_modified = not_modified_response(request, *validators)
+            if not_modified is not None:
+                return not_modified
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            if validators is None:
+                page = None
+                if self.paginates():
+                    page = getattr(self.paginator, "page", None)
+                validators = self.get_validators(queryset, page)
+            etag, last_modified = validators
+            for header, value in conditional_headers(etag, last_modified).items():
+                response[header] = value
+            response.last_modified = last_modified
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(
+            request, queryset, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, ValidationError):
+            # Let get_object() turn a malformed lookup into a 404.
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(
+            request, queryset, super().retrieve, *args, **kwargs
+        )
@@ -0,0 +1,311 @@
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from flights.models import Airport, Flight, Route
+
+ROUTE_GRAPH_VERSION_KEY = "flights:route_graph:version"
+
+
+class RouteGraph:
+    """In-memory adjacency index of routes, keyed by source airport.
+
+    The index is built lazily and kept up to date from the Route signals
+    in the process that changed the route. Every change also bumps a
+    version counter in the default cache. Other worker processes see the
+    new version and rebuild their copy before the next search, but only
+    if that cache is shared between them. The default LocMemCache is
+    not, so each process also compares the count and latest
+    ``updated_at`` of the routes with its copy. It does that at most
+    every ``ROUTE_GRAPH_CHECK_INTERVAL`` seconds, which bounds how long
+    a search can use a stale graph. Changes made with
+    ``QuerySet.update()`` skip the signals and ``updated_at``, so they
+    are only picked up at the next rebuild.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._routes = {}
+        self._adjacency = defaultdict(dict)
+        self._version = None
+        self._stamp = None
+        self._checked_at = None
+
+    @staticmethod
+    def shared_version():
+        # A random starting point makes an evicted counter look like a
+        # change instead of silently matching a stale local copy.
+        cache.add(ROUTE_GRAPH_VERSION_KEY, random.randrange(1 << 62), None)
+        return cache.get(ROUTE_GRAPH_VERSION_KEY)
+
+    def _bump_version(self):
+        self.shared_version()
+        try:
+            version = cache.incr(ROUTE_GRAPH_VERSION_KEY)
+        except ValueError:
+            version = None
+        if self._version is not None and version == self._version + 1:
+            self._version = version
+        else:
+            # Somebody else changed the graph in the meantime.
+            self._version = None
+
+    @staticmethod
+    def database_stamp():
+        stamp = Route.objects.aggregate(Count("id"), Max("updated_at"))
+        return stamp["id__count"], stamp["updated_at__max"]
+
+    def rebuild(self):
+        with self._lock:
+            version = self.shared_version()
+            stamp = self.database_stamp()
+            self._routes = {}
+            self._adjacency = defaultdict(dict)
+            for route_id, source_id, destination_id, distance in (
+                Route.objects.values_list(
+                    "id", "source_id", "destination_id", "distance"
+                ).iterator()
+            ):
+                self._add(route_id, source_id, destination_id, distance)
+            self._version = version
+            self._stamp = stamp
+            self._checked_at = time.monotonic()
+
+    def ensure_current(self):
+        with self._lock:
+            if self._version is None or self._version != self.shared_version():
+                self.rebuild()
+                return
+            now = time.monotonic()
+            if now - self._checked_at < settings.ROUTE_GRAPH_CHECK_INTERVAL:
+                return
+            if self.database_stamp() != self._stamp:
+                self.rebuild()
+            else:
+                self._checked_at = now
+
+    def _add(self, route_id, source_id, destination_id, distance):
+        self._routes[route_id] = (source_id, destination_id, distance)
+        self._adjacency[source_id][route_id] = (destination_id, distance)
+
+    def _remove(self, route_id):
+        previous = self._routes.pop(route_id, None)
+        if previous is not None:
+            self._adjacency[previous[0]].pop(route_id, None)
+
+    def update_route(self, route):
+        with self._lock:
+            if self._version is not None:
+                self._remove(route.id)
+                self._add(
+                    route.id,
+                    route.source_id,
+                    route.destination_id,
+                    route.distance,
+                )
+            self._bump_version()
+
+    def remove_route(self, route_id):
+        with self._lock:
+            if self._version is not None:
+                self._remove(route_id)
+            self._bump_version()
+
+    def distance(self, route_id):
+        return self._routes[route_id][2]
+
+    def paths(self, source_id, destination_id, max_stops, deadline=None):
+        """Return route id paths from source to destination.
+
+        Paths never visit the same airport twice and have at most
+        ``max_stops`` intermediate airports.
+        """
+        paths = []
+        with self._lock:
+            stack = [(source_id, (), (source_id,))]
+            while stack:
+                if deadline is not None and time.monotonic() > deadline:
+                    break
+                airport_id, path, visited = stack.pop()
+                for route_id, (next_id, _) in self._adjacency[airport_id].items():
+                    if next_id == destination_id:
+                        paths.append(path + (route_id,))
+                    elif next_id not in visited and len(path) < max_stops:
+                        stack.append(
+                            (next_id, path + (route_id,), visited + (next_id,))
+                        )
+        return paths
+
+
+route_graph = RouteGraph()
+
+
+@dataclass
+class Itinerary:
+    legs: list
+    distance: int
+    stops: int = field(init=False)
+
+    def __post_init__(self):
+        self.stops = len(self.legs) - 1
+
+    @property
+    def departure_time(self):
+        return self.legs[0]["departure_time"]
+
+    @property
+    def arrival_time(self):
+        return self.legs[-1]["arrival_time"]
+
+    @property
+    def duration(self):
+        return self.arrival_time - self.departure_time
+
+
+@dataclass
+class ConnectionSearchResult:
+    itineraries: list
+    truncated: bool
+
+
+SORT_KEYS = {
+    "duration": lambda itinerary: (
+        itinerary.duration,
+        itinerary.distance,
+        itinerary.departure_time,
+    ),
+    "distance": lambda itinerary: (
+        itinerary.distance,
+        itinerary.duration,
+        itinerary.departure_time,
+    ),
+}
+
+
+def find_connections(
+    source_code,
+    destination_code,
+    departure_from,
+    departure_to,
+    max_stops=2,
+    sort="duration",
+    limit=20,
+    min_connection=None,
+    max_connection=None,
+    time_budget=None,
+):
+    """Find itineraries of up to ``max_stops`` connections between airports.
+
+    Candidate route paths come from the in-memory route graph, and the
+    flights of the routes involved are loaded with one query per leg. A
+    connection is valid when the next leg departs between
+    ``min_connection`` and ``max_connection`` after the previous arrival.
+    The search stops once ``time_budget`` (seconds) is spent and reports
+    the partial result as truncated.
+    """
+    if min_connection is None:
+        min_connection = timedelta(minutes=settings.CONNECTION_MIN_MINUTES)
+    if max_connection is None:
+        max_connection = timedelta(minutes=settings.CONNECTION_MAX_MINUTES)
+    if time_budget is None:
+        time_budget = settings.CONNECTION_SEARCH_TIME_BUDGET_MS / 1000
+    deadline = time.monotonic() + time_budget
+
+    airports = dict(
+        Airport.objects.filter(
+            code__in=(source_code, destination_code)
+        ).values_list("code", "id")
+    )
+    if source_code not in airports or destination_code not in airports:
+        return ConnectionSearchResult([], False)
+
+    route_graph.ensure_current()
+    paths = route_graph.paths(
+        airports[source_code], airports[destination_code], max_stops, deadline
+    )
+    if not paths:
+        return ConnectionSearchResult([], time.monotonic() > deadline)
+
+    # The flights of every leg are loaded in the window the flights of the
+    # previous leg can connect to, so long legs do not cut later ones off.
+    legs_by_position = []
+    window = {
+        "departure_time__gte": departure_from,
+        "departure_time__lt": departure_to,
+    }
+    for position in range(max(map(len, paths))):
+        route_ids = {path[position] for path in paths if len(path) > position}
+        flights_by_route = defaultdict(list)
+        for flight in Flight.objects.filter(
+            route_id__in=route_ids, **window
+        ).order_by("departure_time").values(
+            "id", "route_id", "departure_time", "arrival_time"
+        ):
+            flights_by_route[flight["route_id"]].append(flight)
+        departures_by_route = {
+            route_id: [flight["departure_time"] for flight in flights]
+            for route_id, flights in flights_by_route.items()
+        }
+        legs_by_position.append((flights_by_route, departures_by_route))
+        arrivals = [
+            flight["arrival_time"]
+            for flights in flights_by_route.values()
+            for flight in flights
+        ]
+        if not arrivals:
+            break
+        window = {
+            "departure_time__gte": min(arrivals) + min_connection,
+            "departure_time__lte": max(arrivals) + max_connection,
+        }
+
+    itineraries = []
+    truncated = False
+
+    def extend(path, legs):
+        nonlocal truncated
+        if time.monotonic() > deadline:
+            truncated = True
+            return
+        if len(legs) == len(path):
+            itineraries.append(
+                Itinerary(
+                    legs=list(legs),
+                    distance=sum(map(route_graph.distance, path)),
+                )
+            )
+            return
+        if len(legs) == len(legs_by_position):
+            return
+        flights_by_route, departures_by_route = legs_by_position[len(legs)]
+        route_id = path[len(legs)]
+        flights = flights_by_route[route_id]
+        earliest = legs[-1]["arrival_time"] + min_connection
+        latest = legs[-1]["arrival_time"] + max_connection
+        position = bisect_left(departures_by_route.get(route_id, []), earliest)
+        for flight in flights[position:]:
+            if flight["departure_time"] > latest:
+                break
+            extend(path, legs + [flight])
+
+    first_legs = legs_by_position[0][0]
+    for path in paths:
+        for flight in first_legs[path[0]]:
+            if flight["departure_time"] >= departure_to:
+                break
+            extend(path, [flight])
+            if truncated:
+                break
+        if truncated:
+            break
+
+    itineraries.sort(key=SORT_KEYS[sort])
+    return ConnectionSearchResult(itineraries[:limit], truncated)
@@ -0,0 +1,61 @@
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from flights.models import Flight, Ticket
+
+
+def adjust_tickets_sold(flight_ids, delta=1):
+    """Add ``delta`` to ``Flight.tickets_sold`` once per id in ``flight_ids``.
+
+    Each row is changed with an ``F()`` expression, so concurrent
+    bookings never overwrite each other's counts. Flights that change by
+    the same amount share one ``UPDATE``. ``updated_at`` moves too,
+    because the counter is part of the flight representation.
+    """
+    by_delta = defaultdict(list)
+    for flight_id, count in Counter(flight_ids).items():
+        by_delta[count * delta].append(flight_id)
+    now = timezone.now()
+    for change, ids in by_delta.items():
+        Flight.objects.filter(id__in=ids).update(
+            tickets_sold=F("tickets_sold") + change, updated_at=now
+        )
+
+
+def counted_tickets():
+    return Coalesce(
+        Subquery(
+            Ticket.objects.filter(flight=OuterRef("pk"))
+            .order_by()
+            .values("flight")
+            .annotate(count=Count("id"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+def drifted_flights(queryset=None):
+    """Flights whose ``tickets_sold`` differs from their ticket count."""
+    queryset = Flight.objects.all() if queryset is None else queryset
+    return queryset.annotate(counted=counted_tickets()).exclude(
+        tickets_sold=F("counted")
+    )
+
+
+def reconcile_tickets_sold(queryset=None, batch_size=1000):
+    """Recount ``tickets_sold`` of drifted flights and return their ids.
+
+    The new value is computed inside the ``UPDATE`` itself, so a ticket
+    booked while the command runs is not lost.
+    """
+    ids = list(drifted_flights(queryset).values_list("id", flat=True))
+    now = timezone.now()
+    for start in range(0, len(ids), batch_size):
+        Flight.objects.filter(id__in=ids[start:start + batch_size]).update(
+            tickets_sold=counted_tickets(), updated_at=now
+        )
+    return ids
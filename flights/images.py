@@ -0,0 +1,108 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from flights.models import Airplane
+from jobs.registry import enqueue
+
+GENERATE_VARIANTS = "flights.generate_image_variants"
+
+# Variant name -> bounding box; images are scaled down to fit, never up.
+VARIANT_SIZES = {
+    "thumbnail": (320, 320),
+    "medium": (1024, 1024),
+}
+VARIANT_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def variant_path(image_name, variant, extension):
+    directory, filename = os.path.split(image_name)
+    stem, _ = os.path.splitext(filename)
+    return os.path.join(directory, "variants", f"{stem}-{variant}.{extension}")
+
+
+def open_image(image_file, size):
+    image = Image.open(image_file)
+    # Let the JPEG decoder scale by a power of two while decoding, which
+    # is much cheaper than decoding the full image and resizing it.
+    image.draft("RGB", size)
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
+
+
+def render_variants(image_file):
+    """Yield ``(variant, extension, bytes)`` for every variant of an image."""
+    largest = max(VARIANT_SIZES.values())
+    with open_image(image_file, largest) as original:
+        for variant, size in sorted(
+            VARIANT_SIZES.items(), key=lambda item: item[1], reverse=True
+        ):
+            image = original.copy()
+            image.thumbnail(size, Image.Resampling.LANCZOS)
+            for extension, (image_format, options) in VARIANT_FORMATS.items():
+                buffer = BytesIO()
+                image.save(buffer, image_format, **options)
+                yield variant, extension, buffer.getvalue()
+
+
+def delete_variants(variants):
+    for formats in variants.values():
+        for path in formats.values():
+            default_storage.delete(path)
+
+
+def generate_variants(airplane_id):
+    """Store resized WebP and JPEG copies of an airplane image.
+
+    The paths are saved to ``Airplane.image_variants`` only if the image
+    has not been replaced meanwhile; otherwise the new files are removed
+    again and the processing of the newer upload wins.
+    """
+    airplane = Airplane.objects.filter(pk=airplane_id).first()
+    if airplane is None or not airplane.image:
+        return None
+    image_name = airplane.image.name
+    variants = {}
+    with airplane.image.open("rb") as image_file:
+        for variant, extension, content in render_variants(image_file):
+            path = default_storage.save(
+                variant_path(image_name, variant, extension),
+                ContentFile(content),
+            )
+            variants.setdefault(variant, {})[extension] = path
+
+    with transaction.atomic():
+        current = (
+            Airplane.objects.select_for_update()
+            .filter(pk=airplane_id, image=image_name)
+            .values_list("image_variants", flat=True)
+            .first()
+        )
+        if current is None:
+            delete_variants(variants)
+            return None
+        Airplane.objects.filter(pk=airplane_id).update(
+            image_variants=variants, updated_at=timezone.now()
+        )
+    # Storage never overwrites files, so none of these are the new ones.
+    delete_variants(current)
+    return variants
+
+
+def schedule_variants(airplane_id):
+    """Queue the generation of the variants for a background worker.
+
+    The job is created in the transaction that saves the upload, so a
+    worker only picks it up once the new image is committed.
+    """
+    enqueue(GENERATE_VARIANTS, {"airplane_id": airplane_id})
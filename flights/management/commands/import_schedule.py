@@ -0,0 +1,256 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from flights.models import Airplane, Airport, Crew, Flight, Route
+
+FIELDS = ("source", "destination", "airplane", "departure_time", "arrival_time")
+
+
+# Fields that hold airport codes or airplane names.
+NAMES = ("source", "destination", "airplane")
+
+
+class RowError(ValueError):
+    pass
+
+
+# Readers yield (line number, row) pairs. A line that cannot be parsed is
+# yielded as a RowError, so it is skipped like any other invalid row.
+def read_csv(file):
+    reader = csv.DictReader(file)
+    for row in reader:
+        crew = row.get("crew") or ""
+        row["crew"] = [crew_id for crew_id in crew.split(";") if crew_id]
+        yield reader.line_num, row
+
+
+def read_jsonl(file):
+    for line_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as error:
+            yield line_number, RowError(f"invalid JSON: {error.msg}")
+
+
+READERS = {".csv": read_csv, ".jsonl": read_jsonl, ".ndjson": read_jsonl}
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def parse_time(value):
+    parsed = parse_datetime(str(value or ""))
+    if parsed is None:
+        raise RowError(f"invalid datetime {value!r}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Import flight schedules from CSV or JSON Lines files. Each row has "
+        "source and destination airport codes, an airplane name, ISO 8601 "
+        "departure_time and arrival_time and optional crew ids "
+        "(';'-separated in CSV, a list in JSONL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+", type=Path)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows validated and written per transaction.",
+        )
+        parser.add_argument(
+            "--method",
+            choices=("auto", "bulk", "copy"),
+            default="auto",
+            help="Write with bulk_create or PostgreSQL COPY "
+            "(auto picks COPY on PostgreSQL).",
+        )
+        parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="Abort on the first invalid row instead of skipping it.",
+        )
+
+    def handle(self, *args, **options):
+        method = options["method"]
+        if method == "auto":
+            method = "copy" if connection.vendor == "postgresql" else "bulk"
+        if method == "copy" and connection.vendor != "postgresql":
+            raise CommandError("COPY is only available on PostgreSQL.")
+        self.write_batch = self.copy_batch if method == "copy" else self.bulk_batch
+        self.strict = options["strict"]
+        self.verbosity = options["verbosity"]
+        self.load_lookups()
+
+        started = time.monotonic()
+        imported = skipped = 0
+        for path in options["files"]:
+            reader = READERS.get(path.suffix.lower())
+            if reader is None:
+                raise CommandError(f"Unsupported file type: {path}")
+            with path.open(newline="", encoding="utf-8") as file:
+                for batch in batched(reader(file), options["batch_size"]):
+                    flights, crew = self.validate_batch(path, batch)
+                    skipped += len(batch) - len(flights)
+                    with transaction.atomic():
+                        self.write_batch(flights, crew)
+                    imported += len(flights)
+                    self.report(imported, started, verbosity=2)
+
+        self.report(imported, started, verbosity=1, style=self.style.SUCCESS)
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"Skipped {skipped} invalid rows"))
+
+    def load_lookups(self):
+        self.airports = dict(Airport.objects.values_list("code", "id"))
+        self.routes = {}
+        for route_id, source_id, destination_id in Route.objects.order_by(
+            "-id"
+        ).values_list("id", "source_id", "destination_id"):
+            self.routes[source_id, destination_id] = route_id
+        self.airplanes = {}
+        self.ambiguous_airplanes = set()
+        for airplane_id, name in Airplane.objects.values_list("id", "name"):
+            if name in self.airplanes:
+                self.ambiguous_airplanes.add(name)
+            self.airplanes[name] = airplane_id
+        self.crew_ids = set(Crew.objects.values_list("id", flat=True))
+
+    def validate_row(self, row):
+        if isinstance(row, RowError):
+            raise row
+        if not isinstance(row, dict):
+            raise RowError("row is not an object")
+        missing = [field for field in FIELDS if not row.get(field)]
+        if missing:
+            raise RowError(f"missing {', '.join(missing)}")
+        for field in NAMES:
+            if not isinstance(row[field], str):
+                raise RowError(f"invalid {field} {row[field]!r}")
+        try:
+            source_id = self.airports[row["source"].upper()]
+            destination_id = self.airports[row["destination"].upper()]
+        except KeyError as error:
+            raise RowError(f"unknown airport {error.args[0]}")
+        route_id = self.routes.get((source_id, destination_id))
+        if route_id is None:
+            raise RowError(
+                f"no route from {row['source']} to {row['destination']}"
+            )
+        name = row["airplane"]
+        if name not in self.airplanes:
+            raise RowError(f"unknown airplane {name!r}")
+        if name in self.ambiguous_airplanes:
+            raise RowError(f"airplane name {name!r} is not unique")
+        departure_time = parse_time(row["departure_time"])
+        arrival_time = parse_time(row["arrival_time"])
+        if arrival_time <= departure_time:
+            raise RowError("arrival_time must be after departure_time")
+        try:
+            crew = [int(crew_id) for crew_id in row.get("crew") or ()]
+        except (TypeError, ValueError):
+            raise RowError(f"invalid crew {row.get('crew')!r}")
+        unknown = set(crew) - self.crew_ids
+        if unknown:
+            raise RowError(f"unknown crew {sorted(unknown)}")
+        flight = Flight(
+            route_id=route_id,
+            airplane_id=self.airplanes[name],
+            departure_time=departure_time,
+            arrival_time=arrival_time,
+        )
+        return flight, crew
+
+    def validate_batch(self, path, batch):
+        flights, crew = [], []
+        for line, row in batch:
+            try:
+                flight, flight_crew = self.validate_row(row)
+            except RowError as error:
+                message = f"{path}:{line}: {error}"
+                if self.strict:
+                    raise CommandError(message)
+                if self.verbosity:
+                    self.stderr.write(message)
+                continue
+            flights.append(flight)
+            crew.append(flight_crew)
+        return flights, crew
+
+    def bulk_batch(self, flights, crew):
+        Flight.objects.bulk_create(flights)
+        Through = Flight.crew.through
+        Through.objects.bulk_create(
+            Through(flight_id=flight.id, crew_id=crew_id)
+            for flight, flight_crew in zip(flights, crew)
+            for crew_id in flight_crew
+        )
+
+    def copy_batch(self, flights, crew):
+        if not flights:
+            return
+        table = Flight._meta.db_table
+        through = Flight.crew.through._meta.db_table
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            # Reserve the ids up front so the crew rows can reference them.
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+                "FROM generate_series(1, %s)",
+                [table, len(flights)],
+            )
+            for flight, (flight_id,) in zip(flights, cursor.fetchall()):
+                flight.id = flight_id
+
+            buffer = io.StringIO()
+            for flight in flights:
+                buffer.write(
+                    f"{flight.id}\t{flight.route_id}\t{flight.airplane_id}\t"
+                    f"{flight.departure_time.isoformat()}\t"
+                    f"{flight.arrival_time.isoformat()}\t"
+                    f"{flight.tickets_sold}\t{now.isoformat()}\n"
+                )
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY {table} (id, route_id, airplane_id, departure_time, "
+                "arrival_time, tickets_sold, updated_at) FROM STDIN",
+                buffer,
+            )
+
+            buffer = io.StringIO()
+            for flight, flight_crew in zip(flights, crew):
+                for crew_id in flight_crew:
+                    buffer.write(f"{flight.id}\t{crew_id}\n")
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY {through} (flight_id, crew_id) FROM STDIN", buffer
+            )
+
+    def report(self, imported, started, verbosity, style=None):
+        if self.verbosity < verbosity:
+            return
+        elapsed = max(time.monotonic() - started, 1e-9)
+        message = (
+            f"Imported {imported} flights in {elapsed:.1f}s "
+            f"({imported / elapsed:,.0f} rows/s)"
+        )
+        self.stdout.write(style(message) if style else message)
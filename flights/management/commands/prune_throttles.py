@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from flights.throttling import prune
+
+
+class Command(BaseCommand):
+    help = "Delete throttle buckets that no longer affect any rate limit."
+
+    def handle(self, *args, **options):
+        deleted = prune()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} throttle buckets"))
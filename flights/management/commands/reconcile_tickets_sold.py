@@ -0,0 +1,43 @@
+from django.core.management import BaseCommand
+
+from flights.counters import drifted_flights, reconcile_tickets_sold
+from flights.models import Flight
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount Flight.tickets_sold from the tickets and repair flights "
+        "whose counter has drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--flight",
+            type=int,
+            action="append",
+            help="Only check the given flight (repeatable).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drifted flights without changing them.",
+        )
+
+    def handle(self, *args, **options):
+        queryset = Flight.objects.all()
+        if options["flight"]:
+            queryset = queryset.filter(id__in=options["flight"])
+
+        if options["dry_run"]:
+            for flight_id, stored, counted in drifted_flights(
+                queryset
+            ).values_list("id", "tickets_sold", "counted"):
+                self.stdout.write(
+                    f"Flight {flight_id}: {stored} stored, {counted} counted"
+                )
+            return
+
+        repaired = reconcile_tickets_sold(queryset)
+        self.stdout.write(
+            self.style.SUCCESS(f"Repaired {len(repaired)} flights")
+        )
@@ -0,0 +1,163 @@
+import json
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError
+
+from flights.benchmarks import (
+    SCENARIOS,
+    AsgiBenchmarkRunner,
+    BenchmarkRunner,
+    IndexBenchmarkRunner,
+    ValuesRenderingBenchmarkRunner,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the API hot paths against the current database and write "
+        "p50/p95 latency, queries per request and peak memory to a JSON "
+        "report. Run seed_benchmark first; the booking scenario creates "
+        "orders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", type=Path, default=Path("benchmark.json")
+        )
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--memory-iterations", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=[scenario.name for scenario in SCENARIOS],
+            help="Only run the given scenario (repeatable).",
+        )
+        parser.add_argument(
+            "--asgi-concurrency",
+            type=int,
+            default=0,
+            help="Also compare the sync and async read endpoints under ASGI "
+            "with this many requests in flight.",
+        )
+        parser.add_argument(
+            "--asgi-requests",
+            type=int,
+            default=200,
+            help="Requests per endpoint and stack in the ASGI comparison.",
+        )
+        parser.add_argument(
+            "--values-rendering",
+            action="store_true",
+            help="Also compare serializer and values() rendering of the "
+            "large list endpoints.",
+        )
+        parser.add_argument(
+            "--indexes",
+            action="store_true",
+            help="Also compare query plans and timings without and with the "
+            "indexes of migration 0009. Drops and recreates them, so only "
+            "use a benchmark database.",
+        )
+        parser.add_argument(
+            "--user",
+            default="benchmark@example.com",
+            help="Email of the staff user the requests are made as.",
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        scenarios = SCENARIOS
+        if options["scenario"]:
+            scenarios = [
+                scenario
+                for scenario in SCENARIOS
+                if scenario.name in options["scenario"]
+            ]
+
+        user, _ = get_user_model().objects.get_or_create(
+            email=options["user"],
+            defaults={"is_staff": True, "password": make_password(None)},
+        )
+        try:
+            runner = BenchmarkRunner(
+                user,
+                scenarios=scenarios,
+                iterations=options["iterations"],
+                warmup=options["warmup"],
+                memory_iterations=options["memory_iterations"],
+                seed=options["seed"],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+
+        report = runner.run(progress=self.progress)
+        if options["asgi_concurrency"] > 0:
+            report["asgi"] = AsgiBenchmarkRunner(
+                user,
+                requests=options["asgi_requests"],
+                concurrency=options["asgi_concurrency"],
+                seed=options["seed"],
+            ).run(progress=self.asgi_progress)
+        if options["values_rendering"]:
+            report["values_rendering"] = ValuesRenderingBenchmarkRunner(
+                user,
+                iterations=options["iterations"],
+                warmup=options["warmup"],
+            ).run(progress=self.values_progress)
+        if options["indexes"]:
+            report["indexes"] = IndexBenchmarkRunner(
+                iterations=options["iterations"],
+                warmup=options["warmup"],
+                seed=options["seed"],
+            ).run(progress=self.index_progress)
+        if report["debug"]:
+            self.stderr.write(
+                self.style.WARNING(
+                    "DEBUG is on; the numbers include debug overhead."
+                )
+            )
+        options["output"].write_text(json.dumps(report, indent=2))
+        self.stdout.write(
+            self.style.SUCCESS(f"Benchmark report written to {options['output']}")
+        )
+
+    def progress(self, name, result):
+        latency = result["latency_ms"]
+        self.stdout.write(
+            f"{name:<22} p50 {latency['p50']:>9.2f} ms  "
+            f"p95 {latency['p95']:>9.2f} ms  "
+            f"{result['queries']['mean']:>6.1f} queries  "
+            f"{result['peak_memory_kb']:>9.1f} KiB"
+        )
+
+    def asgi_progress(self, name, result):
+        for stack in ("sync", "async"):
+            self.stdout.write(
+                f"{name + ' ' + stack:<22} "
+                f"{result[stack]['requests_per_second']:>9.1f} req/s  "
+                f"p95 {result[stack]['latency_ms']['p95']:>9.2f} ms  "
+                f"p99 {result[stack]['latency_ms']['p99']:>9.2f} ms"
+            )
+
+    def values_progress(self, name, result):
+        for mode in ("serializer", "values"):
+            self.stdout.write(
+                f"{name + ' ' + mode:<22} "
+                f"{result[mode]['requests_per_second']:>9.1f} req/s  "
+                f"p95 {result[mode]['latency_ms']['p95']:>9.2f} ms"
+            )
+        self.stdout.write(f"{name + ' speedup':<22} {result['speedup']:>9.2f}x")
+
+    def index_progress(self, name, result):
+        for state in ("before", "after"):
+            latency = result[state]["latency_ms"]
+            self.stdout.write(
+                f"{name + ' ' + state:<32} p50 {latency['p50']:>9.3f} ms  "
+                f"p95 {latency['p95']:>9.3f} ms"
+            )
+        self.stdout.write(f"{name + ' speedup':<32} {result['speedup']:>9.1f}x")
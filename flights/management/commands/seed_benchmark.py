@@ -0,0 +1,222 @@
+import random
+import time
+from datetime import timedelta
+from itertools import product
+from string import ascii_uppercase
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from flights.counters import adjust_tickets_sold
+from flights.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    City,
+    Country,
+    Crew,
+    Flight,
+    Order,
+    Route,
+    Ticket,
+)
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = "Fill the database with a synthetic dataset for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--countries", type=int, default=20)
+        parser.add_argument("--cities", type=int, default=100)
+        parser.add_argument("--airports", type=int, default=200)
+        parser.add_argument("--routes", type=int, default=2000)
+        parser.add_argument("--airplane-types", type=int, default=10)
+        parser.add_argument("--airplanes", type=int, default=100)
+        parser.add_argument("--crew", type=int, default=500)
+        parser.add_argument("--flights", type=int, default=20000)
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=30,
+            help="Flights are spread over this many days from today.",
+        )
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--orders", type=int, default=10000)
+        parser.add_argument(
+            "--tickets-per-order",
+            type=int,
+            default=3,
+            help="Maximum number of tickets in one order.",
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        started = time.monotonic()
+
+        with transaction.atomic():
+            countries = self.create(
+                Country,
+                (Country(name=f"Country {i}") for i in range(options["countries"])),
+            )
+            cities = self.create(
+                City,
+                (
+                    City(name=f"City {i}", country=self.random.choice(countries))
+                    for i in range(options["cities"])
+                ),
+            )
+            airports = self.create(
+                Airport,
+                (
+                    Airport(
+                        name=f"Airport {code}",
+                        code=code,
+                        closest_big_city=self.random.choice(cities),
+                    )
+                    for code in self.airport_codes(options["airports"])
+                ),
+            )
+            routes = self.create(Route, self.routes(airports, options["routes"]))
+            airplane_types = self.create(
+                AirplaneType,
+                (
+                    AirplaneType(name=f"Type {i}")
+                    for i in range(options["airplane_types"])
+                ),
+            )
+            airplanes = self.create(
+                Airplane,
+                (
+                    Airplane(
+                        name=f"Airplane {i}",
+                        rows=self.random.randint(20, 60),
+                        seats_in_row=self.random.choice((4, 6, 9, 10)),
+                        airplane_type=self.random.choice(airplane_types),
+                    )
+                    for i in range(options["airplanes"])
+                ),
+            )
+            crew = self.create(
+                Crew,
+                (
+                    Crew(first_name=f"First {i}", last_name=f"Last {i}")
+                    for i in range(options["crew"])
+                ),
+            )
+            flights = self.create(
+                Flight,
+                self.flights(routes, airplanes, options["flights"], options["days"]),
+            )
+            self.create(
+                Flight.crew.through,
+                (
+                    Flight.crew.through(flight_id=flight.id, crew_id=member.id)
+                    for flight in flights
+                    for member in self.random.sample(crew, min(len(crew), 4))
+                ),
+            )
+            users = self.users(options["users"])
+            self.orders_and_tickets(
+                users,
+                flights,
+                {airplane.id: airplane for airplane in airplanes},
+                options["orders"],
+                options["tickets_per_order"],
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded benchmark data in {time.monotonic() - started:.1f}s"
+            )
+        )
+
+    def create(self, model, objects):
+        created = model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+        self.stdout.write(f"  {len(created)} {model._meta.verbose_name_plural}")
+        return created
+
+    def airport_codes(self, count):
+        existing = set(Airport.objects.values_list("code", flat=True))
+        codes = (
+            "".join(letters)
+            for letters in product(ascii_uppercase, repeat=3)
+            if "".join(letters) not in existing
+        )
+        return [code for code, _ in zip(codes, range(count))]
+
+    def routes(self, airports, count):
+        pairs = set()
+        while len(pairs) < min(count, len(airports) * (len(airports) - 1)):
+            source, destination = self.random.sample(airports, 2)
+            if (source.id, destination.id) not in pairs:
+                pairs.add((source.id, destination.id))
+                yield Route(
+                    source=source,
+                    destination=destination,
+                    distance=self.random.randint(200, 12000),
+                )
+
+    def flights(self, routes, airplanes, count, days):
+        start = timezone.now().replace(minute=0, second=0, microsecond=0)
+        for _ in range(count):
+            route = self.random.choice(routes)
+            departure_time = start + timedelta(
+                minutes=5 * self.random.randrange(days * 24 * 12)
+            )
+            yield Flight(
+                route=route,
+                airplane=self.random.choice(airplanes),
+                departure_time=departure_time,
+                arrival_time=departure_time
+                + timedelta(minutes=max(45, route.distance // 12)),
+            )
+
+    def users(self, count):
+        User = get_user_model()
+        password = make_password(None)
+        prefix = f"bench-{int(time.time())}"
+        return self.create(
+            User,
+            (
+                User(email=f"{prefix}-{i}@example.com", password=password)
+                for i in range(count)
+            ),
+        )
+
+    def orders_and_tickets(self, users, flights, airplanes, count, per_order):
+        orders = self.create(
+            Order,
+            (Order(user=self.random.choice(users)) for _ in range(count)),
+        )
+        taken = {}
+
+        def tickets():
+            for order in orders:
+                flight = self.random.choice(flights)
+                airplane = airplanes[flight.airplane_id]
+                seats = taken.setdefault(flight.id, set())
+                for _ in range(self.random.randint(1, per_order)):
+                    if len(seats) >= airplane.capacity:
+                        break
+                    while True:
+                        seat = (
+                            self.random.randint(1, airplane.rows),
+                            self.random.randint(1, airplane.seats_in_row),
+                        )
+                        if seat not in seats:
+                            break
+                    seats.add(seat)
+                    yield Ticket(
+                        flight=flight, order=order, row=seat[0], seat=seat[1]
+                    )
+
+        self.create(Ticket, tickets())
+        adjust_tickets_sold(
+            flight_id for flight_id, seats in taken.items() for _ in seats
+        )
@@ -0,0 +1,136 @@
+import os
+import secrets
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LABELS = ("view", "action", "method")
+
+REQUESTS = Counter(
+    "airport_api_requests_total",
+    "Requests handled, by ViewSet action and response status.",
+    LABELS + ("status",),
+)
+LATENCY = Histogram(
+    "airport_api_request_duration_seconds",
+    "Request latency, by ViewSet action.",
+    LABELS,
+    buckets=(
+        0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0,
+        10.0,
+    ),
+)
+QUERIES = Histogram(
+    "airport_api_request_queries",
+    "SQL queries per request, by ViewSet action.",
+    LABELS,
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+THROTTLED = Counter(
+    "airport_api_throttled_requests_total",
+    "Requests rejected with 429 Too Many Requests, by ViewSet action.",
+    LABELS,
+)
+
+
+def view_labels(request):
+    """Label a request with its view class and ViewSet action.
+
+    Labels come from the resolved URL pattern rather than the path, so
+    the number of series stays bounded.
+    """
+    method = request.method
+    match = request.resolver_match
+    if match is None:
+        return "unmatched", "", method
+    view = match.func
+    view_class = getattr(view, "cls", None) or getattr(view, "view_class", None)
+    name = view_class.__name__ if view_class else match.view_name
+    actions = getattr(view, "actions", None) or {}
+    return name, actions.get(method.lower(), ""), method
+
+
+class PrometheusMetricsMiddleware:
+    """Record request counts, latency and queries per request.
+
+    The query count is taken from the ``ServerTimingMiddleware`` timings,
+    so this middleware must come right after it in ``MIDDLEWARE``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    @staticmethod
+    def observe(request, response, started):
+        labels = view_labels(request)
+        LATENCY.labels(*labels).observe(perf_counter() - started)
+        REQUESTS.labels(*labels, str(response.status_code)).inc()
+        timings = getattr(request, "server_timing", None)
+        if timings is not None:
+            QUERIES.labels(*labels).observe(timings.db_queries)
+        if response.status_code == 429:
+            THROTTLED.labels(*labels).inc()
+
+
+def get_registry():
+    """Return the registry to expose.
+
+    With ``PROMETHEUS_MULTIPROC_DIR`` set (it must be set before the
+    workers start), every worker process writes its samples to
+    memory-mapped files in that directory and the registry aggregates
+    them, so any worker can answer a scrape for all of them. The
+    directory has to be emptied before the server starts, and the server
+    has to call ``multiprocess.mark_process_dead(pid)`` when a worker
+    exits (see the ``METRICS_TOKEN`` setting).
+    """
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        allowed = secrets.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        )
+    else:
+        # Without a token only staff signed in through the admin may look.
+        allowed = request.user.is_staff
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST
+    )
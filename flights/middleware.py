@@ -0,0 +1,72 @@
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from flights.timing import RequestTimings, current_timings, elapsed_ms
+
+
+class ServerTimingMiddleware:
+    """Measure every request and report it in ``Server-Timing``.
+
+    SQL is counted and timed by the ``instrument`` execute wrapper. The
+    view time runs from ``process_view`` until the response is returned
+    or handed over for rendering, and rendering is timed through a
+    post-render callback. Each request is also logged as one JSON line
+    on the ``flights.requests`` logger. Place it first in ``MIDDLEWARE``
+    so the total covers all other middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        request.server_timing = timings
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        request.server_timing = timings
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response)
+
+    def finish(self, request, response):
+        timings = request.server_timing
+        if timings.view_started is not None and timings.view_ms is None:
+            timings.view_ms = elapsed_ms(timings.view_started)
+        if settings.SERVER_TIMING_HEADER:
+            response["Server-Timing"] = timings.header()
+        timings.log(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.server_timing.view_started = perf_counter()
+
+    def process_template_response(self, request, response):
+        timings = request.server_timing
+        if timings.view_started is not None:
+            timings.view_ms = elapsed_ms(timings.view_started)
+        timings.render_started = perf_counter()
+
+        def rendered(response):
+            timings.render_ms = elapsed_ms(timings.render_started)
+
+        response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.6 on 2026-10-17 05:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flights", "0008_alter_airport_code"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="flight",
+            index=models.Index(
+                fields=["route", "departure_time"], name="flight_route_departure_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="flight",
+            index=models.Index(
+                fields=["departure_time", "id"], name="flight_departure_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "created_at"], name="order_user_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="route",
+            index=models.Index(
+                fields=["source", "destination"], name="route_source_destination_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="ticket",
+            constraint=models.UniqueConstraint(
+                fields=("flight", "row", "seat"), name="unique_ticket_flight_row_seat"
+            ),
+        ),
+    ]
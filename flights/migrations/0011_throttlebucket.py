@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-17 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flights", "0010_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ThrottleBucket",
+            fields=[
+                (
+                    "key",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("period", models.BigIntegerField()),
+                ("hits", models.PositiveIntegerField()),
+                ("previous_hits", models.PositiveIntegerField()),
+                ("allowed", models.BooleanField()),
+                ("expires_at", models.BigIntegerField(db_index=True)),
+            ],
+        ),
+    ]
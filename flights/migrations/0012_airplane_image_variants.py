@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flights", "0011_throttlebucket"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="airplane",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-17 06:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_tickets_sold(apps, schema_editor):
+    Flight = apps.get_model("flights", "Flight")
+    Ticket = apps.get_model("flights", "Ticket")
+    Flight.objects.update(
+        tickets_sold=Coalesce(
+            Subquery(
+                Ticket.objects.filter(flight=OuterRef("pk"))
+                .order_by()
+                .values("flight")
+                .annotate(count=Count("id"))
+                .values("count")
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flights", "0012_airplane_image_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="flight",
+            name="tickets_sold",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_tickets_sold, migrations.RunPython.noop),
+    ]
@@ -9,6 +9,7 @@ from django.utils.text import slugify
 
 class Country(models.Model):
     name = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -17,6 +18,7 @@ class Country(models.Model):
 class City(models.Model):
     name = models.CharField(max_length=64)
     country = models.ForeignKey(Country, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -26,6 +28,7 @@ class Airport(models.Model):
     name = models.CharField(max_length=64)
     code = models.CharField(max_length=3, unique=True)
     closest_big_city = models.ForeignKey(City, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.name} ({self.code})"
@@ -33,6 +36,7 @@ class Airport(models.Model):
 
 class AirplaneType(models.Model):
     name = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -50,7 +54,10 @@ class Airplane(models.Model):
     rows = models.IntegerField()
     seats_in_row = models.IntegerField()
     image = models.ImageField(null=True, upload_to=airplane_image_file_path)
+    # Variant name -> format -> storage path, filled in by flights.images.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     airplane_type = models.ForeignKey(AirplaneType, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["name"]
@@ -71,6 +78,15 @@ class Route(models.Model):
         Airport, related_name="routes_to", on_delete=models.CASCADE
     )
     distance = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["source", "destination"],
+                name="route_source_destination_idx",
+            ),
+        ]
 
     def __str__(self):
         distance_km = self.distance
@@ -81,6 +97,7 @@ class Route(models.Model):
 class Crew(models.Model):
     first_name = models.CharField(max_length=64)
     last_name = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.first_name + " " + self.last_name
@@ -96,6 +113,26 @@ class Flight(models.Model):
     crew = models.ManyToManyField(Crew)
     departure_time = models.DateTimeField()
     arrival_time = models.DateTimeField()
+    # Maintained by flights.counters; repair drift with
+    # ``manage.py reconcile_tickets_sold``.
+    tickets_sold = models.IntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["route", "departure_time"],
+                name="flight_route_departure_idx",
+            ),
+            models.Index(
+                fields=["departure_time", "id"],
+                name="flight_departure_idx",
+            ),
+        ]
+
+    @property
+    def tickets_available(self) -> int:
+        return self.airplane.capacity - self.tickets_sold
 
     def __str__(self):
         return f"Flight {self.id} on route {self.route}"
@@ -108,6 +145,15 @@ class Order(models.Model):
         on_delete=models.CASCADE,
         related_name="orders",
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "created_at"],
+                name="order_user_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Order {self.id} by {self.user}"
@@ -118,6 +164,33 @@ class Ticket(models.Model):
     seat = models.IntegerField()
     flight = models.ForeignKey(Flight, on_delete=models.CASCADE)
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["flight", "row", "seat"],
+                name="unique_ticket_flight_row_seat",
+            ),
+        ]
 
     def __str__(self):
         return f"Ticket {self.id} for flight {self.flight}"
+
+
+class ThrottleBucket(models.Model):
+    """Sliding-window request counter of one throttle key.
+
+    Only the hits of the current and the previous window are kept, so a
+    throttle check is a single upsert of a fixed-size row.
+    """
+
+    key = models.CharField(max_length=255, primary_key=True)
+    period = models.BigIntegerField()
+    hits = models.PositiveIntegerField()
+    previous_hits = models.PositiveIntegerField()
+    allowed = models.BooleanField()
+    expires_at = models.BigIntegerField(db_index=True)
+
+    def __str__(self):
+        return self.key
@@ -0,0 +1,145 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+def keyset_condition(ordering, position, reverse=False):
+    """Match the rows after ``position`` in ``ordering``.
+
+    ``reverse`` matches the rows before it instead. Spelled out as
+    ``(a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)``.
+    """
+    condition = Q()
+    for index, field in enumerate(ordering):
+        descending = field.startswith("-")
+        lookup = "lt" if descending != reverse else "gt"
+        step = Q(**{f"{field.lstrip('-')}__{lookup}": position[index]})
+        for previous, value in zip(ordering[:index], position):
+            step &= Q(**{previous.lstrip("-"): value})
+        condition |= step
+    return condition
+
+
+class IdCursorPagination(CursorPagination):
+    """Keyset pagination over the primary key.
+
+    The cursor encodes the last seen position, so every page is served by
+    an indexed ``WHERE id > ... LIMIT n`` query regardless of its depth.
+    """
+
+    ordering = ("id",)
+    page_size_query_param = "page_size"
+
+    @property
+    def max_page_size(self):
+        return settings.API_MAX_PAGE_SIZE
+
+
+class FlightCursorPagination(IdCursorPagination):
+    """Keyset pagination over ``(departure_time, id)``.
+
+    DRF keys its cursor on the first ordering field only and steps over
+    the flights that share a departure time with an OFFSET. Here the
+    cursor holds both values, which are unique together, so every page,
+    however deep or crowded its departure slot, is a range scan starting
+    right after the previous one.
+    """
+
+    ordering = ("departure_time", "id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, position = self.cursor or (0, False, None)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [
+                field[1:] if field.startswith("-") else f"-{field}"
+                for field in ordering
+            ]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            position = self.parse_position(queryset.model, position)
+            queryset = queryset.filter(
+                keyset_condition(self.ordering, position, reverse)
+            )
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+
+        # The same bookkeeping as CursorPagination, for get_next_link()
+        # and get_previous_link().
+        current_position = self.cursor and self.cursor.position
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position
+            self.previous_position = current_position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def parse_position(self, model, position):
+        try:
+            return [
+                model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(
+            self.ordering
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor._replace(position=tuple(position))
+
+    def encode_cursor(self, cursor):
+        if cursor.position is not None:
+            cursor = cursor._replace(
+                position=json.dumps(cursor.position, separators=(",", ":"))
+            )
+        return super().encode_cursor(cursor)
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for field in ordering:
+            name = field.lstrip("-")
+            if isinstance(instance, dict):
+                value = instance[name]
+            else:
+                value = getattr(instance, name)
+            position.append(
+                value if isinstance(value, int) else str(value)
+            )
+        return tuple(position)
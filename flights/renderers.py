@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class CSVRenderer(BaseRenderer):
+    """Render flat responses as CSV.
+
+    Large exports bypass it with a streaming response; the renderer is
+    what content negotiation selects for ``.csv`` and what error details
+    of those endpoints are rendered with.
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if rows and isinstance(rows[0], dict):
+            writer.writerow(rows[0].keys())
+            writer.writerows(row.values() for row in rows)
+        else:
+            writer.writerows([row] for row in rows)
+        return buffer.getvalue().encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Render responses as newline-delimited JSON, one object per line."""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        return "".join(
+            json.dumps(row, cls=DjangoJSONEncoder) + "\n" for row in rows
+        ).encode(self.charset)
+
+
+class CompoundJSONRenderer(JSONRenderer):
+    """Plain JSON, picked with ``?format=compound``.
+
+    Views that offer it render related objects once in an ``included``
+    section instead of nesting them into every result.
+    """
+
+    format = "compound"
@@ -0,0 +1,116 @@
+import hashlib
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from flights.conditional import conditional_headers, not_modified_response
+from flights.models import AirplaneType, Airport, City, Country
+
+CACHE_PREFIX = "flights:response"
+
+# Namespaces whose cached lists render data of the given model.
+CACHE_DEPENDENCIES = {
+    Country: ("countries", "cities"),
+    City: ("cities",),
+    Airport: ("airports",),
+    AirplaneType: ("airplane_types",),
+}
+
+
+def get_cache():
+    return caches[settings.REFERENCE_CACHE_ALIAS]
+
+
+def namespace_version(namespace):
+    cache = get_cache()
+    key = f"{CACHE_PREFIX}:{namespace}:version"
+    # A random starting point keeps an evicted version from matching the
+    # keys of entries that were cached before the eviction.
+    cache.add(key, random.randrange(1 << 62), None)
+    return cache.get(key)
+
+
+def invalidate_namespaces(*namespaces):
+    cache = get_cache()
+    for namespace in namespaces:
+        namespace_version(namespace)
+        try:
+            cache.incr(f"{CACHE_PREFIX}:{namespace}:version")
+        except ValueError:
+            pass
+
+
+def record(outcome):
+    cache = get_cache()
+    key = f"{CACHE_PREFIX}:stats:{outcome}"
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def get_stats():
+    cache = get_cache()
+    return {
+        outcome: cache.get(f"{CACHE_PREFIX}:stats:{outcome}", 0)
+        for outcome in ("hits", "misses")
+    }
+
+
+def list_cache_key(namespace, request):
+    params = sorted(
+        (name, sorted(values))
+        for name, values in request.query_params.lists()
+    )
+    digest = hashlib.sha1(
+        f"{request.path}?{params}".encode(), usedforsecurity=False
+    ).hexdigest()
+    return f"{CACHE_PREFIX}:{namespace}:{namespace_version(namespace)}:{digest}"
+
+
+class CachedListMixin:
+    """Serve list responses of near-static reference data from the cache.
+
+    Entries are keyed by the endpoint and its normalized query parameters
+    and are dropped by bumping the namespace version whenever one of the
+    models in ``CACHE_DEPENDENCIES`` changes. The ETag and Last-Modified
+    validators are cached with the body, so conditional requests that hit
+    the cache need no database access at all. Only processes sharing the
+    ``REFERENCE_CACHE_ALIAS`` cache see a version bump, so that cache must
+    not be a LocMemCache when several processes serve the API.
+    """
+
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        cache = get_cache()
+        key = list_cache_key(self.cache_namespace, request)
+        cached = cache.get(key)
+        if cached is not None:
+            record("hits")
+            data, etag, last_modified = cached
+            response = not_modified_response(request, etag, last_modified)
+            if response is None:
+                response = Response(
+                    data, headers=conditional_headers(etag, last_modified)
+                )
+            response["X-Cache"] = "HIT"
+            return response
+
+        record("misses")
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(
+                key,
+                (
+                    response.data,
+                    response.get("ETag"),
+                    getattr(response, "last_modified", None),
+                ),
+                settings.REFERENCE_CACHE_TIMEOUT,
+            )
+        response["X-Cache"] = "MISS"
+        return response
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from flights.models import Ticket
+
+
+def seat_map_cache_key(flight_id):
+    return f"flights:seat_map:{flight_id}"
+
+
+def taken_seats(flight):
+    return Ticket.objects.filter(flight_id=flight.id).values_list("row", "seat")
+
+
+def render_seat_map(flight, taken):
+    """Render the occupancy grid of a flight from its sold seats.
+
+    Each row of the grid is a string with one character per seat:
+    ``"1"`` for a sold seat and ``"0"`` for a free one.
+    """
+    airplane = flight.airplane
+    seats = [
+        "".join(
+            "1" if (row, seat) in taken else "0"
+            for seat in range(1, airplane.seats_in_row + 1)
+        )
+        for row in range(1, airplane.rows + 1)
+    ]
+    return {
+        "flight": flight.id,
+        "rows": airplane.rows,
+        "seats_in_row": airplane.seats_in_row,
+        "capacity": airplane.capacity,
+        "taken": len(taken),
+        "available": airplane.capacity - len(taken),
+        "seats": seats,
+    }
+
+
+def build_seat_map(flight):
+    return render_seat_map(flight, set(taken_seats(flight)))
+
+
+async def abuild_seat_map(flight):
+    return render_seat_map(flight, {seat async for seat in taken_seats(flight)})
+
+
+def get_seat_map(flight):
+    key = seat_map_cache_key(flight.id)
+    seat_map = cache.get(key)
+    if seat_map is None:
+        seat_map = build_seat_map(flight)
+        cache.set(key, seat_map, settings.SEAT_MAP_CACHE_TIMEOUT)
+    return seat_map
+
+
+async def aget_seat_map(flight):
+    key = seat_map_cache_key(flight.id)
+    seat_map = await cache.aget(key)
+    if seat_map is None:
+        seat_map = await abuild_seat_map(flight)
+        await cache.aset(key, seat_map, settings.SEAT_MAP_CACHE_TIMEOUT)
+    return seat_map
+
+
+def invalidate_seat_maps(*flight_ids):
+    cache.delete_many([seat_map_cache_key(flight_id) for flight_id in flight_ids])
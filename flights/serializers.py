@@ -1,3 +1,8 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat
 from drf_spectacular.utils import extend_schema_field
 from users.models import User
 from rest_framework import serializers
@@ -14,6 +19,9 @@ from flights.models import (
     Ticket,
     Crew,
 )
+from flights.counters import adjust_tickets_sold
+from flights.seats import invalidate_seat_maps
+from flights.sparse import SparseFieldsetSerializerMixin
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -22,25 +30,33 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ("id", "email")
 
 
-class CountrySerializer(serializers.ModelSerializer):
+class CountrySerializer(
+    SparseFieldsetSerializerMixin, serializers.ModelSerializer
+):
     class Meta:
         model = Country
         fields = ("id", "name")
 
 
-class CitySerializer(serializers.ModelSerializer):
+class CitySerializer(
+    SparseFieldsetSerializerMixin, serializers.ModelSerializer
+):
     country_name = serializers.SerializerMethodField()
 
     class Meta:
         model = City
         fields = ("id", "name", "country", "country_name")
+        field_joins = {"country_name": ("country",)}
+        values = {"country_name": "country__name"}
 
     @extend_schema_field(serializers.CharField)
     def get_country_name(self, obj):
         return obj.country.name
 
 
-class AirportSerializer(serializers.ModelSerializer):
+class AirportSerializer(
+    SparseFieldsetSerializerMixin, serializers.ModelSerializer
+):
     closest_big_city_id = serializers.PrimaryKeyRelatedField(
         queryset=City.objects.all(), source="closest_big_city", write_only=True
     )
@@ -57,17 +73,22 @@ class AirportSerializer(serializers.ModelSerializer):
         return airport
 
 
-class AirplaneTypeSerializer(serializers.ModelSerializer):
+class AirplaneTypeSerializer(
+    SparseFieldsetSerializerMixin, serializers.ModelSerializer
+):
     class Meta:
         model = AirplaneType
         fields = ("id", "name")
 
 
-class AirplaneSerializer(serializers.ModelSerializer):
+class AirplaneSerializer(
+    SparseFieldsetSerializerMixin, serializers.ModelSerializer
+):
     airplane_type = serializers.PrimaryKeyRelatedField(
         queryset=AirplaneType.objects.all()
     )
     capacity = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Airplane
@@ -77,6 +98,7 @@ class AirplaneSerializer(serializers.ModelSerializer):
             "rows",
             "seats_in_row",
             "image",
+            "image_variants",
             "airplane_type",
             "capacity",
         )
@@ -85,6 +107,30 @@ class AirplaneSerializer(serializers.ModelSerializer):
     def get_capacity(self, obj):
         return obj.capacity
 
+    @extend_schema_field(
+        {
+            "type": "object",
+            "additionalProperties": {
+                "type": "object",
+                "additionalProperties": {"type": "string", "format": "uri"},
+            },
+            "description": "Resized copies of the image by size and format "
+            '(ex. {"thumbnail": {"webp": "...", "jpeg": "..."}}). Empty '
+            "until the upload has been processed.",
+        }
+    )
+    def get_image_variants(self, obj):
+        request = self.context.get("request")
+        variants = {}
+        for variant, formats in obj.image_variants.items():
+            variants[variant] = {}
+            for extension, path in formats.items():
+                url = default_storage.url(path)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                variants[variant][extension] = url
+        return variants
+
     def create(self, validated_data):
         airplane_type = validated_data.pop("airplane_type")
         airplane = Airplane.objects.create(
@@ -101,11 +147,20 @@ class AirplaneSerializer(serializers.ModelSerializer):
             "seats_in_row", instance.seats_in_row
         )
         instance.airplane_type = airplane_type
+        if "image" in validated_data:
+            instance.image = validated_data["image"]
         instance.save()
         return instance
 
 
-class RouteSerializer(serializers.ModelSerializer):
+def distance_display(distance):
+    distance_miles = distance * 0.621371
+    return f"{distance} km ({distance_miles:.2f} miles)"
+
+
+class RouteSerializer(
+    SparseFieldsetSerializerMixin, serializers.ModelSerializer
+):
     source = serializers.PrimaryKeyRelatedField(queryset=Airport.objects.all())
     source_name = serializers.SerializerMethodField()
     destination = serializers.PrimaryKeyRelatedField(queryset=Airport.objects.all())
@@ -123,11 +178,19 @@ class RouteSerializer(serializers.ModelSerializer):
             "source_name",
             "destination_name",
         )
+        field_joins = {
+            "source_name": ("source",),
+            "destination_name": ("destination",),
+        }
+        values = {
+            "distance_display": ("distance", distance_display),
+            "source_name": "source__name",
+            "destination_name": "destination__name",
+        }
 
     @extend_schema_field(serializers.CharField)
     def get_distance_display(self, obj):
-        distance_miles = obj.distance * 0.621371
-        return f"{obj.distance} km ({distance_miles:.2f} miles)"
+        return distance_display(obj.distance)
 
     @extend_schema_field(serializers.CharField)
     def get_source_name(self, obj):
@@ -138,19 +201,27 @@ class RouteSerializer(serializers.ModelSerializer):
         return obj.destination.name
 
 
-class CrewSerializer(serializers.ModelSerializer):
-    full_name = serializers.CharField(source="get_full_name", read_only=True)
+class CrewSerializer(
+    SparseFieldsetSerializerMixin, serializers.ModelSerializer
+):
+    full_name = serializers.CharField(read_only=True)
 
     class Meta:
         model = Crew
         fields = ("id", "first_name", "last_name", "full_name")
+        values = {
+            "full_name": Concat("first_name", Value(" "), "last_name")
+        }
 
 
-class FlightSerializer(serializers.ModelSerializer):
+class FlightSerializer(
+    SparseFieldsetSerializerMixin, serializers.ModelSerializer
+):
     route = serializers.PrimaryKeyRelatedField(queryset=Route.objects.all())
     airplane = serializers.PrimaryKeyRelatedField(queryset=Airplane.objects.all())
     airplane_name = serializers.CharField(source="airplane.name", read_only=True)
     airplane_capacity = serializers.SerializerMethodField()
+    tickets_available = serializers.IntegerField(read_only=True)
     crew = CrewSerializer(many=True, read_only=True)
     crew_ids = serializers.PrimaryKeyRelatedField(
         queryset=Crew.objects.all(), many=True, write_only=True
@@ -166,9 +237,23 @@ class FlightSerializer(serializers.ModelSerializer):
             "crew_ids",
             "airplane_name",
             "airplane_capacity",
+            "tickets_available",
             "departure_time",
             "arrival_time",
         )
+        field_joins = {
+            "crew": ("crew",),
+            "airplane_name": ("airplane",),
+            "airplane_capacity": ("airplane",),
+            "tickets_available": ("airplane",),
+        }
+        values = {
+            "airplane_capacity": F("airplane__rows")
+            * F("airplane__seats_in_row"),
+            "tickets_available": F("airplane__rows")
+            * F("airplane__seats_in_row")
+            - F("tickets_sold"),
+        }
 
     @extend_schema_field(serializers.IntegerField)
     def get_airplane_capacity(self, obj):
@@ -221,30 +306,241 @@ class FlightSerializer(serializers.ModelSerializer):
         return instance
 
 
-class OrderReadOnlySerializer(serializers.ModelSerializer):
+class CompoundFlightSerializer(FlightSerializer):
+    """A flight with crew ids, for the ``included`` section of compound
+    documents."""
+
+    crew = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+
+class FlightSearchSerializer(FlightSerializer):
+    seats_remaining = serializers.IntegerField(read_only=True)
+
+    class Meta(FlightSerializer.Meta):
+        fields = FlightSerializer.Meta.fields + ("seats_remaining",)
+
+
+class ConnectionLegSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    route = serializers.IntegerField(source="route_id")
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+
+
+class ItinerarySerializer(serializers.Serializer):
+    stops = serializers.IntegerField()
+    distance = serializers.IntegerField()
+    duration_minutes = serializers.SerializerMethodField()
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    legs = ConnectionLegSerializer(many=True)
+
+    @extend_schema_field(serializers.IntegerField)
+    def get_duration_minutes(self, obj):
+        return int(obj.duration.total_seconds() // 60)
+
+
+class ConnectionSearchSerializer(serializers.Serializer):
+    results = ItinerarySerializer(many=True, source="itineraries")
+    truncated = serializers.BooleanField()
+
+
+class SeatMapSerializer(serializers.Serializer):
+    flight = serializers.IntegerField()
+    rows = serializers.IntegerField()
+    seats_in_row = serializers.IntegerField()
+    capacity = serializers.IntegerField()
+    taken = serializers.IntegerField()
+    available = serializers.IntegerField()
+    seats = serializers.ListField(
+        child=serializers.CharField(),
+        help_text='One string per row, "1" for a sold seat and "0" for a free one',
+    )
+
+
+class OrderReadOnlySerializer(
+    SparseFieldsetSerializerMixin, serializers.ModelSerializer
+):
     user = UserSerializer(read_only=True, allow_null=True)
 
     class Meta:
         model = Order
         fields = ("id", "created_at", "user")
+        field_joins = {"user": ("user",)}
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(
+    SparseFieldsetSerializerMixin, serializers.ModelSerializer
+):
     class Meta:
         model = Order
         fields = ("id", "created_at", "user")
 
 
-class TicketReadOnlySerializer(serializers.ModelSerializer):
+class TicketReadOnlySerializer(
+    SparseFieldsetSerializerMixin, serializers.ModelSerializer
+):
     flight = FlightSerializer()
     order = OrderReadOnlySerializer()
 
     class Meta:
         model = Ticket
         fields = ("id", "row", "seat", "flight", "order")
+        field_joins = {"flight": ("flight",), "order": ("order",)}
 
 
-class TicketSerializer(serializers.ModelSerializer):
+class TicketSerializer(
+    SparseFieldsetSerializerMixin, serializers.ModelSerializer
+):
     class Meta:
         model = Ticket
         fields = ("id", "row", "seat", "flight", "order")
+
+
+class OrderTicketSerializer(serializers.ModelSerializer):
+    flight = serializers.IntegerField(source="flight_id", min_value=1)
+
+    class Meta:
+        model = Ticket
+        fields = ("id", "row", "seat", "flight")
+
+
+class CurrentUserIdDefault:
+    """Like ``CurrentUserDefault``, but only needs the user's primary key.
+
+    It also works for the ``TokenUser`` built by stateless JWT
+    authentication, which is not a model instance.
+    """
+
+    requires_context = True
+
+    def __call__(self, serializer_field):
+        return serializer_field.context["request"].user.pk
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+
+class OrderBookingSerializer(serializers.ModelSerializer):
+    """Create an order together with all of its tickets.
+
+    Seats are checked against the airplanes and the already sold tickets
+    with one query each, and the tickets are inserted with a single
+    ``bulk_create`` inside the same transaction.
+    """
+
+    user_id = serializers.HiddenField(default=CurrentUserIdDefault())
+    tickets = OrderTicketSerializer(
+        many=True, allow_empty=False, max_length=settings.ORDER_MAX_TICKETS
+    )
+
+    class Meta:
+        model = Order
+        fields = ("id", "created_at", "user_id", "tickets")
+
+    def validate_tickets(self, tickets):
+        seats = [
+            (ticket["flight_id"], ticket["row"], ticket["seat"])
+            for ticket in tickets
+        ]
+        if len(set(seats)) != len(seats):
+            raise serializers.ValidationError(
+                "The same seat is booked more than once."
+            )
+        return tickets
+
+    @staticmethod
+    def check_seats(tickets):
+        flight_ids = {ticket["flight_id"] for ticket in tickets}
+        airplanes = {
+            flight_id: (rows, seats_in_row)
+            for flight_id, rows, seats_in_row in Flight.objects.filter(
+                id__in=flight_ids
+            )
+            .select_for_update(of=("self",))
+            .values_list("id", "airplane__rows", "airplane__seats_in_row")
+        }
+        taken = set(
+            Ticket.objects.filter(
+                flight_id__in=flight_ids,
+                row__in={ticket["row"] for ticket in tickets},
+                seat__in={ticket["seat"] for ticket in tickets},
+            ).values_list("flight_id", "row", "seat")
+        )
+
+        errors = []
+        for ticket in tickets:
+            flight_id, row, seat = (
+                ticket["flight_id"],
+                ticket["row"],
+                ticket["seat"],
+            )
+            error = {}
+            if flight_id not in airplanes:
+                error["flight"] = [f"Flight {flight_id} does not exist."]
+            else:
+                rows, seats_in_row = airplanes[flight_id]
+                if not 1 <= row <= rows:
+                    error["row"] = [f"Row must be in range [1, {rows}]."]
+                if not 1 <= seat <= seats_in_row:
+                    error["seat"] = [
+                        f"Seat must be in range [1, {seats_in_row}]."
+                    ]
+                if (flight_id, row, seat) in taken:
+                    error["seat"] = ["This seat is already taken."]
+            errors.append(error)
+
+        if any(errors):
+            raise serializers.ValidationError({"tickets": errors})
+
+    def create(self, validated_data):
+        tickets_data = validated_data.pop("tickets")
+
+        try:
+            with transaction.atomic():
+                self.check_seats(tickets_data)
+                order = Order.objects.create(**validated_data)
+                order.tickets = Ticket.objects.bulk_create(
+                    Ticket(order=order, **ticket) for ticket in tickets_data
+                )
+                # bulk_create() sends no signals, so count the tickets here.
+                adjust_tickets_sold(
+                    ticket["flight_id"] for ticket in tickets_data
+                )
+                flight_ids = {ticket["flight_id"] for ticket in tickets_data}
+                transaction.on_commit(
+                    lambda: invalidate_seat_maps(*flight_ids)
+                )
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {"tickets": ["Some of the seats have just been taken."]}
+            )
+
+        return order
+
+
+class BatchSubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(
+        choices=("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE")
+    )
+    path = serializers.RegexField(
+        r"^/api/",
+        help_text="Path with query string (ex. /api/flights/flights/1/)",
+    )
+    body = serializers.JSONField(required=False, allow_null=True)
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    requests = BatchSubRequestSerializer(
+        many=True, allow_empty=False, max_length=settings.BATCH_MAX_REQUESTS
+    )
+    parallel = serializers.BooleanField(
+        default=False,
+        help_text="Run consecutive GET and HEAD requests concurrently",
+    )
+
+
+class BatchResponseSerializer(serializers.Serializer):
+    status = serializers.IntegerField()
+    headers = serializers.DictField(child=serializers.CharField())
+    body = serializers.JSONField(allow_null=True)
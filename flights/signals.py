@@ -0,0 +1,136 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from flights.connections import route_graph
+from flights.counters import adjust_tickets_sold
+from flights.images import delete_variants, schedule_variants
+from flights.models import Airplane, Crew, Flight, Route, Ticket
+from flights.response_cache import CACHE_DEPENDENCIES, invalidate_namespaces
+from flights.seats import invalidate_seat_maps
+from flights.timing import install_instrumentation
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    install_instrumentation(connection)
+
+
+@receiver(pre_save, sender=Ticket)
+def remember_previous_ticket_flight(sender, instance, **kwargs):
+    instance._previous_flight_id = None
+    if instance.pk:
+        instance._previous_flight_id = (
+            Ticket.objects.filter(pk=instance.pk)
+            .values_list("flight_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Ticket)
+def count_saved_ticket(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous_flight_id = getattr(instance, "_previous_flight_id", None)
+    if created:
+        adjust_tickets_sold([instance.flight_id])
+    elif previous_flight_id and previous_flight_id != instance.flight_id:
+        adjust_tickets_sold([previous_flight_id], -1)
+        adjust_tickets_sold([instance.flight_id])
+
+
+@receiver(post_delete, sender=Ticket)
+def count_deleted_ticket(sender, instance, **kwargs):
+    adjust_tickets_sold([instance.flight_id], -1)
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def invalidate_ticket_seat_map(sender, instance, **kwargs):
+    flight_ids = {instance.flight_id}
+    previous_flight_id = getattr(instance, "_previous_flight_id", None)
+    if previous_flight_id:
+        flight_ids.add(previous_flight_id)
+    # Once committed, or a concurrent request could cache the old seats.
+    transaction.on_commit(lambda: invalidate_seat_maps(*flight_ids))
+
+
+@receiver(post_save, sender=Flight)
+def invalidate_flight_seat_map(sender, instance, **kwargs):
+    flight_id = instance.id
+    transaction.on_commit(lambda: invalidate_seat_maps(flight_id))
+
+
+@receiver(m2m_changed, sender=Flight.crew.through)
+def touch_flight_on_crew_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        flights = Flight.objects.filter(pk=instance.pk)
+    elif action == "pre_clear":
+        flights = Flight.objects.filter(crew=instance)
+    else:
+        flights = Flight.objects.filter(pk__in=pk_set)
+    flights.update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=Crew)
+def touch_flight_on_crew_delete(sender, instance, **kwargs):
+    # The cascade removes the crew assignments without m2m_changed.
+    Flight.objects.filter(crew=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Airplane)
+def invalidate_airplane_seat_maps(sender, instance, created, **kwargs):
+    if not created:
+        flight_ids = list(instance.flight_set.values_list("id", flat=True))
+        transaction.on_commit(lambda: invalidate_seat_maps(*flight_ids))
+
+
+@receiver(pre_save, sender=Airplane)
+def remember_new_airplane_image(sender, instance, **kwargs):
+    # A fresh upload is only written to storage once the field is saved.
+    instance._image_uploaded = bool(instance.image) and not instance.image._committed
+    instance._replaced_image_variants = {}
+    if instance._image_uploaded:
+        instance._replaced_image_variants = instance.image_variants
+        instance.image_variants = {}
+
+
+@receiver(post_save, sender=Airplane)
+def process_airplane_image(sender, instance, **kwargs):
+    if not getattr(instance, "_image_uploaded", False):
+        return
+    replaced = instance._replaced_image_variants
+    if replaced:
+        transaction.on_commit(lambda: delete_variants(replaced))
+    schedule_variants(instance.id)
+
+
+@receiver(post_save, sender=Route)
+def update_route_graph(sender, instance, **kwargs):
+    transaction.on_commit(lambda: route_graph.update_route(instance))
+
+
+@receiver(post_delete, sender=Route)
+def remove_route_from_graph(sender, instance, **kwargs):
+    route_id = instance.id
+    transaction.on_commit(lambda: route_graph.remove_route(route_id))
+
+
+def invalidate_reference_cache(sender, **kwargs):
+    namespaces = CACHE_DEPENDENCIES[sender]
+    transaction.on_commit(lambda: invalidate_namespaces(*namespaces))
+
+
+for model in CACHE_DEPENDENCIES:
+    post_save.connect(invalidate_reference_cache, sender=model)
+    post_delete.connect(invalidate_reference_cache, sender=model)
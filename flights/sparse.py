@@ -0,0 +1,164 @@
+from drf_spectacular.openapi import AutoSchema
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import serializers
+from rest_framework.request import Request
+
+SAFE_METHODS = ("GET", "HEAD")
+
+
+def split_param(request, name):
+    return {
+        field.strip()
+        for value in request.query_params.getlist(name)
+        for field in value.split(",")
+        if field.strip()
+    }
+
+
+def requested_fields(request, names):
+    """Apply ``?fields=`` and ``?exclude=`` to the field ``names``.
+
+    Both take comma-separated field names; unknown names are ignored.
+    Sparse fieldsets only apply to reads, so writes always see every
+    field.
+    """
+    if not isinstance(request, Request) or request.method not in SAFE_METHODS:
+        return list(names)
+    only = split_param(request, "fields")
+    exclude = split_param(request, "exclude")
+    return [
+        name
+        for name in names
+        if (not only or name in only) and name not in exclude
+    ]
+
+
+class SparseFieldsetSerializerMixin:
+    """Let clients pick the fields of a response with ``?fields=``.
+
+    Only the top-level serializer of a response is trimmed; nested
+    serializers always render in full. ``Meta.field_joins`` maps a field
+    to the ``select_related``/``prefetch_related`` paths it reads, so
+    ``SparseFieldsetMixin`` can drop the joins of fields nobody asked
+    for.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        root = self.root
+        if self is not root and not (
+            isinstance(self.parent, serializers.ListSerializer)
+            and self.parent is root
+        ):
+            return fields
+        request = self.context.get("request")
+        if request is None:
+            return fields
+        keep = requested_fields(request, fields)
+        return {name: fields[name] for name in keep}
+
+    @classmethod
+    def unused_joins(cls, request):
+        """Join paths only needed by fields the request left out."""
+        joins = getattr(cls.Meta, "field_joins", {})
+        names = list(joins)
+        kept = set(requested_fields(request, names))
+        needed = {path for name in kept for path in joins[name]}
+        return {
+            path
+            for name in names
+            if name not in kept
+            for path in joins[name]
+            if path not in needed
+        }
+
+
+def select_related_paths(select_related, prefix=""):
+    paths = []
+    for name, children in select_related.items():
+        path = prefix + name
+        paths.append(path)
+        paths.extend(select_related_paths(children, path + "__"))
+    return paths
+
+
+def is_unused(path, unused):
+    return any(
+        path == unused_path or path.startswith(unused_path + "__")
+        for unused_path in unused
+    )
+
+
+def prune_joins(queryset, unused):
+    """Drop the ``select_related`` and ``prefetch_related`` paths in
+    ``unused`` (and everything below them) from ``queryset``."""
+    if not unused:
+        return queryset
+    select_related = queryset.query.select_related
+    if isinstance(select_related, dict):
+        paths = select_related_paths(select_related)
+        kept = [path for path in paths if not is_unused(path, unused)]
+        if len(kept) != len(paths):
+            queryset = queryset.select_related(None)
+            if kept:
+                queryset = queryset.select_related(*kept)
+    lookups = queryset._prefetch_related_lookups
+    kept = [
+        lookup
+        for lookup in lookups
+        if not is_unused(getattr(lookup, "prefetch_to", lookup), unused)
+    ]
+    if len(kept) != len(lookups):
+        queryset = queryset.prefetch_related(None).prefetch_related(*kept)
+    return queryset
+
+
+class SparseFieldsetSchema(AutoSchema):
+    def is_sparse(self):
+        serializer = self.get_response_serializers()
+        if isinstance(serializer, dict):
+            serializer = serializer.get(200)
+        serializer = getattr(serializer, "child", serializer)
+        if not isinstance(serializer, type):
+            serializer = type(serializer)
+        return issubclass(serializer, SparseFieldsetSerializerMixin)
+
+    def get_override_parameters(self):
+        parameters = super().get_override_parameters()
+        if self.method == "GET" and self.is_sparse():
+            parameters = parameters + [
+                OpenApiParameter(
+                    "fields",
+                    type=OpenApiTypes.STR,
+                    description="Only return these comma-separated fields "
+                    "(ex. ?fields=id,departure_time)",
+                ),
+                OpenApiParameter(
+                    "exclude",
+                    type=OpenApiTypes.STR,
+                    description="Leave out these comma-separated fields "
+                    "(ex. ?exclude=crew)",
+                ),
+            ]
+        return parameters
+
+
+class SparseFieldsetMixin:
+    """Skip the joins of fields left out with ``?fields=``/``?exclude=``.
+
+    The serializer of the action declares which joins each field needs
+    (see ``SparseFieldsetSerializerMixin``); joins it does not mention
+    are always kept.
+    """
+
+    schema = SparseFieldsetSchema()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, SparseFieldsetSerializerMixin):
+            return queryset
+        return prune_joins(
+            queryset, serializer_class.unused_joins(self.request)
+        )
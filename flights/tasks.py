@@ -0,0 +1,7 @@
+from flights.images import GENERATE_VARIANTS, generate_variants
+from jobs.registry import task
+
+
+@task(GENERATE_VARIANTS)
+def generate_image_variants(airplane_id):
+    return generate_variants(airplane_id)
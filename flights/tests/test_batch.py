@@ -0,0 +1,178 @@
+import threading
+from unittest import mock
+
+import pytest
+from django.conf import settings
+from django.http import Http404
+from django.urls import ResolverMatch, reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from flights.batch import BatchView
+from flights.models import Country, ThrottleBucket
+from users.models import User
+
+
+class BatchViewTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="password"
+        )
+        self.country = Country.objects.create(name="Country 1")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+
+    def batch(self, *requests, **options):
+        return self.client.post(
+            reverse("batch"),
+            {"requests": list(requests), **options},
+            format="json",
+        )
+
+    def test_sub_requests_share_authentication(self):
+        country_path = f"/api/flights/countries/{self.country.id}/"
+        response = self.batch(
+            {"method": "GET", "path": "/api/users/me/"},
+            {"method": "GET", "path": country_path},
+            {"method": "GET", "path": "/api/flights/async/routes/"},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        me, country, routes = response.data
+        self.assertEqual(me["status"], status.HTTP_200_OK)
+        self.assertEqual(me["body"]["email"], "test@example.com")
+        self.assertEqual(
+            country["body"], {"id": self.country.id, "name": "Country 1"}
+        )
+        self.assertIn("ETag", country["headers"])
+        self.assertEqual(routes["status"], status.HTTP_200_OK)
+
+    def test_each_sub_request_has_its_own_status(self):
+        response = self.batch(
+            {
+                "method": "POST",
+                "path": "/api/flights/countries/",
+                "body": {"name": "New"},
+            },
+            {"method": "GET", "path": "/api/flights/countries/?ids=x"},
+            {"method": "GET", "path": "/api/flights/missing/"},
+            {"method": "POST", "path": "/api/batch/"},
+        )
+
+        self.assertEqual(
+            [result["status"] for result in response.data],
+            [
+                status.HTTP_403_FORBIDDEN,
+                status.HTTP_400_BAD_REQUEST,
+                status.HTTP_404_NOT_FOUND,
+                status.HTTP_400_BAD_REQUEST,
+            ],
+        )
+        self.assertFalse(Country.objects.filter(name="New").exists())
+
+    def test_writes_run_in_order(self):
+        self.user.is_staff = True
+        self.user.save()
+        response = self.batch(
+            {
+                "method": "POST",
+                "path": "/api/flights/countries/",
+                "body": {"name": "New"},
+            },
+            {"method": "GET", "path": "/api/flights/countries/"},
+        )
+
+        created, listed = response.data
+        self.assertEqual(created["status"], status.HTTP_201_CREATED)
+        self.assertIn(
+            created["body"]["id"],
+            [country["id"] for country in listed["body"]["results"]],
+        )
+
+    def test_head_sub_requests_have_no_body(self):
+        path = f"/api/flights/countries/{self.country.id}/"
+        response = self.batch({"method": "HEAD", "path": path})
+        self.assertEqual(response.data[0]["status"], status.HTTP_200_OK)
+        self.assertIsNone(response.data[0]["body"])
+        self.assertIn("ETag", response.data[0]["headers"])
+
+    def test_http404_from_django_views_is_not_found(self):
+        def missing(request):
+            raise Http404
+
+        match = ResolverMatch(missing, (), {})
+        with mock.patch("flights.batch.resolve", return_value=match):
+            response = self.batch({"method": "GET", "path": "/api/missing/"})
+        self.assertEqual(
+            response.data[0]["status"], status.HTTP_404_NOT_FOUND
+        )
+
+    def test_thread_pool_only_for_several_parallel_reads(self):
+        path = f"/api/flights/countries/{self.country.id}/"
+        with mock.patch("flights.batch.ThreadPoolExecutor") as pool:
+            self.batch(*[{"method": "GET", "path": path}] * 2)
+            self.batch(
+                {"method": "GET", "path": path},
+                {"method": "POST", "path": "/api/flights/countries/"},
+                {"method": "GET", "path": path},
+                parallel=True,
+            )
+        pool.assert_not_called()
+
+    def test_invalid_batches_are_rejected(self):
+        response = self.batch({"method": "GET", "path": "/admin/"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        requests = [{"method": "GET", "path": "/api/users/me/"}] * (
+            settings.BATCH_MAX_REQUESTS + 1
+        )
+        response = self.batch(*requests)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("requests", response.data)
+
+    def test_anonymous_sub_requests_are_not_authenticated(self):
+        self.client.credentials()
+        response = self.batch({"method": "GET", "path": "/api/users/me/"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data[0]["status"], status.HTTP_401_UNAUTHORIZED
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_gets_run_concurrently():
+    user = User.objects.create_user(
+        email="test@example.com", password="password"
+    )
+    country = Country.objects.create(name="Country 1")
+    client = APIClient()
+    client.force_authenticate(user)
+    threads = set()
+    dispatch = BatchView.dispatch_sub_request
+
+    def record_thread(self, sub_request):
+        threads.add(threading.current_thread().name)
+        return dispatch(self, sub_request)
+
+    with mock.patch.object(BatchView, "dispatch_sub_request", record_thread):
+        response = client.post(
+            reverse("batch"),
+            {
+                "parallel": True,
+                "requests": [
+                    {
+                        "method": "GET",
+                        "path": f"/api/flights/countries/{country.id}/",
+                    }
+                ]
+                * 4,
+            },
+            format="json",
+        )
+
+    assert [result["status"] for result in response.data] == [200] * 4
+    assert threads and all(name.startswith("batch") for name in threads)
+    # No concurrent throttle update was lost: the batch and its four reads.
+    assert list(ThrottleBucket.objects.values_list("hits", flat=True)) == [5]
@@ -0,0 +1,24 @@
+from django.test import SimpleTestCase, override_settings
+
+from flights.checks import reference_cache_check
+
+LOCMEM = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+DATABASE = {
+    "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+    "LOCATION": "cache",
+}
+
+
+class ReferenceCacheCheckTestCase(SimpleTestCase):
+    @override_settings(CACHES={"default": LOCMEM}, WEB_CONCURRENCY=4)
+    def test_locmem_with_several_workers(self):
+        (warning,) = reference_cache_check(None)
+        self.assertEqual(warning.id, "flights.W001")
+
+    @override_settings(CACHES={"default": LOCMEM}, WEB_CONCURRENCY=1)
+    def test_locmem_with_one_worker(self):
+        self.assertEqual(reference_cache_check(None), [])
+
+    @override_settings(CACHES={"default": DATABASE}, WEB_CONCURRENCY=4)
+    def test_shared_cache(self):
+        self.assertEqual(reference_cache_check(None), [])
@@ -0,0 +1,395 @@
+import json
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+
+from flights.models import (
+    Country,
+    City,
+    Airport,
+    AirplaneType,
+    Airplane,
+    Route,
+    Crew,
+    Flight,
+    Order,
+    Ticket,
+)
+
+
+@pytest.fixture
+def schedule_data():
+    country = Country.objects.create(name="Test Country")
+    city = City.objects.create(name="Test City", country=country)
+    kbp = Airport.objects.create(name="Boryspil", code="KBP", closest_big_city=city)
+    lhr = Airport.objects.create(name="Heathrow", code="LHR", closest_big_city=city)
+    route = Route.objects.create(source=kbp, destination=lhr, distance=2200)
+    airplane_type = AirplaneType.objects.create(name="Test Type")
+    airplane = Airplane.objects.create(
+        name="Boeing", rows=10, seats_in_row=4, airplane_type=airplane_type
+    )
+    crew = [
+        Crew.objects.create(first_name="John", last_name="Doe"),
+        Crew.objects.create(first_name="Jane", last_name="Doe"),
+    ]
+    return route, airplane, crew
+
+
+@pytest.mark.django_db
+def test_import_schedule_csv(tmp_path, schedule_data):
+    route, airplane, crew = schedule_data
+    path = tmp_path / "schedule.csv"
+    path.write_text(
+        "source,destination,airplane,departure_time,arrival_time,crew\n"
+        f"KBP,LHR,Boeing,2024-06-01T08:00:00Z,2024-06-01T11:00:00Z,"
+        f"{crew[0].id};{crew[1].id}\n"
+        "kbp,lhr,Boeing,2024-06-02T08:00:00,2024-06-02T11:00:00,\n"
+    )
+    out = StringIO()
+    call_command("import_schedule", str(path), "--batch-size=1", stdout=out)
+
+    flights = list(Flight.objects.order_by("departure_time"))
+    assert len(flights) == 2
+    assert {flight.route_id for flight in flights} == {route.id}
+    assert {flight.airplane_id for flight in flights} == {airplane.id}
+    assert set(flights[0].crew.values_list("id", flat=True)) == {
+        member.id for member in crew
+    }
+    assert not flights[1].crew.exists()
+    assert "Imported 2 flights" in out.getvalue()
+    assert "rows/s" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_import_schedule_jsonl_skips_invalid_rows(tmp_path, schedule_data):
+    _, _, crew = schedule_data
+    rows = [
+        {
+            "source": "KBP",
+            "destination": "LHR",
+            "airplane": "Boeing",
+            "departure_time": "2024-06-01T08:00:00Z",
+            "arrival_time": "2024-06-01T11:00:00Z",
+            "crew": [crew[0].id],
+        },
+        {
+            "source": "LHR",
+            "destination": "KBP",
+            "airplane": "Boeing",
+            "departure_time": "2024-06-01T08:00:00Z",
+            "arrival_time": "2024-06-01T11:00:00Z",
+        },
+        {
+            "source": "KBP",
+            "destination": "LHR",
+            "airplane": "Airbus",
+            "departure_time": "2024-06-01T08:00:00Z",
+            "arrival_time": "2024-06-01T11:00:00Z",
+        },
+        {
+            "source": "KBP",
+            "destination": "LHR",
+            "airplane": "Boeing",
+            "departure_time": "2024-06-01T08:00:00Z",
+            "arrival_time": "2024-06-01T07:00:00Z",
+        },
+    ]
+    path = tmp_path / "schedule.jsonl"
+    path.write_text("\n".join(json.dumps(row) for row in rows))
+    out, err = StringIO(), StringIO()
+    call_command("import_schedule", str(path), stdout=out, stderr=err)
+
+    assert Flight.objects.count() == 1
+    assert "Skipped 3 invalid rows" in out.getvalue()
+    assert "no route from LHR to KBP" in err.getvalue()
+    assert "unknown airplane 'Airbus'" in err.getvalue()
+
+
+@pytest.mark.django_db
+def test_import_schedule_strict(tmp_path, schedule_data):
+    path = tmp_path / "schedule.csv"
+    path.write_text(
+        "source,destination,airplane,departure_time,arrival_time\n"
+        "KBP,XXX,Boeing,2024-06-01T08:00:00Z,2024-06-01T11:00:00Z\n"
+    )
+    with pytest.raises(CommandError, match="unknown airport XXX"):
+        call_command("import_schedule", str(path), "--strict")
+
+
+MALFORMED_JSONL = "\n".join(
+    (
+        json.dumps(
+            {
+                "source": "KBP",
+                "destination": "LHR",
+                "airplane": "Boeing",
+                "departure_time": "2024-06-01T08:00:00Z",
+                "arrival_time": "2024-06-01T11:00:00Z",
+            }
+        ),
+        '{"source": "KBP",',
+        "",
+        json.dumps(
+            {
+                "source": 1,
+                "destination": "LHR",
+                "airplane": "Boeing",
+                "departure_time": "2024-06-01T08:00:00Z",
+                "arrival_time": "2024-06-01T11:00:00Z",
+            }
+        ),
+        json.dumps(["KBP", "LHR"]),
+    )
+)
+
+
+@pytest.mark.django_db
+def test_import_schedule_skips_malformed_rows(tmp_path, schedule_data):
+    path = tmp_path / "schedule.jsonl"
+    path.write_text(MALFORMED_JSONL)
+    out, err = StringIO(), StringIO()
+    call_command("import_schedule", str(path), stdout=out, stderr=err)
+
+    assert Flight.objects.count() == 1
+    assert "rows/s" in out.getvalue()
+    assert "Skipped 3 invalid rows" in out.getvalue()
+    assert f"{path}:2: invalid JSON" in err.getvalue()
+    assert f"{path}:4: invalid source 1" in err.getvalue()
+    assert f"{path}:5: row is not an object" in err.getvalue()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "line, message",
+    [
+        ('{"source": "KBP",', ":1: invalid JSON"),
+        (
+            json.dumps(
+                {
+                    "source": "KBP",
+                    "destination": "LHR",
+                    "airplane": 7,
+                    "departure_time": "2024-06-01T08:00:00Z",
+                    "arrival_time": "2024-06-01T11:00:00Z",
+                }
+            ),
+            ":1: invalid airplane 7",
+        ),
+        ("null", ":1: row is not an object"),
+    ],
+)
+def test_import_schedule_strict_malformed_rows(
+    tmp_path, schedule_data, line, message
+):
+    path = tmp_path / "schedule.jsonl"
+    path.write_text(line)
+    with pytest.raises(CommandError, match=message):
+        call_command("import_schedule", str(path), "--strict")
+    assert not Flight.objects.exists()
+
+
+@pytest.mark.django_db
+def test_import_schedule_copy_requires_postgresql(tmp_path, schedule_data):
+    path = tmp_path / "schedule.csv"
+    path.write_text("source,destination,airplane,departure_time,arrival_time\n")
+    with pytest.raises(CommandError, match="PostgreSQL"):
+        call_command("import_schedule", str(path), "--method=copy")
+
+
+SMALL_DATASET = (
+    "--countries=2",
+    "--cities=3",
+    "--airports=6",
+    "--routes=10",
+    "--airplane-types=2",
+    "--airplanes=3",
+    "--crew=5",
+    "--flights=40",
+    "--days=2",
+    "--users=4",
+    "--orders=20",
+)
+
+
+@pytest.mark.django_db
+def test_seed_benchmark_builds_dataset():
+    call_command("seed_benchmark", *SMALL_DATASET, stdout=StringIO())
+
+    assert Airport.objects.count() == 6
+    assert Route.objects.count() == 10
+    assert Flight.objects.count() == 40
+    assert Flight.crew.through.objects.count() == 40 * 4
+    assert Order.objects.count() == 20
+    assert Ticket.objects.count() >= 20
+    seats = Ticket.objects.values_list("flight", "row", "seat")
+    assert len(set(seats)) == len(seats)
+
+
+@pytest.mark.django_db
+def test_run_benchmarks_writes_report(tmp_path):
+    call_command("seed_benchmark", *SMALL_DATASET, stdout=StringIO())
+    output = tmp_path / "report.json"
+    call_command(
+        "run_benchmarks",
+        f"--output={output}",
+        "--iterations=2",
+        "--warmup=0",
+        "--memory-iterations=1",
+        stdout=StringIO(),
+        stderr=StringIO(),
+    )
+
+    report = json.loads(output.read_text())
+    assert report["dataset"]["flights"] == 40
+    assert set(report["scenarios"]) >= {
+        "flights_list",
+        "flights_detail",
+        "flights_search",
+        "orders_book",
+    }
+    for result in report["scenarios"].values():
+        assert result["requests"] == 2
+        assert result["latency_ms"]["p50"] <= result["latency_ms"]["p95"]
+        assert result["queries"]["max"] >= 1
+        assert result["peak_memory_kb"] > 0
+    assert report["scenarios"]["flights_list"]["status_codes"] == {"200": 2}
+    assert report["scenarios"]["flights_list"]["slowest_query"]["plan"]
+
+
+@pytest.mark.django_db
+def test_run_benchmarks_asgi_comparison(tmp_path):
+    call_command("seed_benchmark", *SMALL_DATASET, stdout=StringIO())
+    output = tmp_path / "report.json"
+    call_command(
+        "run_benchmarks",
+        f"--output={output}",
+        "--iterations=1",
+        "--warmup=0",
+        "--memory-iterations=0",
+        "--scenario=flights_list",
+        "--asgi-concurrency=4",
+        "--asgi-requests=8",
+        stdout=StringIO(),
+        stderr=StringIO(),
+    )
+
+    report = json.loads(output.read_text())
+    assert report["asgi"]["concurrency"] == 4
+    for result in report["asgi"]["scenarios"].values():
+        for stack in ("sync", "async"):
+            assert result[stack]["status_codes"] == {"200": 8}
+            assert result[stack]["requests_per_second"] > 0
+
+
+@pytest.mark.django_db
+def test_run_benchmarks_values_rendering_comparison(tmp_path):
+    call_command("seed_benchmark", *SMALL_DATASET, stdout=StringIO())
+    output = tmp_path / "report.json"
+    call_command(
+        "run_benchmarks",
+        f"--output={output}",
+        "--iterations=2",
+        "--warmup=0",
+        "--memory-iterations=0",
+        "--scenario=routes_list",
+        "--values-rendering",
+        stdout=StringIO(),
+        stderr=StringIO(),
+    )
+
+    report = json.loads(output.read_text())
+    for result in report["values_rendering"]["scenarios"].values():
+        for mode in ("serializer", "values"):
+            assert result[mode]["status_codes"] == {"200": 2}
+        assert result["speedup"] > 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_benchmarks_index_comparison(tmp_path):
+    call_command("seed_benchmark", *SMALL_DATASET, stdout=StringIO())
+    output = tmp_path / "report.json"
+    call_command(
+        "run_benchmarks",
+        f"--output={output}",
+        "--iterations=2",
+        "--warmup=0",
+        "--memory-iterations=0",
+        "--scenario=routes_list",
+        "--indexes",
+        stdout=StringIO(),
+        stderr=StringIO(),
+    )
+
+    report = json.loads(output.read_text())
+    scenarios = report["indexes"]["scenarios"]
+    assert scenarios["orders_of_user"]["index"] == "order_user_created_idx"
+    for result in scenarios.values():
+        for state in ("before", "after"):
+            assert result[state]["plan"]
+            assert result[state]["latency_ms"]["p50"] >= 0
+    # Without the constraint the seat lookup needs another plan.
+    ticket_by_seat = scenarios["ticket_by_seat"]
+    assert ticket_by_seat["before"]["plan"] != ticket_by_seat["after"]["plan"]
+    # The indexes are back once the comparison is done.
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, Ticket._meta.db_table
+        )
+    assert "unique_ticket_flight_row_seat" in constraints
+
+
+@pytest.mark.django_db
+def test_seed_benchmark_counts_tickets_sold():
+    call_command("seed_benchmark", *SMALL_DATASET, stdout=StringIO())
+
+    out = StringIO()
+    call_command("reconcile_tickets_sold", "--dry-run", stdout=out)
+    assert out.getvalue() == ""
+
+
+@pytest.mark.django_db
+def test_reconcile_tickets_sold_repairs_drift(schedule_data):
+    route, airplane, _ = schedule_data
+    flights = [
+        Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time="2024-06-01T08:00:00Z",
+            arrival_time="2024-06-01T11:00:00Z",
+        )
+        for _ in range(3)
+    ]
+    order = Order.objects.create(
+        user=get_user_model().objects.create_user(
+            email="test@example.com", password="password"
+        )
+    )
+    Ticket.objects.bulk_create(
+        Ticket(flight=flights[0], order=order, row=1, seat=seat)
+        for seat in (1, 2)
+    )
+    Flight.objects.filter(id=flights[1].id).update(tickets_sold=5)
+
+    out = StringIO()
+    call_command("reconcile_tickets_sold", "--dry-run", stdout=out)
+    assert out.getvalue().splitlines() == [
+        f"Flight {flights[0].id}: 0 stored, 2 counted",
+        f"Flight {flights[1].id}: 5 stored, 0 counted",
+    ]
+
+    out = StringIO()
+    call_command(
+        "reconcile_tickets_sold", f"--flight={flights[0].id}", stdout=out
+    )
+    assert "Repaired 1 flights" in out.getvalue()
+    call_command("reconcile_tickets_sold", stdout=out)
+
+    assert [
+        flight.tickets_sold
+        for flight in Flight.objects.filter(id__in=[f.id for f in flights])
+        .order_by("id")
+    ] == [2, 0, 0]
@@ -0,0 +1,219 @@
+from datetime import datetime, timedelta
+
+import pytest
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+
+from flights.connections import find_connections, route_graph
+from flights.models import (
+    Country,
+    City,
+    Airport,
+    AirplaneType,
+    Airplane,
+    Route,
+    Flight,
+)
+
+DAY = timezone.make_aware(datetime(2024, 6, 1))
+
+
+@pytest.fixture
+def airports():
+    country = Country.objects.create(name="Test Country")
+    city = City.objects.create(name="Test City", country=country)
+    return {
+        code: Airport.objects.create(
+            name=f"Airport {code}", code=code, closest_big_city=city
+        )
+        for code in ("AAA", "BBB", "CCC", "DDD")
+    }
+
+
+@pytest.fixture
+def airplane():
+    airplane_type = AirplaneType.objects.create(name="Test Type")
+    return Airplane.objects.create(
+        name="Test Airplane", rows=10, seats_in_row=4, airplane_type=airplane_type
+    )
+
+
+def create_route(airports, source, destination, distance):
+    return Route.objects.create(
+        source=airports[source],
+        destination=airports[destination],
+        distance=distance,
+    )
+
+
+def create_flight(route, airplane, departure_hour, hours):
+    departure = DAY + timedelta(hours=departure_hour)
+    return Flight.objects.create(
+        route=route,
+        airplane=airplane,
+        departure_time=departure,
+        arrival_time=departure + timedelta(hours=hours),
+    )
+
+
+def search(source, destination, **kwargs):
+    return find_connections(
+        source,
+        destination,
+        departure_from=DAY,
+        departure_to=DAY + timedelta(days=1),
+        **kwargs,
+    )
+
+
+@pytest.mark.django_db
+def test_route_graph_paths(airports):
+    ab = create_route(airports, "AAA", "BBB", 100)
+    bd = create_route(airports, "BBB", "DDD", 100)
+    ad = create_route(airports, "AAA", "DDD", 500)
+    bc = create_route(airports, "BBB", "CCC", 100)
+    cd = create_route(airports, "CCC", "DDD", 100)
+    route_graph.rebuild()
+
+    paths = route_graph.paths(airports["AAA"].id, airports["DDD"].id, 2)
+    assert sorted(paths) == sorted(
+        [(ad.id,), (ab.id, bd.id), (ab.id, bc.id, cd.id)]
+    )
+    assert route_graph.paths(airports["AAA"].id, airports["DDD"].id, 0) == [
+        (ad.id,)
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_route_graph_is_updated_incrementally(airports):
+    route_graph.rebuild()
+    ab = create_route(airports, "AAA", "BBB", 100)
+    route_graph.ensure_current()
+    assert route_graph.paths(airports["AAA"].id, airports["BBB"].id, 0) == [
+        (ab.id,)
+    ]
+
+    ab.delete()
+    route_graph.ensure_current()
+    assert route_graph.paths(airports["AAA"].id, airports["BBB"].id, 0) == []
+
+
+@pytest.mark.django_db
+def test_route_graph_rebuilds_when_shared_version_changes(airports):
+    route_graph.rebuild()
+    Route.objects.bulk_create(
+        [
+            Route(
+                source=airports["AAA"],
+                destination=airports["BBB"],
+                distance=100,
+            )
+        ]
+    )
+    cache.incr("flights:route_graph:version")
+    route_graph.ensure_current()
+    assert len(route_graph.paths(airports["AAA"].id, airports["BBB"].id, 0)) == 1
+
+
+@pytest.mark.django_db
+def test_route_graph_notices_changes_from_other_processes(airports):
+    route_graph.rebuild()
+    # Another process wrote the route and bumped the version in its own
+    # cache, so only the routes table tells that the graph is stale.
+    Route.objects.bulk_create(
+        [
+            Route(
+                source=airports["AAA"],
+                destination=airports["BBB"],
+                distance=100,
+            )
+        ]
+    )
+    route_graph.ensure_current()
+    assert route_graph.paths(airports["AAA"].id, airports["BBB"].id, 0) == []
+
+    with override_settings(ROUTE_GRAPH_CHECK_INTERVAL=0):
+        route_graph.ensure_current()
+    assert len(route_graph.paths(airports["AAA"].id, airports["BBB"].id, 0)) == 1
+
+
+@pytest.mark.django_db
+def test_find_connections_respects_connection_times(airports, airplane):
+    ab = create_route(airports, "AAA", "BBB", 100)
+    bd = create_route(airports, "BBB", "DDD", 100)
+    first = create_flight(ab, airplane, 8, 2)
+    too_short = create_flight(bd, airplane, 10, 2)
+    valid = create_flight(bd, airplane, 12, 2)
+    route_graph.rebuild()
+
+    result = search("AAA", "DDD", min_connection=timedelta(minutes=45))
+
+    assert not result.truncated
+    assert [
+        [leg["id"] for leg in itinerary.legs]
+        for itinerary in result.itineraries
+    ] == [[first.id, valid.id]]
+    assert too_short.id not in {
+        leg["id"] for itinerary in result.itineraries for leg in itinerary.legs
+    }
+    assert result.itineraries[0].stops == 1
+    assert result.itineraries[0].duration == timedelta(hours=6)
+
+
+@pytest.mark.django_db
+def test_find_connections_after_long_first_leg(airports, airplane):
+    ab = create_route(airports, "AAA", "BBB", 8000)
+    bd = create_route(airports, "BBB", "DDD", 100)
+    # Arrives at 09:00 the next day; the connection leaves 11 hours later.
+    first = create_flight(ab, airplane, 23, 10)
+    second = create_flight(bd, airplane, 44, 2)
+    route_graph.rebuild()
+
+    result = search(
+        "AAA",
+        "DDD",
+        max_stops=1,
+        max_connection=timedelta(hours=12),
+    )
+
+    assert [
+        [leg["id"] for leg in itinerary.legs]
+        for itinerary in result.itineraries
+    ] == [[first.id, second.id]]
+
+
+@pytest.mark.django_db
+def test_find_connections_ranking(airports, airplane):
+    ab = create_route(airports, "AAA", "BBB", 100)
+    bd = create_route(airports, "BBB", "DDD", 100)
+    ad = create_route(airports, "AAA", "DDD", 1000)
+    create_flight(ab, airplane, 6, 1)
+    create_flight(bd, airplane, 8, 1)
+    direct = create_flight(ad, airplane, 6, 4)
+    route_graph.rebuild()
+
+    by_duration = search("AAA", "DDD", sort="duration").itineraries
+    assert [len(itinerary.legs) for itinerary in by_duration] == [2, 1]
+
+    by_distance = search("AAA", "DDD", sort="distance").itineraries
+    assert by_distance[0].distance == 200
+    assert by_distance[1].legs[0]["id"] == direct.id
+
+
+@pytest.mark.django_db
+def test_find_connections_time_budget(airports, airplane):
+    ab = create_route(airports, "AAA", "BBB", 100)
+    bd = create_route(airports, "BBB", "DDD", 100)
+    create_flight(ab, airplane, 6, 1)
+    create_flight(bd, airplane, 8, 1)
+    route_graph.rebuild()
+
+    result = search("AAA", "DDD", time_budget=0)
+    assert result.truncated
+    assert result.itineraries == []
+
+
+@pytest.mark.django_db
+def test_find_connections_unknown_airport(airports):
+    assert search("AAA", "ZZZ").itineraries == []
@@ -1,6 +1,7 @@
 import os
 
 import pytest
+from django.db import IntegrityError
 from django.utils.text import slugify
 
 from flights.models import (
@@ -184,3 +185,88 @@ def test_airplane_image_file_path():
     expected_extension = os.path.splitext(filename)[1]
     assert path.startswith(f"uploads/airplanes/{expected_slug}-")
     assert path.endswith(expected_extension)
+
+
+@pytest.mark.django_db
+def test_ticket_seat_is_unique_per_flight():
+    user = User.objects.create_user(
+        email="testuser@example.com", password="testpass"
+    )
+    order = Order.objects.create(user=user)
+    country = Country.objects.create(name="Test Country")
+    city = City.objects.create(name="Test City", country=country)
+    airport = Airport.objects.create(
+        name="Airport1",
+        code="A1",
+        closest_big_city=city
+    )
+    route = Route.objects.create(
+        source=airport,
+        destination=airport,
+        distance=500
+    )
+    airplane_type = AirplaneType.objects.create(name="Test Type")
+    airplane = Airplane.objects.create(
+        name="Test Airplane",
+        rows=10,
+        seats_in_row=4,
+        airplane_type=airplane_type
+    )
+    flight = Flight.objects.create(
+        route=route,
+        airplane=airplane,
+        departure_time="2023-01-01T10:00:00Z",
+        arrival_time="2023-01-01T12:00:00Z",
+    )
+    Ticket.objects.create(row=1, seat=1, flight=flight, order=order)
+    with pytest.raises(IntegrityError):
+        Ticket.objects.create(row=1, seat=1, flight=flight, order=order)
+
+
+@pytest.mark.django_db
+def test_flight_tickets_sold_follows_tickets():
+    user = User.objects.create_user(
+        email="testuser@example.com", password="testpass"
+    )
+    order = Order.objects.create(user=user)
+    country = Country.objects.create(name="Test Country")
+    city = City.objects.create(name="Test City", country=country)
+    airport = Airport.objects.create(
+        name="Airport1", code="A1", closest_big_city=city
+    )
+    route = Route.objects.create(
+        source=airport, destination=airport, distance=500
+    )
+    airplane_type = AirplaneType.objects.create(name="Test Type")
+    airplane = Airplane.objects.create(
+        name="Test Airplane",
+        rows=10,
+        seats_in_row=4,
+        airplane_type=airplane_type,
+    )
+    flight, other_flight = (
+        Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time="2023-01-01T10:00:00Z",
+            arrival_time="2023-01-01T12:00:00Z",
+        )
+        for _ in range(2)
+    )
+
+    first = Ticket.objects.create(row=1, seat=1, flight=flight, order=order)
+    Ticket.objects.create(row=1, seat=2, flight=flight, order=order)
+    flight.refresh_from_db()
+    assert flight.tickets_sold == 2
+    assert flight.tickets_available == 38
+
+    first.flight = other_flight
+    first.save()
+    first.delete()
+    flight.refresh_from_db()
+    other_flight.refresh_from_db()
+    assert (flight.tickets_sold, other_flight.tickets_sold) == (1, 0)
+
+    order.delete()
+    flight.refresh_from_db()
+    assert flight.tickets_sold == 0
@@ -0,0 +1,61 @@
+import pytest
+
+from flights.models import ThrottleBucket
+from flights.throttling import hit, prune
+
+START = 1_000_040  # 20 seconds into a one-minute window
+
+
+@pytest.mark.django_db
+def test_requests_over_the_limit_are_rejected():
+    results = [hit("key", 3, 60, START + i).allowed for i in range(5)]
+    assert results == [True, True, True, False, False]
+    bucket = ThrottleBucket.objects.get(key="key")
+    assert bucket.hits == 3
+    assert bucket.allowed is False
+
+
+@pytest.mark.django_db
+def test_keys_are_counted_separately():
+    assert hit("first", 1, 60, START).allowed
+    assert hit("second", 1, 60, START).allowed
+    assert not hit("first", 1, 60, START).allowed
+
+
+@pytest.mark.django_db
+def test_previous_window_is_weighted():
+    for _ in range(10):
+        hit("key", 10, 60, START)
+    # Halfway into the next window half of the previous hits still count.
+    next_window = (START // 60 + 1) * 60 + 30
+    results = [hit("key", 10, 60, next_window).allowed for _ in range(6)]
+    assert results == [True] * 5 + [False]
+    window = hit("key", 10, 60, next_window)
+    assert (window.hits, window.previous_hits) == (5, 10)
+
+
+@pytest.mark.django_db
+def test_counter_resets_after_two_windows():
+    for _ in range(3):
+        hit("key", 3, 60, START)
+    assert not hit("key", 3, 60, START).allowed
+    window = hit("key", 3, 60, START + 120)
+    assert window.allowed
+    assert (window.hits, window.previous_hits) == (1, 0)
+
+
+@pytest.mark.django_db
+def test_wait():
+    for _ in range(2):
+        hit("key", 2, 60, START)
+    window = hit("key", 2, 60, START)
+    assert not window.allowed
+    assert 40 <= window.wait(2, 60) <= 100
+
+
+@pytest.mark.django_db
+def test_prune():
+    hit("old", 1, 60, START)
+    hit("new", 1, 60, START + 600)
+    assert prune(now=START + 600) == 1
+    assert list(ThrottleBucket.objects.values_list("key", flat=True)) == ["new"]
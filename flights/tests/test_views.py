@@ -1,14 +1,31 @@
-from datetime import timedelta
+import base64
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from io import BytesIO
+from urllib.parse import urlencode
+from unittest import mock
 
-from django.test import TestCase
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
+from PIL import Image
+from prometheus_client import REGISTRY
 from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import Throttled
 from rest_framework.test import (
     APIClient,
     APITestCase,
 )
+from rest_framework_simplejwt.tokens import AccessToken
 
+from flights.metrics import get_registry
 from flights.models import (
     Country,
     City,
@@ -19,16 +36,25 @@ from flights.models import (
     Flight,
     Order,
     Ticket,
+    Crew,
 )
+from flights.pagination import IdCursorPagination
+from flights.response_cache import get_cache
 from flights.serializers import (
     CountrySerializer,
     CitySerializer,
     AirportSerializer,
     AirplaneSerializer,
+    FlightSerializer,
     TicketReadOnlySerializer,
 )
+from flights.throttling import SlidingWindowRateThrottle
+from jobs.worker import run_pending
 from users.models import User
 
+# Every request records one hit per applicable throttle in the database.
+THROTTLE_QUERIES = 1
+
 
 class CountryViewSetTestCase(TestCase):
     def setUp(self):
@@ -45,7 +71,7 @@ class CountryViewSetTestCase(TestCase):
         countries = Country.objects.all()
         serializer = CountrySerializer(countries, many=True)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_retrieve_country(self):
         response = self.client.get(
@@ -73,7 +99,7 @@ class CityViewSetTestCase(TestCase):
         cities = City.objects.all().select_related("country")
         serializer = CitySerializer(cities, many=True)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_retrieve_city(self):
         response = self.client.get(reverse(
@@ -91,7 +117,7 @@ class CityViewSetTestCase(TestCase):
         cities = City.objects.filter(country=self.country1)
         serializer = CitySerializer(cities, many=True)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
 
 class AirportViewSetTestCase(TestCase):
@@ -121,7 +147,7 @@ class AirportViewSetTestCase(TestCase):
         )
         serializer = AirportSerializer(airports, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_list_airports_with_city_filter(self):
         url = reverse("flights:airport-list") + "?city=1"
@@ -133,7 +159,7 @@ class AirportViewSetTestCase(TestCase):
         )
         serializer = AirportSerializer(airports, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_list_airports_with_invalid_city_filter(self):
         url = reverse("flights:airport-list") + "?city=abc"
@@ -169,7 +195,7 @@ class AirplaneViewSetTestCase(APITestCase):
         airplanes = Airplane.objects.all().select_related("airplane_type")
         serializer = AirplaneSerializer(airplanes, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_list_airplanes_with_type_filter(self):
         url = reverse("flights:airplane-list") + "?airplane_types=1"
@@ -179,7 +205,7 @@ class AirplaneViewSetTestCase(APITestCase):
         )
         serializer = AirplaneSerializer(airplanes, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_list_airplanes_with_invalid_type_filter(self):
         url = reverse("flights:airplane-list") + "?airplane_types=abc"
@@ -187,6 +213,103 @@ class AirplaneViewSetTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+class AirplaneImageTestCase(APITestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(
+            email="admin@example.com", password="testpassword", is_staff=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.airplane_type = AirplaneType.objects.create(name="Type 1")
+
+    @staticmethod
+    def image_upload(size=(2000, 1500)):
+        buffer = BytesIO()
+        Image.new("RGB", size, "navy").save(buffer, "JPEG")
+        return SimpleUploadedFile(
+            "airplane.jpg", buffer.getvalue(), content_type="image/jpeg"
+        )
+
+    def upload(self, method, url):
+        data = {
+            "name": "Airplane 1",
+            "rows": 10,
+            "seats_in_row": 6,
+            "airplane_type": self.airplane_type.id,
+            "image": self.image_upload(),
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(
+                url, data, format="multipart"
+            )
+        run_pending()
+        return response
+
+    def test_upload_generates_variants(self):
+        response = self.upload("post", reverse("flights:airplane-list"))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["image_variants"], {})
+
+        airplane = Airplane.objects.get(id=response.data["id"])
+        self.assertEqual(
+            set(airplane.image_variants), {"thumbnail", "medium"}
+        )
+        with default_storage.open(
+            airplane.image_variants["thumbnail"]["webp"]
+        ) as file, Image.open(file) as thumbnail:
+            self.assertEqual(thumbnail.format, "WEBP")
+            self.assertEqual(thumbnail.size, (320, 240))
+        with default_storage.open(
+            airplane.image_variants["medium"]["jpeg"]
+        ) as file, Image.open(file) as medium:
+            self.assertEqual(medium.format, "JPEG")
+            self.assertEqual(medium.size, (1024, 768))
+
+        response = self.client.get(
+            reverse("flights:airplane-detail", args=[airplane.id])
+        )
+        self.assertEqual(
+            response.data["image_variants"]["thumbnail"]["jpeg"],
+            "http://testserver/"
+            + airplane.image_variants["thumbnail"]["jpeg"],
+        )
+
+    def test_new_upload_replaces_variants(self):
+        response = self.upload("post", reverse("flights:airplane-list"))
+        airplane = Airplane.objects.get(id=response.data["id"])
+        old_paths = [
+            path
+            for formats in airplane.image_variants.values()
+            for path in formats.values()
+        ]
+
+        response = self.upload(
+            "put", reverse("flights:airplane-detail", args=[airplane.id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        airplane.refresh_from_db()
+        self.assertEqual(len(airplane.image_variants), 2)
+        for path in old_paths:
+            self.assertFalse(default_storage.exists(path))
+
+    def test_saving_without_new_image_keeps_variants(self):
+        response = self.upload("post", reverse("flights:airplane-list"))
+        airplane = Airplane.objects.get(id=response.data["id"])
+        variants = airplane.image_variants
+
+        airplane.name = "Renamed"
+        airplane.save()
+
+        self.assertEqual(run_pending(), 0)
+        airplane.refresh_from_db()
+        self.assertEqual(airplane.image_variants, variants)
+
+
 class RouteViewSetTestCase(APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(
@@ -241,7 +364,7 @@ class RouteViewSetTestCase(APITestCase):
         url = reverse("flights:route-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data["results"]), 3)
 
     def test_list_routes_with_source_filter(self):
         url = (
@@ -250,7 +373,7 @@ class RouteViewSetTestCase(APITestCase):
         )
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_list_routes_with_destination_filter(self):
         url = (
@@ -259,7 +382,7 @@ class RouteViewSetTestCase(APITestCase):
         )
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_list_routes_with_source_and_destination_filter(self):
         url = (
@@ -271,7 +394,7 @@ class RouteViewSetTestCase(APITestCase):
         )
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
 
 class FlightViewSetTestCase(APITestCase):
@@ -338,14 +461,14 @@ class FlightViewSetTestCase(APITestCase):
         url = reverse("flights:flight-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data["results"]), 2)
 
     def test_list_flights_with_route_filter(self):
         url = reverse("flights:flight-list") + "?route=" + str(self.route1.id)
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["route"], self.route1.id)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["route"], self.route1.id)
 
     def test_list_flights_with_airplane_filter(self):
         url = (
@@ -354,8 +477,8 @@ class FlightViewSetTestCase(APITestCase):
         )
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["airplane"], self.airplane2.id)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["airplane"], self.airplane2.id)
 
     def test_list_flights_with_route_and_airplane_filters(self):
         url = (
@@ -367,9 +490,9 @@ class FlightViewSetTestCase(APITestCase):
         )
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["route"], self.route1.id)
-        self.assertEqual(response.data[0]["airplane"], self.airplane1.id)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["route"], self.route1.id)
+        self.assertEqual(response.data["results"][0]["airplane"], self.airplane1.id)
 
     def test_list_flights_with_invalid_filters(self):
         url = reverse("flights:flight-list") + "?route=abc&airplane=xyz"
@@ -430,7 +553,7 @@ class TicketViewSetTestCase(APITestCase):
         tickets = Ticket.objects.all().select_related("flight", "order")
         serializer = TicketReadOnlySerializer(tickets, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_list_tickets_with_flight_filter(self):
         url = (
@@ -445,7 +568,7 @@ class TicketViewSetTestCase(APITestCase):
         )
         serializer = TicketReadOnlySerializer(tickets, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_list_tickets_with_order_filter(self):
         url = reverse("flights:ticket-list") + "?order=" + str(self.order1.id)
@@ -457,7 +580,7 @@ class TicketViewSetTestCase(APITestCase):
         )
         serializer = TicketReadOnlySerializer(tickets, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_list_tickets_with_flight_and_order_filter(self):
         url = (
@@ -473,7 +596,7 @@ class TicketViewSetTestCase(APITestCase):
         ).select_related("flight", "order")
         serializer = TicketReadOnlySerializer(tickets, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_list_tickets_with_invalid_flight_filter(self):
         url = reverse("flights:ticket-list") + "?flight=abc"
@@ -489,3 +612,1538 @@ class TicketViewSetTestCase(APITestCase):
         url = reverse("flights:ticket-list") + "?flight=abc&order=xyz"
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CursorPaginationTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        country = Country.objects.create(name="Country 1")
+        city = City.objects.create(name="City 1", country=country)
+        airport1 = Airport.objects.create(
+            name="Airport 1", code="AAA", closest_big_city=city
+        )
+        airport2 = Airport.objects.create(
+            name="Airport 2", code="BBB", closest_big_city=city
+        )
+        self.route1 = Route.objects.create(
+            source=airport1, destination=airport2, distance=100
+        )
+        self.route2 = Route.objects.create(
+            source=airport2, destination=airport1, distance=100
+        )
+        airplane_type = AirplaneType.objects.create(name="Type 1")
+        airplane = Airplane.objects.create(
+            name="Airplane 1",
+            rows=10,
+            seats_in_row=6,
+            airplane_type=airplane_type,
+        )
+        now = timezone.now()
+        self.flights = [
+            Flight.objects.create(
+                route=self.route1 if hours % 2 else self.route2,
+                airplane=airplane,
+                departure_time=now + timedelta(hours=10 - hours),
+                arrival_time=now + timedelta(hours=12 - hours),
+            )
+            for hours in range(6)
+        ]
+
+    def collect_pages(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item["id"] for item in response.data["results"])
+            url = response.data["next"]
+        return ids
+
+    def test_flights_are_keyed_on_departure_time(self):
+        ids = self.collect_pages(
+            reverse("flights:flight-list") + "?page_size=2"
+        )
+        expected = [
+            flight.id
+            for flight in sorted(
+                self.flights, key=lambda f: (f.departure_time, f.id)
+            )
+        ]
+        self.assertEqual(ids, expected)
+
+    def test_flights_sharing_a_departure_time(self):
+        slot = self.flights[0]
+        self.flights += [
+            Flight.objects.create(
+                route=self.route1,
+                airplane=slot.airplane,
+                departure_time=slot.departure_time,
+                arrival_time=slot.arrival_time,
+            )
+            for _ in range(5)
+        ]
+        expected = [
+            flight.id
+            for flight in sorted(
+                self.flights, key=lambda f: (f.departure_time, f.id)
+            )
+        ]
+        url = reverse("flights:flight-list") + "?page_size=2"
+        ids, pages = [], []
+        with CaptureQueriesContext(connection) as context:
+            while url:
+                response = self.client.get(url)
+                pages.append(response.data)
+                ids.extend(item["id"] for item in response.data["results"])
+                url = response.data["next"]
+        self.assertEqual(ids, expected)
+        self.assertFalse(
+            [
+                query["sql"]
+                for query in context.captured_queries
+                if "OFFSET" in query["sql"]
+            ]
+        )
+
+        url, ids = pages[-1]["previous"], []
+        while url:
+            response = self.client.get(url)
+            ids[:0] = [item["id"] for item in response.data["results"]]
+            url = response.data["previous"]
+        self.assertEqual(ids, expected[: -len(pages[-1]["results"])])
+
+    def test_invalid_flight_cursor(self):
+        url = reverse("flights:flight-list") + "?page_size=2"
+        next_url = self.client.get(url).data["next"]
+        for position in ("x", '["x",1]', "[1]"):
+            cursor = base64.b64encode(
+                urlencode({"p": position}).encode()
+            ).decode()
+            response = self.client.get(f"{url}&cursor={cursor}")
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(next_url).status_code, 200)
+
+    def test_next_page_keeps_filters(self):
+        ids = self.collect_pages(
+            reverse("flights:flight-list")
+            + "?page_size=1&route="
+            + str(self.route1.id)
+        )
+        self.assertEqual(
+            sorted(ids),
+            sorted(f.id for f in self.flights if f.route_id == self.route1.id),
+        )
+
+    def test_page_size_is_capped(self):
+        with self.settings(API_MAX_PAGE_SIZE=4):
+            response = self.client.get(
+                reverse("flights:flight-list") + "?page_size=100"
+            )
+        self.assertEqual(len(response.data["results"]), 4)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_deep_page_uses_keyset_query(self):
+        url = reverse("flights:route-list") + "?page_size=1"
+        response = self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(response.data["next"])
+        (page_query,) = [
+            query["sql"]
+            for query in context.captured_queries
+            if "LIMIT" in query["sql"]
+        ]
+        self.assertNotIn("OFFSET", page_query)
+        self.assertIn('"id" >', page_query)
+
+
+class QueryCountTestCase(APITestCase):
+    """Guards against N+1 queries creeping back into nested list views.
+
+    Every read costs one aggregate for the conditional GET validators,
+    one query for the page and one prefetch of the crew.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        country = Country.objects.create(name="Country 1")
+        city = City.objects.create(name="City 1", country=country)
+        airport1 = Airport.objects.create(
+            name="Airport 1", code="AAA", closest_big_city=city
+        )
+        airport2 = Airport.objects.create(
+            name="Airport 2", code="BBB", closest_big_city=city
+        )
+        self.route = Route.objects.create(
+            source=airport1, destination=airport2, distance=100
+        )
+        airplane_type = AirplaneType.objects.create(name="Type 1")
+        self.airplane = Airplane.objects.create(
+            name="Airplane 1",
+            rows=10,
+            seats_in_row=6,
+            airplane_type=airplane_type,
+        )
+        self.crew = [
+            Crew.objects.create(first_name=f"First {i}", last_name="Last")
+            for i in range(3)
+        ]
+
+    def create_flights_with_tickets(self, count):
+        start = Flight.objects.count()
+        for i in range(start, start + count):
+            flight = Flight.objects.create(
+                route=self.route,
+                airplane=self.airplane,
+                departure_time=timezone.now() + timedelta(hours=i),
+                arrival_time=timezone.now() + timedelta(hours=i + 2),
+            )
+            flight.crew.set(self.crew)
+            user = User.objects.create_user(
+                email=f"passenger{i}@example.com", password="password"
+            )
+            order = Order.objects.create(user=user)
+            Ticket.objects.create(flight=flight, order=order, row=1, seat=1)
+
+    def test_flight_list_query_count_is_constant(self):
+        self.create_flights_with_tickets(1)
+        with self.assertNumQueries(3 + THROTTLE_QUERIES):
+            self.client.get(reverse("flights:flight-list"))
+        self.create_flights_with_tickets(5)
+        with self.assertNumQueries(3 + THROTTLE_QUERIES):
+            response = self.client.get(reverse("flights:flight-list"))
+        self.assertEqual(len(response.data["results"]), 6)
+        self.assertEqual(len(response.data["results"][0]["crew"]), 3)
+
+    def test_flight_retrieve_query_count(self):
+        self.create_flights_with_tickets(1)
+        flight = Flight.objects.get()
+        with self.assertNumQueries(3 + THROTTLE_QUERIES):
+            self.client.get(reverse("flights:flight-detail", args=[flight.id]))
+
+    def test_ticket_list_query_count_is_constant(self):
+        self.create_flights_with_tickets(1)
+        with self.assertNumQueries(3 + THROTTLE_QUERIES):
+            self.client.get(reverse("flights:ticket-list"))
+        self.create_flights_with_tickets(5)
+        with self.assertNumQueries(3 + THROTTLE_QUERIES):
+            response = self.client.get(reverse("flights:ticket-list"))
+        self.assertEqual(len(response.data["results"]), 6)
+        self.assertEqual(
+            response.data["results"][0]["order"]["user"]["email"],
+            "passenger0@example.com",
+        )
+
+    def test_sparse_fieldset_drops_unused_joins(self):
+        self.create_flights_with_tickets(2)
+        url = reverse("flights:flight-list") + "?fields=id,departure_time"
+        # No crew prefetch.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(
+            len(queries.captured_queries), 2 + THROTTLE_QUERIES
+        )
+        self.assertEqual(
+            set(response.data["results"][0]), {"id", "departure_time"}
+        )
+        (page_query,) = [
+            query["sql"]
+            for query in queries.captured_queries
+            if "LIMIT" in query["sql"]
+        ]
+        self.assertNotIn(Airplane._meta.db_table, page_query)
+
+    def test_sparse_fieldset_keeps_shared_joins(self):
+        self.create_flights_with_tickets(1)
+        url = reverse("flights:flight-list") + "?fields=id,airplane_name"
+        with self.assertNumQueries(2 + THROTTLE_QUERIES):
+            response = self.client.get(url)
+        self.assertEqual(
+            response.data["results"][0]["airplane_name"], "Airplane 1"
+        )
+
+    def test_sparse_fieldset_exclude(self):
+        self.create_flights_with_tickets(1)
+        url = reverse("flights:ticket-list") + "?exclude=flight,order"
+        with self.assertNumQueries(2 + THROTTLE_QUERIES):
+            response = self.client.get(url)
+        self.assertEqual(
+            set(response.data["results"][0]), {"id", "row", "seat"}
+        )
+
+    def test_sparse_fieldset_leaves_nested_serializers_alone(self):
+        self.create_flights_with_tickets(1)
+        url = reverse("flights:ticket-list") + "?fields=id,flight"
+        response = self.client.get(url)
+        ticket = response.data["results"][0]
+        self.assertEqual(set(ticket), {"id", "flight"})
+        self.assertEqual(len(ticket["flight"]["crew"]), 3)
+        self.assertEqual(ticket["flight"]["airplane_name"], "Airplane 1")
+
+
+class CompoundTicketListTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        country = Country.objects.create(name="Country 1")
+        city = City.objects.create(name="City 1", country=country)
+        airport = Airport.objects.create(
+            name="Airport 1", code="AAA", closest_big_city=city
+        )
+        route = Route.objects.create(
+            source=airport, destination=airport, distance=100
+        )
+        airplane = Airplane.objects.create(
+            name="Airplane 1",
+            rows=10,
+            seats_in_row=6,
+            airplane_type=AirplaneType.objects.create(name="Type 1"),
+        )
+        self.crew = [
+            Crew.objects.create(first_name=f"First {i}", last_name="Last")
+            for i in range(2)
+        ]
+        self.flights = []
+        for i in range(2):
+            flight = Flight.objects.create(
+                route=route,
+                airplane=airplane,
+                departure_time=timezone.now() + timedelta(hours=i),
+                arrival_time=timezone.now() + timedelta(hours=i + 2),
+            )
+            # Both flights share the first crew member.
+            flight.crew.set(self.crew[: i + 1])
+            self.flights.append(flight)
+        self.order = Order.objects.create(user=self.user)
+        for row in range(1, 6):
+            for flight in self.flights:
+                Ticket.objects.create(
+                    flight=flight, order=self.order, row=row, seat=1
+                )
+
+    def test_related_objects_are_included_once(self):
+        url = reverse("flights:ticket-list") + "?format=compound"
+        with self.assertNumQueries(5 + THROTTLE_QUERIES):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/json")
+        results = response.data["results"]
+        self.assertEqual(len(results), 10)
+        self.assertEqual(
+            {ticket["flight"] for ticket in results},
+            {flight.id for flight in self.flights},
+        )
+        included = response.data["included"]
+        self.assertEqual(
+            set(included["flights"]), {flight.id for flight in self.flights}
+        )
+        self.assertEqual(
+            included["flights"][self.flights[1].id]["crew"],
+            [member.id for member in self.crew],
+        )
+        self.assertEqual(
+            set(included["crew"]), {member.id for member in self.crew}
+        )
+        self.assertEqual(
+            included["orders"][self.order.id]["user"]["email"],
+            "test@example.com",
+        )
+        nested = self.client.get(reverse("flights:ticket-list"))
+        self.assertLess(len(response.content), len(nested.content) / 2)
+
+    def test_sparse_fieldset_limits_included(self):
+        url = (
+            reverse("flights:ticket-list") + "?format=compound&exclude=flight"
+        )
+        with self.assertNumQueries(3 + THROTTLE_QUERIES):
+            response = self.client.get(url)
+
+        self.assertEqual(set(response.data["included"]), {"orders"})
+        self.assertNotIn("flight", response.data["results"][0])
+
+    def test_compound_format_is_only_offered_for_lists(self):
+        ticket = Ticket.objects.first()
+        url = reverse("flights:ticket-detail", args=[ticket.id])
+        response = self.client.get(url + "?format=compound")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BatchRetrieveTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        country = Country.objects.create(name="Country 1")
+        city = City.objects.create(name="City 1", country=country)
+        self.airports = [
+            Airport.objects.create(
+                name=f"Airport {i}", code=f"AA{i}", closest_big_city=city
+            )
+            for i in range(4)
+        ]
+        airplane = Airplane.objects.create(
+            name="Airplane 1",
+            rows=10,
+            seats_in_row=6,
+            airplane_type=AirplaneType.objects.create(name="Type 1"),
+        )
+        crew = Crew.objects.create(first_name="First", last_name="Last")
+        self.flights = []
+        for i in range(4):
+            flight = Flight.objects.create(
+                route=Route.objects.create(
+                    source=self.airports[i],
+                    destination=self.airports[i - 1],
+                    distance=100,
+                ),
+                airplane=airplane,
+                departure_time=timezone.now() + timedelta(hours=i),
+                arrival_time=timezone.now() + timedelta(hours=i + 2),
+            )
+            flight.crew.add(crew)
+            self.flights.append(flight)
+
+    def test_flights_by_ids(self):
+        ids = [self.flights[0].id, self.flights[2].id, self.flights[3].id]
+        url = reverse("flights:flight-list") + "?ids=%s,%s,%s" % tuple(ids)
+        with self.assertNumQueries(3 + THROTTLE_QUERIES):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual([flight["id"] for flight in results], ids)
+        self.assertEqual(results[0]["crew"][0]["first_name"], "First")
+
+    def test_all_ids_fit_on_one_page(self):
+        ids = [airport.id for airport in self.airports[:3]]
+        url = reverse("flights:airport-list") + "?ids=%s,%s,%s" % tuple(ids)
+        with mock.patch.object(IdCursorPagination, "page_size", 1):
+            response = self.client.get(url)
+
+        self.assertEqual(
+            [airport["id"] for airport in response.data["results"]], ids
+        )
+        self.assertIsNone(response.data["next"])
+
+    def test_page_size_parameter_is_ignored(self):
+        ids = [airport.id for airport in self.airports[:3]]
+        response = self.client.get(
+            reverse("flights:airport-list"),
+            {"ids": ",".join(map(str, ids)), "page_size": 1},
+        )
+        self.assertEqual(
+            [airport["id"] for airport in response.data["results"]], ids
+        )
+
+    def test_repeated_ids_parameter(self):
+        route_ids = [flight.route_id for flight in self.flights[:2]]
+        response = self.client.get(
+            reverse("flights:route-list"), {"ids": route_ids}
+        )
+        self.assertEqual(
+            [route["id"] for route in response.data["results"]], route_ids
+        )
+
+    @override_settings(API_MAX_BATCH_IDS=2)
+    def test_number_of_ids_is_capped(self):
+        response = self.client.get(
+            reverse("flights:flight-list") + "?ids=1,2,3"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("ids", response.data)
+
+    def test_invalid_ids(self):
+        response = self.client.get(reverse("flights:crew-list") + "?ids=1,x")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ValuesListRenderingTestCase(APITestCase):
+    """The values() list path must render exactly what the serializers do."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        country = Country.objects.create(name="Country 1")
+        city = City.objects.create(name="City 1", country=country)
+        airport1 = Airport.objects.create(
+            name="Airport 1", code="AAA", closest_big_city=city
+        )
+        airport2 = Airport.objects.create(
+            name="Airport 2", code="BBB", closest_big_city=city
+        )
+        route = Route.objects.create(
+            source=airport1, destination=airport2, distance=1234
+        )
+        airplane = Airplane.objects.create(
+            name="Airplane 1",
+            rows=10,
+            seats_in_row=6,
+            airplane_type=AirplaneType.objects.create(name="Type 1"),
+        )
+        crew = [
+            Crew.objects.create(first_name=f"First {i}", last_name="Last")
+            for i in range(2)
+        ]
+        departure = timezone.now().replace(microsecond=123456)
+        for i in range(3):
+            flight = Flight.objects.create(
+                route=route,
+                airplane=airplane,
+                departure_time=departure + timedelta(hours=i),
+                arrival_time=departure + timedelta(hours=i + 2),
+            )
+            # The last flight has no crew.
+            flight.crew.set(crew[: 2 - i])
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(flight=flight, order=order, row=1, seat=1)
+
+    def get_both(self, url):
+        responses = []
+        for enabled in (False, True):
+            get_cache().clear()
+            with override_settings(VALUES_LIST_RENDERING=enabled):
+                responses.append(self.client.get(url))
+        return responses
+
+    def test_lists_are_identical(self):
+        for url in (
+            reverse("flights:flight-list"),
+            reverse("flights:flight-list") + "?page_size=1",
+            reverse("flights:flight-list")
+            + "?fields=id,crew,tickets_available",
+            reverse("flights:route-list"),
+            reverse("flights:city-list"),
+        ):
+            with self.subTest(url=url):
+                serialized, values = self.get_both(url)
+                self.assertEqual(values.status_code, status.HTTP_200_OK)
+                self.assertEqual(values.content, serialized.content)
+
+    def test_crew_is_ordered_by_id(self):
+        flight = Flight.objects.get(crew__isnull=True)
+        crew = list(Crew.objects.order_by("id"))
+        # Assigned in the reverse order of their ids.
+        for member in reversed(crew):
+            flight.crew.add(member)
+        url = reverse("flights:flight-list")
+        with CaptureQueriesContext(connection) as context:
+            serialized, values = self.get_both(url)
+        self.assertEqual(values.content, serialized.content)
+        # SQLite happens to return them in order either way.
+        crew_queries = [
+            query["sql"]
+            for query in context.captured_queries
+            if 'FROM "flights_crew" INNER JOIN' in query["sql"]
+        ]
+        self.assertEqual(len(crew_queries), 2)
+        for sql in crew_queries:
+            self.assertIn('ORDER BY "flights_crew"."id"', sql)
+        (rendered,) = [
+            item
+            for item in values.data["results"]
+            if item["id"] == flight.id
+        ]
+        self.assertEqual(
+            [member["id"] for member in rendered["crew"]],
+            [member.id for member in crew],
+        )
+
+    def test_crew_full_name(self):
+        response = self.client.get(reverse("flights:flight-list"))
+        self.assertEqual(
+            response.data["results"][0]["crew"][0]["full_name"],
+            "First 0 Last",
+        )
+
+    def test_query_count(self):
+        with self.assertNumQueries(3 + THROTTLE_QUERIES):
+            self.client.get(reverse("flights:flight-list"))
+        with self.assertNumQueries(2 + THROTTLE_QUERIES):
+            self.client.get(
+                reverse("flights:flight-list") + "?exclude=crew"
+            )
+
+
+class FlightSeatsTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        country = Country.objects.create(name="Country 1")
+        city = City.objects.create(name="City 1", country=country)
+        airport = Airport.objects.create(
+            name="Airport 1", code="AAA", closest_big_city=city
+        )
+        route = Route.objects.create(
+            source=airport, destination=airport, distance=100
+        )
+        airplane_type = AirplaneType.objects.create(name="Type 1")
+        airplane = Airplane.objects.create(
+            name="Airplane 1",
+            rows=3,
+            seats_in_row=4,
+            airplane_type=airplane_type,
+        )
+        self.flight = Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time=timezone.now(),
+            arrival_time=timezone.now() + timedelta(hours=2),
+        )
+        self.order = Order.objects.create(user=self.user)
+        Ticket.objects.create(flight=self.flight, order=self.order, row=1, seat=2)
+        Ticket.objects.create(flight=self.flight, order=self.order, row=3, seat=4)
+        self.url = reverse("flights:flight-seats", args=[self.flight.id])
+
+    def test_seat_map(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["seats"], ["0100", "0000", "0001"])
+        self.assertEqual(response.data["capacity"], 12)
+        self.assertEqual(response.data["taken"], 2)
+        self.assertEqual(response.data["available"], 10)
+
+    def test_seat_map_is_cached(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(1 + THROTTLE_QUERIES):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["taken"], 2)
+
+    def test_seat_map_is_invalidated_on_ticket_changes(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket = Ticket.objects.create(
+                flight=self.flight, order=self.order, row=2, seat=1
+            )
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["seats"][1], "1000")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["seats"][1], "0000")
+
+    def test_seat_map_is_invalidated_on_commit(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Ticket.objects.create(
+                flight=self.flight, order=self.order, row=2, seat=1
+            )
+            # Nothing is dropped before the commit, so a request made in
+            # the meantime cannot cache the seats of the old snapshot.
+            response = self.client.get(self.url)
+            self.assertEqual(response.data["seats"][1], "0000")
+        self.assertTrue(callbacks)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["seats"][1], "1000")
+
+    def test_seat_map_unknown_flight(self):
+        response = self.client.get(
+            reverse("flights:flight-seats", args=[self.flight.id + 100])
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class OrderBookingTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="admin@example.com", password="testpassword", is_staff=True
+        )
+        self.client.force_authenticate(user=self.user)
+        country = Country.objects.create(name="Country 1")
+        city = City.objects.create(name="City 1", country=country)
+        airport = Airport.objects.create(
+            name="Airport 1", code="AAA", closest_big_city=city
+        )
+        route = Route.objects.create(
+            source=airport, destination=airport, distance=100
+        )
+        airplane_type = AirplaneType.objects.create(name="Type 1")
+        airplane = Airplane.objects.create(
+            name="Airplane 1",
+            rows=10,
+            seats_in_row=4,
+            airplane_type=airplane_type,
+        )
+        self.flight = Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time=timezone.now(),
+            arrival_time=timezone.now() + timedelta(hours=2),
+        )
+        self.url = reverse("flights:order-book")
+
+    def book(self, *seats):
+        return self.client.post(
+            self.url,
+            {
+                "tickets": [
+                    {"flight": self.flight.id, "row": row, "seat": seat}
+                    for row, seat in seats
+                ]
+            },
+            format="json",
+        )
+
+    def test_book_order_with_tickets(self):
+        seats = [(row, seat) for row in range(1, 6) for seat in (1, 2)]
+        with CaptureQueriesContext(connection) as context:
+            response = self.book(*seats)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["tickets"]), 10)
+        order = Order.objects.get(id=response.data["id"])
+        self.assertEqual(order.user, self.user)
+        self.assertEqual(
+            set(order.ticket_set.values_list("row", "seat")), set(seats)
+        )
+        few_seats_queries = len(context.captured_queries)
+
+        with CaptureQueriesContext(connection) as context:
+            self.book((10, 3), (10, 4))
+        self.assertEqual(len(context.captured_queries), few_seats_queries)
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.tickets_sold, 12)
+        response = self.client.get(
+            reverse("flights:flight-detail", args=[self.flight.id])
+        )
+        self.assertEqual(response.data["tickets_available"], 28)
+
+    def test_book_out_of_range_seat(self):
+        response = self.book((1, 1), (11, 5))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["tickets"][0], {})
+        self.assertIn("row", response.data["tickets"][1])
+        self.assertIn("seat", response.data["tickets"][1])
+        self.assertFalse(Order.objects.exists())
+
+    def test_book_taken_seat(self):
+        Ticket.objects.create(
+            flight=self.flight,
+            order=Order.objects.create(user=self.user),
+            row=1,
+            seat=1,
+        )
+        response = self.book((1, 2), (1, 1))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("seat", response.data["tickets"][1])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_book_same_seat_twice(self):
+        response = self.book((1, 1), (1, 1))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+    def test_book_refreshes_seat_map(self):
+        seats_url = reverse("flights:flight-seats", args=[self.flight.id])
+        self.client.get(seats_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book((1, 1))
+        response = self.client.get(seats_url)
+        self.assertEqual(response.data["taken"], 1)
+
+
+class FlightSearchTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        country = Country.objects.create(name="Country 1")
+        city = City.objects.create(name="City 1", country=country)
+        kbp = Airport.objects.create(
+            name="Boryspil", code="KBP", closest_big_city=city
+        )
+        lhr = Airport.objects.create(
+            name="Heathrow", code="LHR", closest_big_city=city
+        )
+        self.route = Route.objects.create(
+            source=kbp, destination=lhr, distance=2200
+        )
+        back_route = Route.objects.create(
+            source=lhr, destination=kbp, distance=2200
+        )
+        airplane_type = AirplaneType.objects.create(name="Type 1")
+        airplane = Airplane.objects.create(
+            name="Airplane 1",
+            rows=10,
+            seats_in_row=4,
+            airplane_type=airplane_type,
+        )
+        departure = timezone.make_aware(datetime(2024, 6, 1, 10))
+        self.flights = [
+            Flight.objects.create(
+                route=self.route,
+                airplane=airplane,
+                departure_time=departure + timedelta(days=day),
+                arrival_time=departure + timedelta(days=day, hours=3),
+            )
+            for day in range(3)
+        ]
+        Flight.objects.create(
+            route=back_route,
+            airplane=airplane,
+            departure_time=departure,
+            arrival_time=departure + timedelta(hours=3),
+        )
+        order = Order.objects.create(user=self.user)
+        for seat in (1, 2, 3):
+            Ticket.objects.create(
+                flight=self.flights[0], order=order, row=1, seat=seat
+            )
+        self.url = reverse("flights:flight-search")
+
+    def test_search_by_airport_codes(self):
+        response = self.client.get(self.url + "?from=kbp&to=LHR")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual(
+            [flight["id"] for flight in results],
+            [flight.id for flight in self.flights],
+        )
+        self.assertEqual(results[0]["seats_remaining"], 37)
+        self.assertEqual(results[1]["seats_remaining"], 40)
+
+    def test_search_by_date_window(self):
+        response = self.client.get(
+            self.url
+            + "?from=KBP&to=LHR&date_from=2024-06-02&date_to=2024-06-02"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [flight["id"] for flight in response.data["results"]],
+            [self.flights[1].id],
+        )
+
+    def test_search_query_count(self):
+        with self.assertNumQueries(2 + 2 * THROTTLE_QUERIES):
+            self.client.get(self.url + "?from=KBP&to=LHR")
+
+    def test_search_requires_airports(self):
+        response = self.client.get(self.url + "?from=KBP")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_with_invalid_date(self):
+        response = self.client.get(
+            self.url + "?from=KBP&to=LHR&date_from=2024-13-01"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FlightConnectionsTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        country = Country.objects.create(name="Country 1")
+        city = City.objects.create(name="City 1", country=country)
+        kbp, waw, lhr = (
+            Airport.objects.create(
+                name=f"Airport {code}", code=code, closest_big_city=city
+            )
+            for code in ("KBP", "WAW", "LHR")
+        )
+        first_route = Route.objects.create(
+            source=kbp, destination=waw, distance=700
+        )
+        second_route = Route.objects.create(
+            source=waw, destination=lhr, distance=1400
+        )
+        airplane_type = AirplaneType.objects.create(name="Type 1")
+        airplane = Airplane.objects.create(
+            name="Airplane 1",
+            rows=10,
+            seats_in_row=4,
+            airplane_type=airplane_type,
+        )
+        departure = timezone.make_aware(datetime(2024, 6, 1, 8))
+        self.first = Flight.objects.create(
+            route=first_route,
+            airplane=airplane,
+            departure_time=departure,
+            arrival_time=departure + timedelta(hours=1),
+        )
+        self.second = Flight.objects.create(
+            route=second_route,
+            airplane=airplane,
+            departure_time=departure + timedelta(hours=3),
+            arrival_time=departure + timedelta(hours=5),
+        )
+        self.url = reverse("flights:flight-connections")
+
+    def test_connections(self):
+        response = self.client.get(
+            self.url + "?from=KBP&to=LHR&date=2024-06-01"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["truncated"])
+        itinerary = response.data["results"][0]
+        self.assertEqual(itinerary["stops"], 1)
+        self.assertEqual(itinerary["distance"], 2100)
+        self.assertEqual(itinerary["duration_minutes"], 300)
+        self.assertEqual(
+            [leg["id"] for leg in itinerary["legs"]],
+            [self.first.id, self.second.id],
+        )
+
+    def test_connections_without_stops(self):
+        response = self.client.get(
+            self.url + "?from=KBP&to=LHR&date=2024-06-01&max_stops=0"
+        )
+        self.assertEqual(response.data["results"], [])
+
+    def test_connections_invalid_params(self):
+        for query in (
+            "?from=KBP&to=LHR",
+            "?from=KBP&to=LHR&date=2024-06-01&max_stops=5",
+            "?from=KBP&to=LHR&date=2024-06-01&sort=price",
+        ):
+            response = self.client.get(self.url + query)
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST, query
+            )
+
+
+class ReferenceCacheTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.country = Country.objects.create(name="Country 1")
+        self.city = City.objects.create(name="City 1", country=self.country)
+
+    def test_list_is_served_from_cache(self):
+        url = reverse("flights:country-list")
+        response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        with self.assertNumQueries(THROTTLE_QUERIES):
+            cached = self.client.get(url)
+        self.assertEqual(cached["X-Cache"], "HIT")
+        self.assertEqual(cached.data, response.data)
+
+    def test_filters_are_part_of_the_key(self):
+        other_country = Country.objects.create(name="Country 2")
+        City.objects.create(name="City 2", country=other_country)
+        url = reverse("flights:city-list")
+        self.client.get(url + f"?country={self.country.id}")
+        response = self.client.get(url + f"?country={other_country.id}")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(
+            [city["name"] for city in response.data["results"]], ["City 2"]
+        )
+
+    def test_query_params_are_normalized(self):
+        url = reverse("flights:city-list")
+        self.client.get(url + "?country=1&country=2&page_size=5")
+        response = self.client.get(url + "?page_size=5&country=2&country=1")
+        self.assertEqual(response["X-Cache"], "HIT")
+
+    def test_model_changes_invalidate_dependent_lists(self):
+        cities_url = reverse("flights:city-list")
+        airports_url = reverse("flights:airport-list")
+        self.client.get(cities_url)
+        self.client.get(airports_url)
+
+        self.country.name = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.country.save()
+
+        response = self.client.get(cities_url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["results"][0]["country_name"], "Renamed")
+        self.assertEqual(self.client.get(airports_url)["X-Cache"], "HIT")
+
+    def test_stats(self):
+        url = reverse("flights:country-list")
+        self.client.get(url)
+        self.client.get(url)
+        self.client.get(url)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse("flights:cache-stats"))
+        self.assertEqual(response.data, {"hits": 2, "misses": 1})
+
+    def test_stats_require_admin(self):
+        response = self.client.get(reverse("flights:cache-stats"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ConditionalGetTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        country = Country.objects.create(name="Country 1")
+        city = City.objects.create(name="City 1", country=country)
+        airport = Airport.objects.create(
+            name="Airport 1", code="AAA", closest_big_city=city
+        )
+        route = Route.objects.create(
+            source=airport, destination=airport, distance=100
+        )
+        airplane_type = AirplaneType.objects.create(name="Type 1")
+        airplane = Airplane.objects.create(
+            name="Airplane 1",
+            rows=10,
+            seats_in_row=6,
+            airplane_type=airplane_type,
+        )
+        self.flight = Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time=timezone.now(),
+            arrival_time=timezone.now() + timedelta(hours=2),
+        )
+        self.crew = Crew.objects.create(first_name="John", last_name="Doe")
+        self.list_url = reverse("flights:flight-list")
+        self.detail_url = reverse("flights:flight-detail", args=[self.flight.id])
+
+    def test_list_not_modified(self):
+        response = self.client.get(self.list_url)
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+        # The ids of the page, then the validators of those rows.
+        with self.assertNumQueries(2 + THROTTLE_QUERIES):
+            response = self.client.get(
+                self.list_url, HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_if_modified_since(self):
+        response = self.client.get(self.list_url)
+        response = self.client.get(
+            self.list_url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_etag_changes_with_data(self):
+        etag = self.client.get(self.list_url)["ETag"]
+        self.flight.crew.add(self.crew)
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+        etag = response["ETag"]
+        self.flight.delete()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_validators_cover_the_page(self):
+        later = Flight.objects.create(
+            route=self.flight.route,
+            airplane=self.flight.airplane,
+            departure_time=self.flight.departure_time + timedelta(days=1),
+            arrival_time=self.flight.arrival_time + timedelta(days=1),
+        )
+        url = f"{self.list_url}?page_size=1"
+        with CaptureQueriesContext(connection) as queries:
+            etag = self.client.get(url)["ETag"]
+        (validators_query,) = [
+            query["sql"]
+            for query in queries.captured_queries
+            if "COUNT(DISTINCT" in query["sql"]
+        ]
+        self.assertIn(f"IN ({self.flight.id})", validators_query)
+
+        later.crew.add(self.crew)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.flight.crew.add(self.crew)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["ETag"], self.client.get(url)["ETag"])
+
+    def test_crew_delete_changes_etag(self):
+        self.flight.crew.add(self.crew)
+        etag = self.client.get(self.detail_url)["ETag"]
+        self.crew.delete()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["crew"], [])
+
+    def assert_user_change_changes_etag(self, url):
+        etag = self.client.get(url)["ETag"]
+        self.user.email = "changed@example.com"
+        self.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_order_user_change_changes_etag(self):
+        Order.objects.create(user=self.user)
+        response = self.assert_user_change_changes_etag(
+            reverse("flights:order-list")
+        )
+        self.assertEqual(
+            response.data["results"][0]["user"]["email"],
+            "changed@example.com",
+        )
+
+    def test_ticket_user_change_changes_etag(self):
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(flight=self.flight, order=order, row=1, seat=1)
+        response = self.assert_user_change_changes_etag(
+            reverse("flights:ticket-list")
+        )
+        self.assertEqual(
+            response.data["results"][0]["order"]["user"]["email"],
+            "changed@example.com",
+        )
+
+    def test_detail_not_modified(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.flight.arrival_time += timedelta(minutes=5)
+        self.flight.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_malformed_id(self):
+        response = self.client.get("/api/flights/flights/abc/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cached_list_not_modified_without_queries(self):
+        url = reverse("flights:country-list")
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(THROTTLE_QUERIES):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class FlightManifestTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        country = Country.objects.create(name="Country 1")
+        city = City.objects.create(name="City 1", country=country)
+        airport = Airport.objects.create(
+            name="Airport 1", code="AAA", closest_big_city=city
+        )
+        route = Route.objects.create(
+            source=airport, destination=airport, distance=100
+        )
+        airplane_type = AirplaneType.objects.create(name="Type 1")
+        airplane = Airplane.objects.create(
+            name="Airplane 1",
+            rows=10,
+            seats_in_row=6,
+            airplane_type=airplane_type,
+        )
+        departure = timezone.make_aware(datetime(2024, 6, 1, 10))
+        self.flight = Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time=departure,
+            arrival_time=departure + timedelta(hours=2),
+        )
+        self.next_day_flight = Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time=departure + timedelta(days=1),
+            arrival_time=departure + timedelta(days=1, hours=2),
+        )
+        self.order = Order.objects.create(user=self.user)
+        Ticket.objects.create(flight=self.flight, order=self.order, row=2, seat=1)
+        Ticket.objects.create(flight=self.flight, order=self.order, row=1, seat=3)
+        Ticket.objects.create(
+            flight=self.next_day_flight, order=self.order, row=1, seat=1
+        )
+        self.url = reverse("flights:flight-manifest", args=[self.flight.id])
+
+    def read(self, response):
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_manifest(self):
+        response = self.client.get(self.url.rstrip("/") + ".csv")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        lines = self.read(response).splitlines()
+        self.assertEqual(
+            lines[0],
+            "flight,departure_time,ticket,row,seat,order,ordered_at,"
+            "passenger_email",
+        )
+        self.assertEqual(
+            [line.split(",")[3:5] for line in lines[1:]],
+            [["1", "3"], ["2", "1"]],
+        )
+        self.assertTrue(lines[1].endswith("test@example.com"))
+
+    def test_ndjson_manifest(self):
+        response = self.client.get(self.url.rstrip("/") + ".ndjson")
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["flight"], self.flight.id)
+        self.assertEqual(rows[0]["departure_time"], "2024-06-01T10:00:00Z")
+        self.assertEqual(rows[0]["passenger_email"], "test@example.com")
+
+    def test_manifest_of_unknown_flight(self):
+        response = self.client.get(
+            reverse("flights:flight-manifest", args=[self.flight.id + 100])
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_batch_manifest(self):
+        url = reverse("flights:flight-batch-manifest").rstrip("/")
+        response = self.client.get(
+            url + ".ndjson?date_from=2024-06-01&date_to=2024-06-02"
+        )
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(
+            [row["flight"] for row in rows],
+            [self.flight.id, self.flight.id, self.next_day_flight.id],
+        )
+
+        response = self.client.get(url + ".csv?date_from=2024-06-02")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ServerTimingTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        country = Country.objects.create(name="Country 1")
+        City.objects.create(name="City 1", country=country)
+
+    def test_server_timing_header(self):
+        url = reverse("flights:city-list")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        metrics = {
+            metric.split(";")[0].strip(): metric
+            for metric in response["Server-Timing"].split(",")
+        }
+        self.assertEqual(
+            set(metrics), {"db", "view", "serializer", "render", "total"}
+        )
+        self.assertIn(f'desc="{len(queries)} queries"', metrics["db"])
+
+    def test_request_is_logged(self):
+        url = reverse("flights:city-list")
+        with self.assertLogs("flights.requests", level="INFO") as logs:
+            self.client.get(url)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["method"], "GET")
+        self.assertEqual(record["path"], url)
+        self.assertEqual(record["view"], "flights:city-list")
+        self.assertEqual(record["status"], 200)
+        self.assertGreater(record["db_queries"], 0)
+        for name in ("db", "view", "serializer", "render", "total"):
+            self.assertGreaterEqual(record[f"{name}_ms"], 0)
+
+    def test_header_can_be_disabled(self):
+        with self.settings(SERVER_TIMING_HEADER=False):
+            response = self.client.get(reverse("flights:city-list"))
+        self.assertNotIn("Server-Timing", response)
+
+
+class MetricsTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+        Country.objects.create(name="Country 1")
+
+    @staticmethod
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_are_counted_per_action(self):
+        labels = {"view": "CountryViewSet", "action": "list", "method": "GET"}
+        requests = self.sample(
+            "airport_api_requests_total", status="200", **labels
+        )
+        latency = self.sample(
+            "airport_api_request_duration_seconds_count", **labels
+        )
+        queries = self.sample("airport_api_request_queries_count", **labels)
+
+        self.client.get(reverse("flights:country-list"))
+
+        self.assertEqual(
+            self.sample("airport_api_requests_total", status="200", **labels),
+            requests + 1,
+        )
+        self.assertEqual(
+            self.sample("airport_api_request_duration_seconds_count", **labels),
+            latency + 1,
+        )
+        self.assertEqual(
+            self.sample("airport_api_request_queries_count", **labels),
+            queries + 1,
+        )
+
+    def test_throttled_requests_are_counted(self):
+        labels = {"view": "CountryViewSet", "action": "list", "method": "GET"}
+        throttled = self.sample("airport_api_throttled_requests_total", **labels)
+        with mock.patch(
+            "rest_framework.views.APIView.check_throttles",
+            side_effect=Throttled(),
+        ):
+            response = self.client.get(reverse("flights:country-list"))
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(
+            self.sample("airport_api_throttled_requests_total", **labels),
+            throttled + 1,
+        )
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse("flights:country-list"))
+        with self.settings(METRICS_TOKEN="secret"):
+            response = self.client.get(
+                reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(
+            b'airport_api_requests_total{action="list",method="GET",'
+            b'status="200",view="CountryViewSet"}',
+            response.content,
+        )
+
+    def test_metrics_token(self):
+        with self.settings(METRICS_TOKEN="secret"):
+            self.assertEqual(
+                self.client.get(reverse("metrics")).status_code,
+                status.HTTP_403_FORBIDDEN,
+            )
+            response = self.client.get(
+                reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_metrics_without_token_are_staff_only(self):
+        self.assertEqual(
+            self.client.get(reverse("metrics")).status_code,
+            status.HTTP_403_FORBIDDEN,
+        )
+        self.client.force_login(self.user)
+        self.assertEqual(
+            self.client.get(reverse("metrics")).status_code,
+            status.HTTP_403_FORBIDDEN,
+        )
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(
+            self.client.get(reverse("metrics")).status_code,
+            status.HTTP_200_OK,
+        )
+
+    def test_multiprocess_registry(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch.dict(
+            os.environ, {"PROMETHEUS_MULTIPROC_DIR": directory}
+        ):
+            self.assertIsNot(get_registry(), REGISTRY)
+        self.assertIs(get_registry(), REGISTRY)
+
+
+class AsyncReadViewsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpassword"
+        )
+        self.headers = {
+            "Authorization": f"Bearer {AccessToken.for_user(self.user)}"
+        }
+        country = Country.objects.create(name="Country 1")
+        city = City.objects.create(name="City 1", country=country)
+        source = Airport.objects.create(
+            name="Airport 1", code="AAA", closest_big_city=city
+        )
+        destination = Airport.objects.create(
+            name="Airport 2", code="BBB", closest_big_city=city
+        )
+        self.route = Route.objects.create(
+            source=source, destination=destination, distance=100
+        )
+        airplane_type = AirplaneType.objects.create(name="Type 1")
+        airplane = Airplane.objects.create(
+            name="Airplane 1", rows=2, seats_in_row=2, airplane_type=airplane_type
+        )
+        crew = Crew.objects.create(first_name="John", last_name="Doe")
+        departure = timezone.now().replace(microsecond=0)
+        self.flights = []
+        for hours in (3, 1, 1, 2):
+            flight = Flight.objects.create(
+                route=self.route,
+                airplane=airplane,
+                departure_time=departure + timedelta(hours=hours),
+                arrival_time=departure + timedelta(hours=hours + 2),
+            )
+            flight.crew.add(crew)
+            self.flights.append(flight)
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(
+            flight=self.flights[0], order=order, row=2, seat=1
+        )
+
+    async def get(self, url, **kwargs):
+        return await self.async_client.get(url, headers=self.headers, **kwargs)
+
+    async def test_authentication_is_required(self):
+        response = await self.async_client.get(
+            reverse("flights:async-flight-list")
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await self.async_client.get(
+            reverse("flights:async-flight-list"),
+            headers={"Authorization": "Bearer invalid"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_token_authentication(self):
+        token = await Token.objects.acreate(user=self.user)
+        response = await self.async_client.get(
+            reverse("flights:async-route-list"),
+            headers={"Authorization": f"Token {token.key}"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    async def test_flight_list_matches_sync_serializer(self):
+        response = await self.get(reverse("flights:async-flight-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        flights = [
+            flight
+            async for flight in Flight.objects.select_related("airplane")
+            .prefetch_related("crew")
+            .order_by("departure_time", "id")
+        ]
+        self.assertEqual(
+            response.json()["results"],
+            json.loads(
+                json.dumps(FlightSerializer(flights, many=True).data)
+            ),
+        )
+        self.assertIsNone(response.json()["next"])
+
+    async def test_keyset_pages(self):
+        url = reverse("flights:async-flight-list") + "?page_size=1"
+        seen = []
+        while url:
+            response = await self.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += [flight["id"] for flight in response.json()["results"]]
+            url = response.json()["next"]
+        expected = [
+            flight.id
+            for flight in sorted(
+                self.flights, key=lambda flight: (flight.departure_time, flight.id)
+            )
+        ]
+        self.assertEqual(seen, expected)
+
+    async def test_invalid_cursor(self):
+        response = await self.get(
+            reverse("flights:async-flight-list") + "?cursor=invalid"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_filters(self):
+        response = await self.get(
+            reverse("flights:async-route-list") + f"?source={self.route.source_id}"
+        )
+        self.assertEqual(
+            [route["id"] for route in response.json()["results"]],
+            [self.route.id],
+        )
+        response = await self.get(
+            reverse("flights:async-flight-list") + "?route=abc"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_detail(self):
+        response = await self.get(
+            reverse("flights:async-airport-detail", args=[self.route.source_id])
+        )
+        self.assertEqual(response.json()["code"], "AAA")
+        response = await self.get(
+            reverse("flights:async-flight-detail", args=[0])
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_seat_map(self):
+        response = await self.get(
+            reverse("flights:async-flight-seats", args=[self.flights[0].id])
+        )
+        self.assertEqual(response.json()["seats"], ["00", "10"])
+        self.assertEqual(response.json()["available"], 3)
+
+    async def test_writes_are_rejected(self):
+        response = await self.async_client.post(
+            reverse("flights:async-flight-list"), headers=self.headers
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+
+    async def test_queries_are_timed(self):
+        response = await self.get(reverse("flights:async-flight-list"))
+        self.assertIn('db;dur=', response["Server-Timing"])
+        self.assertNotIn('desc="0 queries"', response["Server-Timing"])
+
+
+class ThrottlingTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="admin@example.com", password="testpassword", is_staff=True
+        )
+        self.client.force_authenticate(user=self.user)
+        rates = {
+            "anon": "100/min",
+            "user": "100/min",
+            "search": "2/min",
+            "booking": "1/min",
+        }
+        patcher = mock.patch.object(
+            SlidingWindowRateThrottle, "THROTTLE_RATES", rates
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_search_has_its_own_rate(self):
+        url = reverse("flights:flight-search") + "?from=AAA&to=BBB"
+        for _ in range(2):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        response = self.client.get(url)
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertIn("Retry-After", response)
+        response = self.client.get(reverse("flights:flight-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_booking_scope(self):
+        url = reverse("flights:order-book")
+        self.assertEqual(
+            self.client.post(url, {}, format="json").status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(
+            self.client.post(url, {}, format="json").status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
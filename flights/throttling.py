@@ -0,0 +1,166 @@
+import time
+from dataclasses import dataclass
+
+from django.db import connection
+from rest_framework.throttling import SimpleRateThrottle
+
+from flights.models import ThrottleBucket
+
+
+def upsert_sql():
+    quote = connection.ops.quote_name
+    table = quote(ThrottleBucket._meta.db_table)
+    key, period, hits, previous_hits, allowed, expires_at = map(
+        quote, ("key", "period", "hits", "previous_hits", "allowed", "expires_at")
+    )
+    # Hits of the current and the previous window once the stored row has
+    # been rolled forward to the period of this request.
+    current = (
+        f"CASE WHEN bucket.{period} = excluded.{period} "
+        f"THEN bucket.{hits} ELSE 0 END"
+    )
+    previous = (
+        f"CASE WHEN bucket.{period} = excluded.{period} "
+        f"THEN bucket.{previous_hits} "
+        f"WHEN bucket.{period} = excluded.{period} - 1 "
+        f"THEN bucket.{hits} ELSE 0 END"
+    )
+    under_limit = f"({previous}) * %(weight)s + ({current}) < %(limit)s"
+    return (
+        f"INSERT INTO {table} AS bucket "
+        f"({key}, {period}, {hits}, {previous_hits}, {allowed}, {expires_at}) "
+        f"VALUES (%(key)s, %(period)s, 1, 0, TRUE, %(expires_at)s) "
+        f"ON CONFLICT ({key}) DO UPDATE SET "
+        f"{period} = excluded.{period}, "
+        f"{previous_hits} = {previous}, "
+        f"{hits} = {current} + CASE WHEN {under_limit} THEN 1 ELSE 0 END, "
+        f"{allowed} = {under_limit}, "
+        f"{expires_at} = excluded.{expires_at} "
+        f"RETURNING {hits}, {previous_hits}, {allowed}"
+    )
+
+
+@dataclass
+class Window:
+    allowed: bool
+    hits: int
+    previous_hits: int
+    elapsed: float
+
+    def wait(self, limit, duration):
+        """Seconds until the weighted count drops below ``limit`` again."""
+        if self.hits < limit and self.previous_hits:
+            target = 1 - (limit - self.hits) / self.previous_hits
+        else:
+            # The current window is full: wait for the next one and for
+            # enough of this window's hits to slide out of it.
+            target = 1 + max(0.0, 1 - limit / max(self.hits, 1))
+        return max(0.0, target - self.elapsed) * duration
+
+
+def hit(key, limit, duration, now=None):
+    """Count a request against ``key`` if it is within ``limit``.
+
+    The request rate is estimated with a sliding-window counter: the hits
+    of the previous window, weighted by how much of it still overlaps the
+    last ``duration`` seconds, plus the hits of the current window. Both
+    the check and the increment happen in one ``INSERT ... ON CONFLICT DO
+    UPDATE`` statement, so concurrent workers never lose an update.
+    """
+    now = time.time() if now is None else now
+    period, offset = divmod(int(now), duration)
+    elapsed = offset / duration
+    with connection.cursor() as cursor:
+        cursor.execute(
+            upsert_sql(),
+            {
+                "key": key,
+                "period": period,
+                "weight": 1 - elapsed,
+                "limit": limit,
+                "expires_at": (period + 2) * duration,
+            },
+        )
+        hits, previous_hits, allowed = cursor.fetchone()
+    return Window(bool(allowed), hits, previous_hits, elapsed)
+
+
+def prune(now=None):
+    """Delete buckets whose windows no longer affect any throttle check."""
+    now = time.time() if now is None else now
+    return ThrottleBucket.objects.filter(expires_at__lt=now).delete()[0]
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """Throttle backed by the shared ``ThrottleBucket`` table.
+
+    Unlike the cache-based throttles of DRF, the limit holds across all
+    worker processes, and each check updates one fixed-size row instead
+    of rewriting a list of timestamps.
+    """
+
+    cache_format = "throttle_%(scope)s_%(ident)s"
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.window = hit(
+            self.key, self.num_requests, self.duration, self.timer()
+        )
+        return self.window.allowed
+
+    def wait(self):
+        return self.window.wait(self.num_requests, self.duration)
+
+
+class AnonSlidingWindowThrottle(SlidingWindowRateThrottle):
+    """Limit anonymous requests by client IP address."""
+
+    scope = "anon"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
+
+
+class UserSlidingWindowThrottle(SlidingWindowRateThrottle):
+    """Limit requests by user, or by client IP address for anonymous ones."""
+
+    scope = "user"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class ScopedSlidingWindowThrottle(UserSlidingWindowThrottle):
+    """Limit views or actions that set ``throttle_scope``.
+
+    The scope is read from the view, so one ViewSet can give its actions
+    different rates, for example ``@action(..., throttle_scope="search")``.
+    Views without a scope are not limited by this throttle.
+    """
+
+    scope_attr = "throttle_scope"
+
+    def __init__(self):
+        # The rate depends on the view and is set in allow_request().
+        pass
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
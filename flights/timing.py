@@ -0,0 +1,127 @@
+import json
+import logging
+from contextvars import ContextVar
+from time import perf_counter
+
+logger = logging.getLogger("flights.requests")
+
+current_timings = ContextVar("current_timings", default=None)
+
+
+def elapsed_ms(started):
+    return (perf_counter() - started) * 1000
+
+
+class RequestTimings:
+    """Timings of one request, attached to it as ``request.server_timing``.
+
+    While a request runs its timings are also the ``current_timings``
+    context variable, which ``instrument`` uses to count and time every
+    SQL query. Only a couple of ``perf_counter()`` calls are added per
+    query and per phase, so it is cheap enough to keep on in production.
+    """
+
+    __slots__ = (
+        "started",
+        "view_started",
+        "view_ms",
+        "render_started",
+        "render_ms",
+        "serializer_ms",
+        "db_queries",
+        "db_ms",
+    )
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.view_started = None
+        self.view_ms = None
+        self.render_started = None
+        self.render_ms = None
+        self.serializer_ms = 0.0
+        self.db_queries = 0
+        self.db_ms = 0.0
+
+    def metrics(self):
+        """Return ``(name, duration in ms, description)`` for each phase."""
+        metrics = [("db", self.db_ms, f"{self.db_queries} queries")]
+        if self.view_ms is not None:
+            metrics.append(("view", self.view_ms, "view"))
+        if self.serializer_ms:
+            metrics.append(("serializer", self.serializer_ms, "serializer"))
+        if self.render_ms is not None:
+            metrics.append(("render", self.render_ms, "render"))
+        metrics.append(("total", elapsed_ms(self.started), "total"))
+        return metrics
+
+    def header(self):
+        return ", ".join(
+            f'{name};dur={duration:.2f};desc="{description}"'
+            for name, duration, description in self.metrics()
+        )
+
+    def log(self, request, response):
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        match = request.resolver_match
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "db_queries": self.db_queries,
+        }
+        for name, duration, _ in self.metrics():
+            record[f"{name}_ms"] = round(duration, 2)
+        logger.info(json.dumps(record, separators=(",", ":")))
+
+
+def instrument(execute, sql, params, many, context):
+    """Execute wrapper installed on every database connection.
+
+    Context variables follow a request into the threads that
+    ``sync_to_async`` runs the ORM in, so queries of async views are
+    counted as well.
+    """
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_ms += elapsed_ms(started)
+        timings.db_queries += 1
+
+
+def install_instrumentation(connection):
+    # Put it first: ``connection.execute_wrapper()`` removes its wrapper
+    # with ``pop()`` and the connection may be opened inside one.
+    if instrument not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, instrument)
+
+
+class ServerTimingMixin:
+    """Add the time spent in ``to_representation`` to the request timings.
+
+    The serializer time includes the queries issued while serializing, so
+    it overlaps with the ``db`` metric.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        timings = getattr(self.request, "server_timing", None)
+        if timings is None:
+            return serializer
+
+        to_representation = serializer.to_representation
+
+        def timed_to_representation(instance):
+            started = perf_counter()
+            try:
+                return to_representation(instance)
+            finally:
+                timings.serializer_ms += elapsed_ms(started)
+
+        serializer.to_representation = timed_to_representation
+        return serializer
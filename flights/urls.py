@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from flights import views
+from flights import async_views, views
 
 router = DefaultRouter()
 router.register("countries", views.CountryViewSet)
@@ -15,6 +15,46 @@ router.register("tickets", views.TicketViewSet)
 router.register("crews", views.CrewViewSet)
 
 urlpatterns = [
+    path(
+        "cache_stats/",
+        views.ReferenceCacheStatsView.as_view(),
+        name="cache-stats",
+    ),
+    path(
+        "async/flights/",
+        async_views.flight_list,
+        name="async-flight-list",
+    ),
+    path(
+        "async/flights/<int:pk>/",
+        async_views.flight_detail,
+        name="async-flight-detail",
+    ),
+    path(
+        "async/flights/<int:pk>/seats/",
+        async_views.flight_seats,
+        name="async-flight-seats",
+    ),
+    path(
+        "async/routes/",
+        async_views.route_list,
+        name="async-route-list",
+    ),
+    path(
+        "async/routes/<int:pk>/",
+        async_views.route_detail,
+        name="async-route-detail",
+    ),
+    path(
+        "async/airports/",
+        async_views.airport_list,
+        name="async-airport-list",
+    ),
+    path(
+        "async/airports/<int:pk>/",
+        async_views.airport_detail,
+        name="async-airport-detail",
+    ),
     path("", include(router.urls)),
 ]
 
@@ -0,0 +1,145 @@
+from collections import defaultdict
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.relations import RelatedField
+from rest_framework.response import Response
+
+from flights.timing import elapsed_ms
+
+
+class ValuesPlan:
+    """Build a serializer's representation from ``values()`` rows.
+
+    Every readable field is read from the lookup its ``source`` names
+    (``airplane.name`` becomes ``airplane__name``) and converted with its
+    ``to_representation()``, so the output matches the serializer's.
+    ``Meta.values`` overrides this per field with a lookup, a database
+    expression, or a ``(lookup, function)`` pair for values that are
+    finished in Python; those values are used as they are. Nested
+    ``many=True`` serializers over a many-to-many field are loaded with
+    one more query per page, like ``prefetch_related()``.
+    """
+
+    def __init__(self, serializer):
+        declared = getattr(serializer.Meta, "values", {})
+        self.model = serializer.Meta.model
+        self.pk = self.model._meta.pk.attname
+        self.lookups = {self.pk}
+        self.annotations = {}
+        self.columns = []
+        self.nested = {}
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                relation = self.model._meta.get_field(field.source)
+                if not relation.many_to_many:
+                    raise ImproperlyConfigured(
+                        f"{name!r} must be a many-to-many field."
+                    )
+                self.nested[name] = (
+                    relation.related_query_name(),
+                    ValuesPlan(field.child),
+                )
+                self.columns.append((name, None, None))
+                continue
+            if isinstance(field, serializers.BaseSerializer):
+                raise ImproperlyConfigured(
+                    f"Nested serializer {name!r} cannot be read from values()."
+                )
+
+            spec, convert = declared.get(name), None
+            if isinstance(spec, tuple):
+                spec, convert = spec
+            elif spec is None:
+                spec = field.source.replace(".", "__")
+                if not isinstance(field, RelatedField):
+                    # Primary key related fields read the id as it is.
+                    convert = field.to_representation
+            if isinstance(spec, str):
+                self.lookups.add(spec)
+                self.columns.append((name, spec, convert))
+            else:
+                self.annotations[name] = spec
+                self.columns.append((name, name, convert))
+
+    def values(self, queryset, *lookups):
+        # Joins are spelled out by the lookups; prefetching needs models.
+        return queryset.select_related(None).prefetch_related(None).values(
+            *self.lookups.union(lookups), **self.annotations
+        )
+
+    def render(self, rows):
+        ids = [row[self.pk] for row in rows]
+        nested = {
+            name: self.render_many(query_name, plan, ids)
+            for name, (query_name, plan) in self.nested.items()
+        }
+        data = []
+        for row in rows:
+            item = {}
+            for name, key, convert in self.columns:
+                if key is None:
+                    item[name] = nested[name].get(row[self.pk], [])
+                    continue
+                value = row[key]
+                if value is not None and convert is not None:
+                    value = convert(value)
+                item[name] = value
+            data.append(item)
+        return data
+
+    def render_many(self, query_name, plan, ids):
+        if not ids:
+            return {}
+        # In primary key order, as the ViewSets prefetch them.
+        queryset = plan.model.objects.filter(
+            **{f"{query_name}__in": ids}
+        ).order_by(plan.pk)
+        rows = list(plan.values(queryset, query_name))
+        grouped = defaultdict(list)
+        for row, item in zip(rows, plan.render(rows)):
+            grouped[row[query_name]].append(item)
+        return grouped
+
+
+class ValuesListMixin:
+    """Render list pages from ``values()`` rows instead of model instances.
+
+    Opt in by adding the mixin to a ViewSet whose list serializer declares
+    ``Meta.values`` (see ``ValuesPlan``). Neither model instances nor a
+    serializer per row are created, and computed fields are done by the
+    database. Turn it off with ``VALUES_LIST_RENDERING``.
+    """
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        if not settings.VALUES_LIST_RENDERING or not hasattr(
+            serializer.Meta, "values"
+        ):
+            return super().list(request, *args, **kwargs)
+
+        plan = ValuesPlan(serializer)
+        # The cursor of the next page is read from the last row.
+        ordering = getattr(self.paginator, "ordering", ())
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        queryset = plan.values(
+            self.filter_queryset(self.get_queryset()),
+            *(field.lstrip("-") for field in ordering),
+        )
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset if page is None else page)
+
+        started = perf_counter()
+        data = plan.render(rows)
+        timings = getattr(request, "server_timing", None)
+        if timings is not None:
+            timings.serializer_ms += elapsed_ms(started)
+
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -1,7 +1,16 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import F, Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from flights.models import (
     Country,
@@ -15,7 +24,23 @@ from flights.models import (
     Ticket,
     Crew,
 )
+from flights.connections import SORT_KEYS, find_connections
+from flights.batch_retrieve import BatchRetrieveMixin
+from flights.compound import ticket_includes
+from flights.conditional import ConditionalGetMixin
+from flights.manifests import flight_manifest, manifest_response
+from flights.pagination import FlightCursorPagination
 from flights.permissions import IsAdminOrIfAuthenticatedReadOnly
+from flights.renderers import (
+    CompoundJSONRenderer,
+    CSVRenderer,
+    NDJSONRenderer,
+)
+from flights.response_cache import CachedListMixin, get_stats
+from flights.seats import get_seat_map
+from flights.sparse import SparseFieldsetMixin
+from flights.timing import ServerTimingMixin
+from flights.values import ValuesListMixin
 from flights.serializers import (
     CountrySerializer,
     CitySerializer,
@@ -29,13 +54,42 @@ from flights.serializers import (
     CrewSerializer,
     TicketReadOnlySerializer,
     OrderReadOnlySerializer,
+    SeatMapSerializer,
+    OrderBookingSerializer,
+    FlightSearchSerializer,
+    ConnectionSearchSerializer,
 )
 
 
-class CountryViewSet(viewsets.ModelViewSet):
+def start_of_day(date):
+    return timezone.make_aware(datetime.combine(date, time.min))
+
+
+def parse_date_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        date = parse_date(value)
+    except ValueError:
+        date = None
+    if date is None:
+        raise ValidationError({name: "Invalid date, expected YYYY-MM-DD."})
+    return date
+
+
+class CountryViewSet(
+    CachedListMixin,
+    ConditionalGetMixin,
+    BatchRetrieveMixin,
+    SparseFieldsetMixin,
+    ServerTimingMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Country.objects.all()
     serializer_class = CountrySerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    cache_namespace = "countries"
 
     @extend_schema(
         summary="List all countries",
@@ -45,10 +99,20 @@ class CountryViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class CityViewSet(viewsets.ModelViewSet):
+class CityViewSet(
+    CachedListMixin,
+    ConditionalGetMixin,
+    BatchRetrieveMixin,
+    SparseFieldsetMixin,
+    ValuesListMixin,
+    ServerTimingMixin,
+    viewsets.ModelViewSet,
+):
     queryset = City.objects.all().select_related("country")
     serializer_class = CitySerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    conditional_fields = ("updated_at", "country__updated_at")
+    cache_namespace = "cities"
 
     @extend_schema(
         parameters=[
@@ -69,10 +133,18 @@ class CityViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class AirportViewSet(viewsets.ModelViewSet):
+class AirportViewSet(
+    CachedListMixin,
+    ConditionalGetMixin,
+    BatchRetrieveMixin,
+    SparseFieldsetMixin,
+    ServerTimingMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Airport.objects.all().select_related("closest_big_city__country")
     serializer_class = AirportSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    cache_namespace = "airports"
 
     @extend_schema(
         parameters=[
@@ -96,10 +168,18 @@ class AirportViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class AirplaneTypeViewSet(viewsets.ModelViewSet):
+class AirplaneTypeViewSet(
+    CachedListMixin,
+    ConditionalGetMixin,
+    BatchRetrieveMixin,
+    SparseFieldsetMixin,
+    ServerTimingMixin,
+    viewsets.ModelViewSet,
+):
     queryset = AirplaneType.objects.all()
     serializer_class = AirplaneTypeSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    cache_namespace = "airplane_types"
 
     @extend_schema(
         summary="List all airplane types",
@@ -109,7 +189,13 @@ class AirplaneTypeViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class AirplaneViewSet(viewsets.ModelViewSet):
+class AirplaneViewSet(
+    ConditionalGetMixin,
+    BatchRetrieveMixin,
+    SparseFieldsetMixin,
+    ServerTimingMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Airplane.objects.all().select_related("airplane_type")
     serializer_class = AirplaneSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
@@ -138,10 +224,22 @@ class AirplaneViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class RouteViewSet(viewsets.ModelViewSet):
+class RouteViewSet(
+    ConditionalGetMixin,
+    BatchRetrieveMixin,
+    SparseFieldsetMixin,
+    ValuesListMixin,
+    ServerTimingMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Route.objects.all().select_related("source", "destination")
     serializer_class = RouteSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    conditional_fields = (
+        "updated_at",
+        "source__updated_at",
+        "destination__updated_at",
+    )
 
     @extend_schema(
         parameters=[
@@ -172,7 +270,13 @@ class RouteViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class CrewViewSet(viewsets.ModelViewSet):
+class CrewViewSet(
+    ConditionalGetMixin,
+    BatchRetrieveMixin,
+    SparseFieldsetMixin,
+    ServerTimingMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Crew.objects.all()
     serializer_class = CrewSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
@@ -185,10 +289,38 @@ class CrewViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class FlightViewSet(viewsets.ModelViewSet):
+class FlightViewSet(
+    ConditionalGetMixin,
+    BatchRetrieveMixin,
+    SparseFieldsetMixin,
+    ValuesListMixin,
+    ServerTimingMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Flight.objects.all().select_related("route", "airplane")
     serializer_class = FlightSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    conditional_fields = (
+        "updated_at",
+        "airplane__updated_at",
+        "crew__updated_at",
+    )
+    pagination_class = FlightCursorPagination
+    # Set per action through @action(throttle_scope=...).
+    throttle_scope = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ("list", "retrieve", "search"):
+            queryset = queryset.prefetch_related(
+                Prefetch("crew", queryset=Crew.objects.order_by("id"))
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == "search":
+            return FlightSearchSerializer
+        return FlightSerializer
 
     @extend_schema(
         parameters=[
@@ -224,11 +356,226 @@ class FlightViewSet(viewsets.ModelViewSet):
 
         return super().list(request, *args, **kwargs)
 
+    @extend_schema(
+        summary="Search flights between two airports",
+        parameters=[
+            OpenApiParameter(
+                "from",
+                type=str,
+                required=True,
+                description="Source airport code (ex. ?from=KBP)",
+            ),
+            OpenApiParameter(
+                "to",
+                type=str,
+                required=True,
+                description="Destination airport code (ex. ?to=LHR)",
+            ),
+            OpenApiParameter(
+                "date_from",
+                type={"type": "string", "format": "date"},
+                description="Earliest departure date (ex. ?date_from=2024-06-01)",
+            ),
+            OpenApiParameter(
+                "date_to",
+                type={"type": "string", "format": "date"},
+                description="Latest departure date (ex. ?date_to=2024-06-07)",
+            ),
+        ],
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="search",
+        throttle_scope="search",
+    )
+    def search(self, request, *args, **kwargs):
+        source = request.query_params.get("from", "").strip().upper()
+        destination = request.query_params.get("to", "").strip().upper()
+        if not source or not destination:
+            return Response(
+                {"error": "Both 'from' and 'to' airport codes are required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        queryset = self.get_queryset().filter(
+            route__source__code=source,
+            route__destination__code=destination,
+        )
+
+        date_from = parse_date_param(request, "date_from")
+        date_to = parse_date_param(request, "date_to")
+        if date_from:
+            queryset = queryset.filter(departure_time__gte=start_of_day(date_from))
+        if date_to:
+            queryset = queryset.filter(
+                departure_time__lt=start_of_day(date_to + timedelta(days=1))
+            )
 
-class OrderViewSet(viewsets.ModelViewSet):
+        queryset = queryset.annotate(
+            seats_remaining=F("airplane__rows") * F("airplane__seats_in_row")
+            - F("tickets_sold")
+        )
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @extend_schema(
+        summary="Search itineraries with up to two connections",
+        parameters=[
+            OpenApiParameter(
+                "from",
+                type=str,
+                required=True,
+                description="Source airport code (ex. ?from=KBP)",
+            ),
+            OpenApiParameter(
+                "to",
+                type=str,
+                required=True,
+                description="Destination airport code (ex. ?to=JFK)",
+            ),
+            OpenApiParameter(
+                "date",
+                type={"type": "string", "format": "date"},
+                required=True,
+                description="Departure date of the first leg (ex. ?date=2024-06-01)",
+            ),
+            OpenApiParameter(
+                "max_stops",
+                type=int,
+                description="Maximum number of connections, 0-2 (default 2)",
+            ),
+            OpenApiParameter(
+                "sort",
+                type=str,
+                enum=tuple(SORT_KEYS),
+                description="Rank by total duration (default) or distance",
+            ),
+        ],
+        responses={200: ConnectionSearchSerializer},
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="connections",
+        throttle_scope="search",
+    )
+    def connections(self, request, *args, **kwargs):
+        source = request.query_params.get("from", "").strip().upper()
+        destination = request.query_params.get("to", "").strip().upper()
+        date = parse_date_param(request, "date")
+        if not source or not destination or not date:
+            return Response(
+                {"error": "'from', 'to' and 'date' are required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        max_stops = request.query_params.get("max_stops", "2")
+        if max_stops not in ("0", "1", "2"):
+            return Response(
+                {"error": "max_stops must be 0, 1 or 2"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        sort = request.query_params.get("sort", "duration")
+        if sort not in SORT_KEYS:
+            return Response(
+                {"error": f"sort must be one of: {', '.join(SORT_KEYS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        result = find_connections(
+            source,
+            destination,
+            departure_from=start_of_day(date),
+            departure_to=start_of_day(date + timedelta(days=1)),
+            max_stops=int(max_stops),
+            sort=sort,
+            limit=settings.CONNECTION_SEARCH_RESULTS,
+        )
+        return Response(ConnectionSearchSerializer(result).data)
+
+    @extend_schema(
+        summary="Stream the passenger manifest of a flight",
+        description="Use the .csv or .ndjson suffix to pick the format.",
+        responses={(200, "text/csv"): str, (200, "application/x-ndjson"): str},
+    )
+    @action(
+        detail=True,
+        methods=["get"],
+        renderer_classes=(CSVRenderer, NDJSONRenderer),
+    )
+    def manifest(self, request, *args, **kwargs):
+        return flight_manifest(
+            self.get_object(), request.accepted_renderer.format
+        )
+
+    @extend_schema(
+        summary="Stream the passenger manifests of flights in a date window",
+        operation_id="flights_flights_batch_manifest",
+        description="Use the .csv or .ndjson suffix to pick the format.",
+        parameters=[
+            OpenApiParameter(
+                "date_from",
+                type={"type": "string", "format": "date"},
+                required=True,
+                description="First departure date (ex. ?date_from=2024-06-01)",
+            ),
+            OpenApiParameter(
+                "date_to",
+                type={"type": "string", "format": "date"},
+                required=True,
+                description="Last departure date (ex. ?date_to=2024-06-07)",
+            ),
+        ],
+        responses={(200, "text/csv"): str, (200, "application/x-ndjson"): str},
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="manifest",
+        renderer_classes=(CSVRenderer, NDJSONRenderer),
+    )
+    def batch_manifest(self, request, *args, **kwargs):
+        date_from = parse_date_param(request, "date_from")
+        date_to = parse_date_param(request, "date_to")
+        if not date_from or not date_to:
+            return Response(
+                {"error": "Both date_from and date_to are required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        tickets = Ticket.objects.filter(
+            flight__departure_time__gte=start_of_day(date_from),
+            flight__departure_time__lt=start_of_day(date_to + timedelta(days=1)),
+        )
+        return manifest_response(
+            tickets,
+            request.accepted_renderer.format,
+            f"manifest-{date_from}-{date_to}",
+        )
+
+    @extend_schema(
+        summary="Seat availability map of a flight",
+        responses={200: SeatMapSerializer},
+    )
+    @action(detail=True, methods=["get"], url_path="seats")
+    def seats(self, request, pk=None):
+        return Response(get_seat_map(self.get_object()))
+
+
+class OrderViewSet(
+    ConditionalGetMixin,
+    BatchRetrieveMixin,
+    SparseFieldsetMixin,
+    ServerTimingMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Order.objects.all().select_related("user")
     serializer_class = OrderSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    conditional_fields = ("updated_at", "user__updated_at")
+    throttle_scope = None
 
     @extend_schema(
         summary="List all orders",
@@ -237,16 +584,46 @@ class OrderViewSet(viewsets.ModelViewSet):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    @extend_schema(
+        summary="Create an order with all of its tickets at once",
+        request=OrderBookingSerializer,
+        responses={201: OrderBookingSerializer},
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="book",
+        throttle_scope="booking",
+    )
+    def book(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def get_serializer_class(self):
         if self.action == "list":
             return OrderReadOnlySerializer
+        if self.action == "book":
+            return OrderBookingSerializer
         return OrderSerializer
 
 
-class TicketViewSet(viewsets.ModelViewSet):
+class TicketViewSet(
+    ConditionalGetMixin,
+    BatchRetrieveMixin,
+    SparseFieldsetMixin,
+    ServerTimingMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Ticket.objects.all().select_related("flight", "order")
     serializer_class = TicketSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    conditional_fields = (
+        "updated_at",
+        "order__updated_at",
+        "order__user__updated_at",
+        "flight__updated_at",
+        "flight__airplane__updated_at",
+        "flight__crew__updated_at",
+    )
 
     @extend_schema(
         parameters=[
@@ -260,6 +637,14 @@ class TicketViewSet(viewsets.ModelViewSet):
                 type={"type": "array", "items": {"type": "number"}},
                 description="Filter by order id (ex. ?order=1,2)",
             ),
+            OpenApiParameter(
+                "format",
+                type=str,
+                enum=("compound",),
+                description="Return flight and order ids and render every "
+                "flight, crew member and order once in an 'included' "
+                "section (ex. ?format=compound)",
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
@@ -280,9 +665,65 @@ class TicketViewSet(viewsets.ModelViewSet):
                 return Response({"detail": "Invalid order id provided."}, status=status.HTTP_400_BAD_REQUEST)
             self.queryset = self.queryset.filter(order_id__in=order_ids)
 
+        if self.is_compound():
+            return self.conditional_response(
+                request,
+                self.filter_queryset(self.get_queryset()),
+                self.compound_list,
+                *args,
+                **kwargs,
+            )
         return super().list(request, *args, **kwargs)
 
-    def get_serializer_class(self):
+    def compound_list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        tickets = list(queryset if page is None else page)
+        serializer = self.get_serializer(tickets, many=True)
+        included = ticket_includes(tickets, serializer.child.fields)
+        if page is None:
+            return Response({"results": serializer.data, "included": included})
+        response = self.get_paginated_response(serializer.data)
+        response.data["included"] = included
+        return response
+
+    def is_compound(self):
+        return self.action == "list" and isinstance(
+            getattr(self.request, "accepted_renderer", None),
+            CompoundJSONRenderer,
+        )
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
         if self.action == "list":
+            renderers.append(CompoundJSONRenderer())
+        return renderers
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.is_compound():
+            # Tickets only carry the ids; ticket_includes() loads the rest.
+            queryset = queryset.select_related(None)
+        elif self.action == "list":
+            queryset = queryset.select_related(
+                "flight__airplane", "order__user"
+            ).prefetch_related(
+                Prefetch("flight__crew", queryset=Crew.objects.order_by("id"))
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == "list" and not self.is_compound():
             return TicketReadOnlySerializer
         return TicketSerializer
+
+
+class ReferenceCacheStatsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(
+        summary="Hit and miss counters of the reference data cache",
+        responses={200: {"type": "object"}},
+    )
+    def get(self, request):
+        return Response(get_stats())
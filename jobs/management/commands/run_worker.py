@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs. Start as many workers as needed; "
+        "they share the jobs table without an outside broker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.JOB_WORKER_CONCURRENCY,
+            help="Jobs run at the same time by this worker.",
+        )
+        parser.add_argument(
+            "--pool",
+            choices=("thread", "process"),
+            default="thread",
+            help="Run jobs on threads, or on processes for CPU-bound tasks.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds between checks of an empty queue.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no due jobs are left instead of polling.",
+        )
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+        worker = Worker(
+            concurrency=options["concurrency"],
+            pool=options["pool"],
+            poll_interval=options["poll_interval"],
+        )
+        if not options["once"]:
+            worker.install_signal_handlers()
+            self.stdout.write(
+                f"Worker {worker.name} started with {worker.concurrency} "
+                f"{worker.pool} slots"
+            )
+        count = worker.run(once=options["once"])
+        self.stdout.write(self.style.SUCCESS(f"Ran {count} jobs"))
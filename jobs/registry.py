@@ -0,0 +1,41 @@
+from jobs.models import Job
+
+TASKS = {}
+
+
+def task(name):
+    """Register a function as the task ``name``.
+
+    Tasks are called with the job payload as keyword arguments, so the
+    payload and the return value must be JSON serializable.
+    """
+
+    def decorator(func):
+        TASKS[name] = func
+        return func
+
+    return decorator
+
+
+def enqueue(
+    name, payload=None, *, run_at=None, max_attempts=None, created_by=None
+):
+    """Queue a run of task ``name``.
+
+    The job is an ordinary row, so when this is called inside a
+    transaction it only becomes visible to workers once it commits.
+    """
+    if name not in TASKS:
+        raise ValueError(f"Unknown task {name!r}.")
+    job = Job(
+        name=name,
+        payload=payload or {},
+        # Also accepts the TokenUser of stateless JWT authentication.
+        created_by_id=getattr(created_by, "pk", None),
+    )
+    if run_at is not None:
+        job.run_at = run_at
+    if max_attempts is not None:
+        job.max_attempts = max_attempts
+    job.save()
+    return job
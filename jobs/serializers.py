@@ -0,0 +1,20 @@
+from rest_framework import serializers
+
+from jobs.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = (
+            "id",
+            "name",
+            "status",
+            "attempts",
+            "max_attempts",
+            "run_at",
+            "result",
+            "error",
+            "created_at",
+            "finished_at",
+        )
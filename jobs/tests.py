@@ -0,0 +1,215 @@
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from jobs.models import Job
+from jobs.registry import enqueue, task
+from jobs.worker import (
+    Worker,
+    claim,
+    execute,
+    finish,
+    heartbeat,
+    run_pending,
+)
+from users.models import User
+
+calls = []
+
+
+@task("tests.add")
+def add(a, b):
+    calls.append((a, b))
+    return a + b
+
+
+@task("tests.fail")
+def fail():
+    raise RuntimeError("boom")
+
+
+@task("tests.sleep")
+def sleep(seconds):
+    time.sleep(seconds)
+
+
+@pytest.mark.django_db
+def test_enqueue_rejects_unknown_tasks():
+    with pytest.raises(ValueError):
+        enqueue("tests.missing")
+
+
+@pytest.mark.django_db
+def test_job_runs_and_stores_result():
+    job = enqueue("tests.add", {"a": 2, "b": 3})
+
+    assert run_pending() == 1
+
+    job.refresh_from_db()
+    assert job.status == Job.Status.SUCCEEDED
+    assert job.result == 5
+    assert job.attempts == 1
+    assert job.locked_by == ""
+    assert job.finished_at is not None
+
+
+@pytest.mark.django_db
+def test_failed_job_is_retried_with_backoff(settings):
+    settings.JOB_RETRY_BACKOFF = 10
+    job = enqueue("tests.fail", max_attempts=2)
+
+    assert run_pending() == 1
+    job.refresh_from_db()
+    assert job.status == Job.Status.QUEUED
+    assert "RuntimeError: boom" in job.error
+    delay = (job.run_at - timezone.now()).total_seconds()
+    assert 5 < delay <= 12.5
+    # Not due yet.
+    assert run_pending() == 0
+
+    Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+    assert run_pending() == 1
+    job.refresh_from_db()
+    assert job.status == Job.Status.FAILED
+    assert job.attempts == 2
+
+
+@pytest.mark.django_db
+def test_claimed_jobs_are_not_claimed_again():
+    first = enqueue("tests.add", {"a": 1, "b": 1})
+    enqueue(
+        "tests.add",
+        {"a": 1, "b": 2},
+        run_at=timezone.now() + timedelta(hours=1),
+    )
+
+    assert [job.id for job in claim("one", 5)] == [first.id]
+    assert claim("two", 5) == []
+
+
+@pytest.mark.django_db
+def test_jobs_of_silent_workers_are_reclaimed(settings):
+    settings.JOB_LOCK_TIMEOUT = 60
+    enqueue("tests.add", {"a": 1, "b": 1})
+    [stale] = claim("one")
+    Job.objects.filter(pk=stale.pk).update(
+        locked_at=timezone.now() - timedelta(seconds=61)
+    )
+
+    [job] = claim("two")
+    assert job.attempts == 2
+    execute(job)
+    # The first worker may no longer record an outcome.
+    assert finish(stale, status=Job.Status.FAILED) == 0
+    job.refresh_from_db()
+    assert job.status == Job.Status.SUCCEEDED
+
+
+@pytest.mark.django_db
+def test_heartbeat_keeps_long_jobs_locked(settings):
+    settings.JOB_LOCK_TIMEOUT = 60
+    enqueue("tests.add", {"a": 1, "b": 1})
+    [job] = claim("one")
+    Job.objects.filter(pk=job.pk).update(
+        locked_at=timezone.now() - timedelta(seconds=61)
+    )
+
+    assert heartbeat({job.locked_by}) == 1
+    assert claim("two") == []
+    assert finish(job, status=Job.Status.SUCCEEDED) == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_worker_refreshes_locks_while_jobs_run(settings):
+    settings.JOB_HEARTBEAT_INTERVAL = 0
+    job = enqueue("tests.sleep", {"seconds": 0.3})
+    refreshed = []
+
+    with mock.patch("jobs.worker.heartbeat", side_effect=refreshed.append):
+        Worker(concurrency=1, poll_interval=0.05, name="one").run(once=True)
+
+    job.refresh_from_db()
+    assert job.status == Job.Status.SUCCEEDED
+    [lock] = set().union(*refreshed)
+    assert lock.startswith("one:")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_worker_command():
+    calls.clear()
+    for i in range(3):
+        enqueue("tests.add", {"a": i, "b": i})
+    out = StringIO()
+
+    # One slot: the in-memory test database fails instead of waiting when
+    # two connections write at the same time.
+    call_command(
+        "run_worker",
+        "--once",
+        "--pool=thread",
+        "--concurrency=1",
+        stdout=out,
+    )
+
+    assert "Ran 3 jobs" in out.getvalue()
+    assert sorted(calls) == [(0, 0), (1, 1), (2, 2)]
+    assert not Job.objects.exclude(status=Job.Status.SUCCEEDED).exists()
+
+
+class JobViewSetTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="user@example.com", password="password"
+        )
+        self.other = User.objects.create_user(
+            email="other@example.com", password="password"
+        )
+        self.own_job = enqueue(
+            "tests.add", {"a": 1, "b": 2}, created_by=self.user
+        )
+        self.other_job = enqueue("tests.fail", created_by=self.other)
+
+    def test_authentication_required(self):
+        response = self.client.get(reverse("jobs:job-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_users_see_their_own_jobs(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse("jobs:job-list"))
+        self.assertEqual(
+            [job["id"] for job in response.data["results"]], [self.own_job.id]
+        )
+        response = self.client.get(
+            reverse("jobs:job-detail", args=[self.other_job.id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_job_status(self):
+        run_pending()
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(
+            reverse("jobs:job-detail", args=[self.own_job.id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], Job.Status.SUCCEEDED)
+        self.assertEqual(response.data["result"], 3)
+
+    def test_staff_see_all_jobs_filtered_by_status(self):
+        run_pending()
+        staff = User.objects.create_user(
+            email="admin@example.com", password="password", is_staff=True
+        )
+        self.client.force_authenticate(user=staff)
+        response = self.client.get(reverse("jobs:job-list") + "?status=queued")
+        self.assertEqual(
+            [job["id"] for job in response.data["results"]],
+            [self.other_job.id],
+        )
@@ -0,0 +1,11 @@
+from django.urls import path, include
+from rest_framework.routers import SimpleRouter
+
+from jobs import views
+
+router = SimpleRouter()
+router.register("", views.JobViewSet)
+
+urlpatterns = [path("", include(router.urls))]
+
+app_name = "jobs"
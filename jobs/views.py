@@ -0,0 +1,39 @@
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework import viewsets
+from rest_framework.permissions import IsAuthenticated
+
+from flights.timing import ServerTimingMixin
+from jobs.models import Job
+from jobs.serializers import JobSerializer
+
+
+class JobViewSet(ServerTimingMixin, viewsets.ReadOnlyModelViewSet):
+    """Status of background jobs; users only see the jobs they started."""
+
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        queryset = self.queryset
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by_id=self.request.user.pk)
+        if self.action == "list":
+            statuses = self.request.query_params.getlist("status")
+            if statuses:
+                queryset = queryset.filter(status__in=statuses)
+        return queryset
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "status",
+                type=OpenApiTypes.STR,
+                enum=Job.Status.values,
+                description="Filter by status (ex. ?status=failed)",
+            )
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
@@ -0,0 +1,256 @@
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.registry import TASKS
+
+logger = logging.getLogger(__name__)
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying a job that failed ``attempts`` times.
+
+    The delay doubles with every attempt up to ``JOB_RETRY_BACKOFF_MAX``,
+    with up to 25% jitter so failed jobs do not all retry at once.
+    """
+    delay = settings.JOB_RETRY_BACKOFF * 2 ** max(attempts - 1, 0)
+    delay = min(delay, settings.JOB_RETRY_BACKOFF_MAX)
+    return delay * random.uniform(1, 1.25)
+
+
+def claimable(now):
+    """Jobs that are due, or whose lock was not refreshed in time."""
+    expired = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    return Q(status=Job.Status.QUEUED, run_at__lte=now) | Q(
+        status=Job.Status.RUNNING, locked_at__lt=expired
+    )
+
+
+def claim(worker, limit=1):
+    """Lock up to ``limit`` due jobs for ``worker`` and return them.
+
+    The jobs are claimed with one ``UPDATE ... WHERE id IN (SELECT ...
+    FOR UPDATE SKIP LOCKED)``: concurrent workers pass over the rows
+    another worker is claiming instead of waiting for them. The update
+    repeats the filter, so on SQLite, which has no row locks, a job is
+    still only claimed once.
+    """
+    now = timezone.now()
+    lock = f"{worker}:{uuid.uuid4().hex[:12]}"
+    with transaction.atomic():
+        due = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(claimable(now))
+            .order_by("run_at", "id")
+            .values("id")[:limit]
+        )
+        claimed = Job.objects.filter(claimable(now), id__in=due).update(
+            status=Job.Status.RUNNING,
+            locked_by=lock,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+            updated_at=now,
+        )
+    if not claimed:
+        return []
+    return list(Job.objects.filter(locked_by=lock).order_by("run_at", "id"))
+
+
+def heartbeat(locks):
+    """Refresh the locks of running jobs so they do not expire mid-run."""
+    if not locks:
+        return 0
+    return Job.objects.filter(
+        status=Job.Status.RUNNING, locked_by__in=locks
+    ).update(locked_at=timezone.now())
+
+
+def finish(job, **fields):
+    # Only the worker holding the lock may record the outcome; a job whose
+    # lock expired may already be running elsewhere.
+    now = timezone.now()
+    return Job.objects.filter(
+        pk=job.pk, status=Job.Status.RUNNING, locked_by=job.locked_by
+    ).update(locked_by="", locked_at=None, updated_at=now, **fields)
+
+
+def execute(job):
+    """Run a claimed job and record its result, a retry or the failure."""
+    func = TASKS.get(job.name)
+    if func is None:
+        error, retry = f"Unknown task {job.name!r}.", False
+    elif job.attempts > job.max_attempts:
+        error, retry = "The worker running the job stopped responding.", False
+    else:
+        try:
+            result = func(**job.payload)
+        except Exception:
+            error = traceback.format_exc()
+            retry = job.attempts < job.max_attempts
+        else:
+            logger.info("Job %s (%s) succeeded", job.id, job.name)
+            return finish(
+                job,
+                status=Job.Status.SUCCEEDED,
+                result=result,
+                error="",
+                finished_at=timezone.now(),
+            )
+
+    if retry:
+        delay = backoff(job.attempts)
+        logger.warning(
+            "Job %s (%s) failed, retrying in %.0f seconds",
+            job.id,
+            job.name,
+            delay,
+        )
+        return finish(
+            job,
+            status=Job.Status.QUEUED,
+            run_at=timezone.now() + timedelta(seconds=delay),
+            error=error,
+        )
+    logger.error("Job %s (%s) failed", job.id, job.name)
+    return finish(
+        job, status=Job.Status.FAILED, error=error, finished_at=timezone.now()
+    )
+
+
+def execute_claimed(job_id, lock):
+    """Pool entry point; pools are handed ids, not model instances."""
+    try:
+        job = Job.objects.filter(pk=job_id, locked_by=lock).first()
+        if job is not None:
+            execute(job)
+    finally:
+        connections.close_all()
+
+
+def run_pending(worker="inline"):
+    """Run every due job in the current thread; returns how many ran."""
+    count = 0
+    while jobs := claim(worker):
+        for job in jobs:
+            execute(job)
+            count += 1
+    return count
+
+
+class Worker:
+    """Poll the jobs table and run due jobs on a thread or process pool.
+
+    Every worker claims only as many jobs as it has idle pool slots, so
+    several workers can share the queue without starving each other.
+    While jobs run, the polling loop refreshes their locks every
+    ``JOB_HEARTBEAT_INTERVAL`` seconds, so a job that runs longer than
+    ``JOB_LOCK_TIMEOUT`` is not claimed again by another worker.
+    """
+
+    def __init__(
+        self, concurrency=4, pool="thread", poll_interval=1.0, name=None
+    ):
+        self.concurrency = concurrency
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+        self.last_heartbeat = 0.0
+
+    def executor(self):
+        if self.pool == "process":
+            # Children must not share the parent's database connections.
+            connections.close_all()
+            return ProcessPoolExecutor(
+                max_workers=self.concurrency, initializer=django.setup
+            )
+        return ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="jobs"
+        )
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def install_signal_handlers(self):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self.stop)
+
+    def refresh_locks(self, running):
+        if time.monotonic() - self.last_heartbeat < (
+            settings.JOB_HEARTBEAT_INTERVAL
+        ):
+            return
+        heartbeat(set(running.values()))
+        self.last_heartbeat = time.monotonic()
+
+    def wait(self, running):
+        wait(
+            running,
+            timeout=min(self.poll_interval, settings.JOB_HEARTBEAT_INTERVAL),
+            return_when=FIRST_COMPLETED,
+        )
+
+    def run(self, once=False):
+        """Work until stopped, or with ``once`` until the queue is empty.
+
+        Returns the number of jobs handed to the pool. Jobs that are
+        running when the worker stops are allowed to finish.
+        """
+        count = 0
+        # Futures of the running jobs, mapped to their locks.
+        running = {}
+        with self.executor() as executor:
+            while not self.stopping.is_set():
+                for future in [future for future in running if future.done()]:
+                    del running[future]
+                    if future.exception() is not None:
+                        logger.error(
+                            "Recording a job outcome failed",
+                            exc_info=future.exception(),
+                        )
+                self.refresh_locks(running)
+                free = self.concurrency - len(running)
+                jobs = claim(self.name, free) if free > 0 else []
+                for job in jobs:
+                    future = executor.submit(
+                        execute_claimed, job.id, job.locked_by
+                    )
+                    running[future] = job.locked_by
+                count += len(jobs)
+                if jobs:
+                    continue
+                if once and not running:
+                    break
+                if running:
+                    self.wait(running)
+                else:
+                    self.stopping.wait(self.poll_interval)
+            while running:
+                self.refresh_locks(running)
+                self.wait(running)
+                running = {
+                    future: lock
+                    for future, lock in running.items()
+                    if not future.done()
+                }
+        return count
@@ -0,0 +1,156 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+CACHE_PREFIX = "users:auth"
+
+
+def user_cache_key(user_id):
+    return f"{CACHE_PREFIX}:user-fields:{user_id}"
+
+
+def token_cache_key(key):
+    # Keep raw token keys out of the cache keyspace.
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"{CACHE_PREFIX}:token:{digest}"
+
+
+def invalidate_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+def invalidate_token(key):
+    cache.delete(token_cache_key(key))
+
+
+def cached_fields(user):
+    # The password hash never goes into the cache.
+    return {
+        field.attname: getattr(user, field.attname)
+        for field in user._meta.concrete_fields
+        if field.attname != "password"
+    }
+
+
+def user_from_fields(fields):
+    """Rebuild a cached user; the password is deferred.
+
+    Reading ``password`` loads it from the database, and saving the user
+    only writes the fields it was built with unless the password is set.
+    """
+    User = get_user_model()
+    return User.from_db(
+        router.db_for_read(User), list(fields), list(fields.values())
+    )
+
+
+def cache_user(user):
+    cache.set(
+        user_cache_key(user.pk),
+        cached_fields(user),
+        settings.AUTH_CACHE_TIMEOUT,
+    )
+
+
+def get_user(user_id):
+    """Return the active user with ``user_id`` from the cache or the database.
+
+    The cache holds the user's fields without the password hash (see
+    ``user_from_fields``). Entries live for ``AUTH_CACHE_TIMEOUT`` seconds
+    and are dropped by the ``users`` signals whenever the user is saved or
+    deleted. With a per-process cache other workers can keep a stale entry
+    until it expires, so keep the timeout short or use a shared cache
+    backend.
+    """
+    fields = cache.get(user_cache_key(user_id))
+    if fields is not None:
+        user = user_from_fields(fields)
+    else:
+        User = get_user_model()
+        try:
+            user = User.objects.get(**{jwt_settings.USER_ID_FIELD: user_id})
+        except User.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        cache_user(user)
+    if not user.is_active:
+        raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+    return user
+
+
+async def aget_user(user_id):
+    key = user_cache_key(user_id)
+    fields = await cache.aget(key)
+    if fields is not None:
+        return user_from_fields(fields)
+    user = await get_user_model().objects.filter(
+        **{jwt_settings.USER_ID_FIELD: user_id}
+    ).afirst()
+    if user is None:
+        return None
+    await cache.aset(key, cached_fields(user), settings.AUTH_CACHE_TIMEOUT)
+    return user
+
+
+async def aget_token_user(key):
+    user_id = await cache.aget(token_cache_key(key))
+    if user_id is None:
+        user_id = await Token.objects.filter(key=key).values_list(
+            "user_id", flat=True
+        ).afirst()
+        if user_id is None:
+            return None
+        await cache.aset(token_cache_key(key), user_id, settings.AUTH_CACHE_TIMEOUT)
+    return await aget_user(user_id)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` that loads users through the user cache."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            )
+        user = get_user(user_id)
+        if jwt_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            jwt_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."),
+                code="password_changed",
+            )
+        return user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` that caches which user a token belongs to.
+
+    A cache hit skips the token and user join entirely; the token is then
+    returned as an unsaved instance carrying only its key and user id.
+    """
+
+    def authenticate_credentials(self, key):
+        user_id = cache.get(token_cache_key(key))
+        if user_id is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(token_cache_key(key), user.pk, settings.AUTH_CACHE_TIMEOUT)
+            cache_user(user)
+            return user, token
+        try:
+            user = get_user(user_id)
+        except AuthenticationFailed:
+            raise AuthenticationFailed(_("User inactive or deleted."))
+        return user, Token(key=key, user_id=user_id)
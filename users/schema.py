@@ -0,0 +1,18 @@
+from drf_spectacular.contrib.rest_framework_simplejwt import (
+    SimpleJWTScheme,
+    TokenObtainPairSerializerExtension,
+)
+
+
+class JWTScheme(SimpleJWTScheme):
+    """Document the cached and stateless JWT authentication classes."""
+
+    target_class = "rest_framework_simplejwt.authentication.JWTAuthentication"
+    match_subclasses = True
+    priority = 1
+
+
+class ClaimsTokenObtainPairSerializerExtension(
+    TokenObtainPairSerializerExtension
+):
+    target_class = "users.serializers.ClaimsTokenObtainPairSerializer"
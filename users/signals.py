@@ -0,0 +1,17 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.authentication import invalidate_token, invalidate_user
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
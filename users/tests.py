@@ -1,3 +1,142 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import (
+    JWTStatelessUserAuthentication,
+)
+
+from users.authentication import user_cache_key
+from users.models import User
+
+# What JWT_STATELESS_AUTH=True configures as the default.
+stateless_authentication = mock.patch.object(
+    APIView, "authentication_classes", [JWTStatelessUserAuthentication]
+)
+
+
+def user_queries(queries):
+    table = User._meta.db_table
+    return [query for query in queries if table in query["sql"]]
+
+
+class CachedAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="user@example.com", password="password"
+        )
+
+    def obtain_access_token(self, email="user@example.com"):
+        response = self.client.post(
+            reverse("users:token_obtain_pair"),
+            {"email": email, "password": "password"},
+        )
+        return response.data["access"]
+
+    def test_jwt_user_is_loaded_once(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.obtain_access_token()}"
+        )
+        url = reverse("users:manage")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["email"], "user@example.com")
+        self.assertEqual(user_queries(queries.captured_queries), [])
+
+    def test_saving_user_invalidates_cache(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.obtain_access_token()}"
+        )
+        url = reverse("users:manage")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_hash_is_not_cached(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.obtain_access_token()}"
+        )
+        url = reverse("users:manage")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        cached = cache.get(user_cache_key(self.user.pk))
+        self.assertEqual(cached["email"], "user@example.com")
+        self.assertNotIn("password", cached)
+        self.assertNotIn(self.user.password, repr(cached))
+
+    def test_update_through_cached_user_keeps_password(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.obtain_access_token()}"
+        )
+        url = reverse("users:manage")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        response = self.client.patch(url, {"email": "new@example.com"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, "new@example.com")
+        self.assertTrue(self.user.check_password("password"))
+
+    def test_token_user_is_loaded_once(self):
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        url = reverse("flights:country-list")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(user_queries(queries.captured_queries), [])
+
+    def test_deleting_token_invalidates_cache(self):
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        url = reverse("flights:country-list")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        token.delete()
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @stateless_authentication
+    def test_stateless_jwt_uses_claims(self):
+        User.objects.create_user(
+            email="admin@example.com", password="password", is_staff=True
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Bearer "
+            + self.obtain_access_token("admin@example.com")
+        )
+        url = reverse("flights:country-list")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {"name": "Country"})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(user_queries(queries.captured_queries), [])
+
+    @stateless_authentication
+    def test_stateless_jwt_denies_writes_without_staff_claim(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.obtain_access_token()}"
+        )
+        response = self.client.post(
+            reverse("flights:country-list"), {"name": "Country"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -2,8 +2,8 @@ from rest_framework import generics
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.settings import api_settings
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from users.authentication import CachedJWTAuthentication
 from users.serializers import UserSerializer, AuthTokenSerializer
 
 
@@ -19,7 +19,7 @@ class LoginUserView(ObtainAuthToken):
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):